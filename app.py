@@ -4,11 +4,16 @@ from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from config import Config
 from database import init_db
+from commands import register_commands
+from services.scheduler import init_scheduler, start_scheduler
 from routes.auth import auth_bp
 from routes.trip import trip_bp
 from routes.booking import booking_bp
 from routes.payment import payment_bp
 from routes.lines import lines_bp
+from routes.stops import stops_bp
+from routes.journeys import journeys_bp
+from routes.waitlist import waitlist_bp
 
 from flask_migrate import Migrate, upgrade
 from models.public import db
@@ -31,6 +36,7 @@ def create_app():
     # Initialize database and Flask-Migrate
     init_db(app)
     Migrate(app, db)
+    register_commands(app)
 
     # Apply pending migrations automatically at startup (only if migrations folder exists)
     with app.app_context():
@@ -50,10 +56,15 @@ def create_app():
     app.register_blueprint(booking_bp)
     app.register_blueprint(payment_bp)
     app.register_blueprint(lines_bp)
+    app.register_blueprint(stops_bp)
+    app.register_blueprint(journeys_bp)
+    app.register_blueprint(waitlist_bp)
     
     from routes.vehicles import vehicles_bp
     app.register_blueprint(vehicles_bp)
     
+    init_scheduler(app)
+    
     @app.route('/')
     def index():
         return {'message': 'Minibus Booking API', 'status': 'running'}, 200
@@ -66,12 +77,12 @@ def create_app():
 
 if __name__ == '__main__':
     app = create_app()
-    # Import lines from Excel only when starting the server (not for CLI: flask db init, etc.)
-    with app.app_context():
-        try:
-            from services.import_lines import import_lines_from_excel
-            import_lines_from_excel()
-        except Exception as e:
-            print(f"Startup import failed: {e}")
+    # Import lines from Excel and start the background jobs only when starting the
+    # server (not for CLI: flask db init, etc.), and only in the process that serves
+    # requests, not in the reloader's watcher
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        from services.lines_file import import_on_startup
+        import_on_startup(app)
+        start_scheduler(app)
     app.run(debug=True, host='0.0.0.0', port=8000)
 
@@ -0,0 +1,137 @@
+"""
+Concurrency stress test for seat reservation.
+
+Fires hundreds of parallel POST /api/bookings at a single trip, then cancels
+every booking twice in parallel, and checks that seats never go negative,
+that no trip is overbooked and that each cancellation restores seats once.
+
+Needs a migrated PostgreSQL database (DATABASE_URL):
+
+    python benchmarks/booking_stress.py --requests 500 --workers 32 --seats 18
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask_jwt_extended import create_access_token  # noqa: E402
+from app import create_app  # noqa: E402
+from models.public import db, User  # noqa: E402
+from models.clients import Booking, Payment  # noqa: E402
+from models.partners import ScheduledTrip  # noqa: E402
+from services import inventory  # noqa: E402
+
+
+def setup(app, seats, slots=1):
+    with app.app_context():
+        user = User(name='Stress Test', phone=f'stress-{uuid.uuid4().hex[:12]}', password_hash='x')
+        departure = datetime.utcnow() + timedelta(days=30)
+        trip = ScheduledTrip(
+            departure_city='Abidjan',
+            arrival_city='Bouaké',
+            departure_time=departure,
+            arrival_time=departure + timedelta(hours=5),
+            price=5000,
+            total_seats=seats,
+            driver_name='Stress Test',
+            driver_phone='0000000000',
+            status='active'
+        )
+        db.session.add_all([user, trip])
+        db.session.flush()
+        inventory.create_counters(trip, seats, slots=slots)
+        db.session.commit()
+        return user.id, trip.id, create_access_token(identity=user.id)
+
+
+def fire(app, method, url, token, payload=None):
+    client = app.test_client()
+    response = client.open(url, method=method, json=payload, headers={'Authorization': f'Bearer {token}'})
+    return response.status_code, response.get_json()
+
+
+def check_trip(app, trip_id, seats, label):
+    with app.app_context():
+        trip = db.session.get(ScheduledTrip, trip_id)
+        held = db.session.query(db.func.coalesce(db.func.sum(Booking.number_of_seats), 0)).filter(
+            Booking.trip_id == trip_id,
+            Booking.status.in_(('pending', 'confirmed'))
+        ).scalar()
+        ok = trip.available_seats >= 0 and trip.available_seats + held == seats
+        print(f"[{label}] available={trip.available_seats} held={held} total={seats} -> {'OK' if ok else 'FAILED'}")
+        return ok
+
+
+def cleanup(app, user_id, trip_id):
+    with app.app_context():
+        booking_ids = db.session.query(Booking.id).filter(Booking.trip_id == trip_id)
+        Payment.query.filter(Payment.booking_id.in_(booking_ids)).delete(synchronize_session=False)
+        Booking.query.filter(Booking.trip_id == trip_id).delete(synchronize_session=False)
+        ScheduledTrip.query.filter_by(id=trip_id).delete()
+        User.query.filter_by(id=user_id).delete()
+        db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--workers', type=int, default=32)
+    parser.add_argument('--seats', type=int, default=18)
+    parser.add_argument('--max-party', type=int, default=3)
+    parser.add_argument('--slots', type=int, default=1, help='Seat counter slots of the test trip')
+    parser.add_argument('--keep', action='store_true', help='Keep the test user, trip and bookings')
+    args = parser.parse_args()
+
+    app = create_app()
+    user_id, trip_id, token = setup(app, args.seats, args.slots)
+    ok = True
+
+    try:
+        payloads = [{
+            'trip_id': trip_id,
+            'number_of_seats': random.randint(1, args.max_party),
+            'passenger_name': 'Stress Test',
+            'passenger_phone': '0000000000'
+        } for _ in range(args.requests)]
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            results = list(pool.map(lambda p: fire(app, 'POST', '/api/bookings', token, p), payloads))
+        elapsed = time.perf_counter() - started
+
+        created = [body['booking'] for status, body in results if status == 201]
+        rejected = sum(1 for status, _ in results if status == 400)
+        errors = [body for status, body in results if status not in (201, 400)]
+        booked = sum(b['number_of_seats'] for b in created)
+        print(f"bookings: {len(created)} created, {rejected} rejected, {len(errors)} errors "
+              f"in {elapsed:.2f}s ({args.requests / elapsed:.0f} req/s)")
+        if errors:
+            print(f"first error: {errors[0]}")
+        ok &= not errors and booked <= args.seats
+        ok &= check_trip(app, trip_id, args.seats, 'after booking')
+
+        # Cancel each booking twice concurrently: exactly one cancel may win
+        cancels = [b['id'] for b in created for _ in range(2)]
+        random.shuffle(cancels)
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            results = list(pool.map(lambda i: fire(app, 'DELETE', f'/api/bookings/{i}', token), cancels))
+        won = sum(1 for status, _ in results if status == 200)
+        print(f"cancels: {won} succeeded for {len(created)} bookings")
+        ok &= won == len(created)
+        ok &= check_trip(app, trip_id, args.seats, 'after double cancel')
+    finally:
+        if not args.keep:
+            cleanup(app, user_id, trip_id)
+
+    print('PASSED' if ok else 'FAILED')
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
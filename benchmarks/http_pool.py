@@ -0,0 +1,154 @@
+"""
+Payment provider calls, fresh connection per request vs pooled session.
+
+Starts a local stub provider (HTTP/1.1, keep-alive) that counts the TCP
+connections it accepts, then sends the same burst of concurrent POSTs with a
+bare requests.post() per call (the old provider clients) and with the shared
+session from services.http. Reports throughput, latency and connections
+opened for each. Also checks that an idempotent GET answered by a 503 is
+retried while a POST is not.
+
+No database needed:
+
+    python benchmarks/http_pool.py --requests 2000 --workers 16 --delay 5
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests  # noqa: E402
+from config import Config  # noqa: E402
+from services import http  # noqa: E402
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, delay):
+        super().__init__(('127.0.0.1', 0), StubHandler)
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.flaky = 0
+
+    def process_request(self, request, client_address):
+        with self.lock:
+            self.connections += 1
+        super().process_request(request, client_address)
+
+    def reset(self):
+        with self.lock:
+            self.connections = 0
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out as separate writes; without this, delayed ACKs
+    # stall every reused connection by ~40ms
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, body=b'{"status": "SUCCESSFUL"}'):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        # /flaky answers 503 once per request pair, then succeeds
+        if self.path == '/flaky':
+            with self.server.lock:
+                self.server.flaky += 1
+                fail = self.server.flaky % 2 == 1
+            self._reply(503 if fail else 200)
+            return
+        time.sleep(self.server.delay)
+        self._reply(200)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        if self.path == '/flaky':
+            self._reply(503)
+            return
+        time.sleep(self.server.delay)
+        self._reply(202)
+
+
+def run(server, url, label, post, args):
+    payload = {'amount': '5000', 'currency': 'XOF', 'externalId': 'BENCH'}
+
+    def call(_):
+        started = time.perf_counter()
+        response = post(url, json=payload, timeout=http.timeout())
+        return response.status_code, time.perf_counter() - started
+
+    server.reset()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        results = list(pool.map(call, range(args.requests)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for _, latency in results)
+    errors = sum(1 for status, _ in results if status != 202)
+    print(
+        f"[{label}] {len(results)} calls in {elapsed:.2f}s -> {len(results) / elapsed:.0f} calls/s, "
+        f"p50 {latencies[len(latencies) // 2] * 1000:.1f}ms, "
+        f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:.1f}ms, "
+        f"{server.connections} connections, {errors} errors"
+    )
+    return len(results) / elapsed, server.connections, errors
+
+
+def check_retries(server, base):
+    session = http.get_session('bench')
+    server.flaky = 0
+    get = session.get(f'{base}/flaky', timeout=http.timeout())
+    server.flaky = 0
+    post = session.post(f'{base}/flaky', timeout=http.timeout())
+    ok = get.status_code == 200 and post.status_code == 503
+    print(f"[retries] GET after a 503: {get.status_code}, POST after a 503: {post.status_code} (not retried)")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--delay', type=float, default=5, help='Stub provider latency in ms')
+    args = parser.parse_args()
+
+    server = StubServer(args.delay / 1000)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_address[1]}'
+    url = f'{base}/collection/v1_0/requesttopay'
+
+    try:
+        fresh, fresh_connections, fresh_errors = run(server, url, 'requests.post', requests.post, args)
+        session = http.get_session('bench')
+        pooled, pooled_connections, pooled_errors = run(server, url, 'pooled session', session.post, args)
+        print(f"pooled / fresh throughput: {pooled / fresh:.2f}x")
+        retries_ok = check_retries(server, base)
+    finally:
+        http.close_sessions()
+        server.shutdown()
+
+    # The pool never needs more connections than there are concurrent callers
+    ok = (
+        not fresh_errors and not pooled_errors and retries_ok
+        and pooled_connections <= min(args.workers, Config.HTTP_POOL_MAXSIZE)
+    )
+    print('PASSED' if ok else 'FAILED')
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
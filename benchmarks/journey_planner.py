@@ -0,0 +1,132 @@
+"""
+Journey planner on a synthetic network.
+
+Lays out --lines minibus lines of --stops stops each over Abidjan (random
+walks with ~--spacing meters between stops; lines crossing within the
+transfer radius become transfer points), builds services.route_planner's
+graph, then plans --queries random station-to-station journeys twice: with
+the A* heuristic and as plain Dijkstra. Reports build time, graph size,
+latency percentiles, itineraries found and whether both searches agree on
+the cheapest cost. Also checks that alternatives always save a transfer,
+including for a destination served by several lines. No database needed:
+
+    python benchmarks/journey_planner.py --lines 100 --stops 50 --queries 500
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.route_planner import RouteGraph  # noqa: E402
+from services.stop_index import METERS_PER_DEGREE, StopIndex  # noqa: E402
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def build_network(lines, stops, spacing, seed):
+    rng = random.Random(seed)
+    network = []
+    for line in range(lines):
+        line_id = uuid.uuid4()
+        lat, lon = 5.25 + rng.random() * 0.2, -4.1 + rng.random() * 0.25
+        heading = rng.random() * 2 * math.pi
+        for order in range(stops):
+            network.append((uuid.uuid4(), lat, lon, order, line_id, f'Ligne {line}', f'Arret {line}-{order}'))
+            heading += rng.gauss(0, 0.3)
+            step = spacing * rng.uniform(0.6, 1.4) / METERS_PER_DEGREE
+            lat += step * math.cos(heading)
+            lon += step * math.sin(heading) / math.cos(math.radians(lat))
+    return network
+
+
+def check_multi_line_destination():
+    """
+    Start -> Hub on L0, then Hub -> Dest on L1 or on L2 (a station served by
+    both lines). L2 is boarded closer to Hub but reaches Dest further away, so
+    its Dest is queued before L1's is reached: the result must still be one
+    1-transfer itinerary, not a second, costlier one with as many transfers.
+    """
+    lines = [uuid.uuid4() for _ in range(3)]
+    meter = 1 / METERS_PER_DEGREE
+    lat, lon = 5.30, -4.0
+    network = [
+        (uuid.uuid4(), lat, lon, 0, lines[0], 'L0', 'Start'),
+        (uuid.uuid4(), lat, lon + 4000 * meter, 1, lines[0], 'L0', 'Hub'),
+        (uuid.uuid4(), lat + 100 * meter, lon + 4000 * meter, 0, lines[1], 'L1', 'Hub'),
+        (uuid.uuid4(), lat + 1100 * meter, lon + 4000 * meter, 1, lines[1], 'L1', 'Dest'),
+        (uuid.uuid4(), lat - 10 * meter, lon + 4000 * meter, 0, lines[2], 'L2', 'Hub'),
+        (uuid.uuid4(), lat - 1310 * meter, lon + 4000 * meter, 1, lines[2], 'L2', 'Dest')
+    ]
+    graph = RouteGraph(StopIndex(network, 0.01))
+    found = graph.plan(graph.resolve('Start'), graph.resolve('dest'), 3, 3)
+    transfers = [transfers for _, transfers, _ in found]
+    assert transfers == [1], f'expected one 1-transfer itinerary, got transfers {transfers}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lines', type=int, default=100)
+    parser.add_argument('--stops', type=int, default=50, help='Stops per line')
+    parser.add_argument('--spacing', type=float, default=400, help='Mean distance between stops in meters')
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--max-transfers', type=int, default=3)
+    parser.add_argument('--transfer-radius', type=float, default=300)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    check_multi_line_destination()
+    network = build_network(args.lines, args.stops, args.spacing, args.seed)
+    started = time.perf_counter()
+    graph = RouteGraph(StopIndex(network, 0.01), transfer_radius=args.transfer_radius)
+    print(
+        f'graph of {len(graph)} stops, {graph.rides * 2} ride and {graph.transfers} transfer edges '
+        f'built in {(time.perf_counter() - started) * 1000:.0f}ms'
+    )
+
+    rng = random.Random(args.seed + 1)
+    names = [stop[6] for stop in network]
+    timings = {'a*': [], 'dijkstra': []}
+    found = {'a*': 0, 'dijkstra': 0}
+    unreachable = mismatches = 0
+    transfers = {}
+    for _ in range(args.queries):
+        sources, targets = graph.resolve(rng.choice(names)), graph.resolve(rng.choice(names))
+        if set(sources) & set(targets):
+            continue
+        results = {}
+        for name, heuristic in (('a*', True), ('dijkstra', False)):
+            started = time.perf_counter()
+            results[name] = graph.plan(sources, targets, args.max_transfers, 3, heuristic=heuristic)
+            timings[name].append(time.perf_counter() - started)
+            found[name] += len(results[name])
+        if not results['a*']:
+            unreachable += 1
+            continue
+        if abs(results['a*'][0][0] - results['dijkstra'][0][0]) > 1e-6:
+            mismatches += 1
+        # Alternatives must each save a transfer
+        counts = [transfers for _, transfers, _ in results['a*']]
+        assert all(a > b for a, b in zip(counts, counts[1:])), f'not cheaper in transfers: {counts}'
+        best = results['a*'][0][1]
+        transfers[best] = transfers.get(best, 0) + 1
+
+    for name, values in timings.items():
+        print(
+            f'{name:<9} p50 {percentile(values, 0.5) * 1000:7.2f}ms  p95 {percentile(values, 0.95) * 1000:7.2f}ms  '
+            f'p99 {percentile(values, 0.99) * 1000:7.2f}ms  {found[name] / len(values):.2f} itineraries/query'
+        )
+    print(f'{unreachable} unreachable within {args.max_transfers} transfers; '
+          f'transfers on the best itinerary: {dict(sorted(transfers.items()))}')
+    print('A* and Dijkstra agree' if not mismatches else f'{mismatches} queries differ')
+
+
+if __name__ == '__main__':
+    main()
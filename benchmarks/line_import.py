@@ -0,0 +1,180 @@
+"""
+Line importer benchmark on a synthetic workbook.
+
+Builds a workbook of --lines sheets with --stops stops each, coordinates
+written in both spellings the real file uses ('5.26, -3.60' and
+'5,26, -3,60'), then:
+
+  1. parses every sheet the old way (iterrows + one parse per cell) and with
+     services.import_lines.read_sheet (vectorized). No database needed.
+  2. unless --parse-only: imports the workbook into an empty set of lines,
+     re-imports it unchanged, and re-imports it with --change-rate of the
+     stops moved and a few added and removed, reporting the rows written
+     each time. The BENCH lines and their stops are removed afterwards.
+
+Needs a migrated PostgreSQL database (DATABASE_URL) for step 2:
+
+    python benchmarks/line_import.py --lines 20 --stops 500
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd  # noqa: E402
+from services.import_lines import COORDINATES_COLUMN, NAME_COLUMN, import_lines_from_excel, read_sheet  # noqa: E402
+
+
+def legacy_parse(coord_str):
+    # What the importer used to do for each cell
+    if not isinstance(coord_str, str):
+        return None, None
+    try:
+        parts = [p.strip() for p in coord_str.split(',')]
+        if len(parts) == 2:
+            return float(parts[0]), float(parts[1])
+        parts = coord_str.split()
+        if len(parts) == 2:
+            return float(parts[0].strip().rstrip(',').replace(',', '.')), float(parts[1].strip().replace(',', '.'))
+    except Exception:
+        return None, None
+    return None, None
+
+
+def legacy_read_sheet(df):
+    stops = []
+    for index, row in df.iterrows():
+        name = row.get(NAME_COLUMN)
+        if pd.isna(name):
+            continue
+        latitude, longitude = legacy_parse(row.get(COORDINATES_COLUMN))
+        if latitude is None or longitude is None:
+            continue
+        stops.append((str(name).strip(), latitude, longitude, index))
+    return stops
+
+
+def format_coordinates(latitude, longitude, french):
+    if french:
+        return f'{latitude:.7f}, {longitude:.7f}'.replace('.', ',')
+    return f'{latitude:.7f}, {longitude:.7f}'
+
+
+def build_sheets(lines, stops, seed):
+    rng = random.Random(seed)
+    sheets = {}
+    for line in range(lines):
+        rows = []
+        for stop in range(stops):
+            # Abidjan-ish coordinates
+            rows.append({
+                NAME_COLUMN: f'Arret {line}-{stop}',
+                COORDINATES_COLUMN: format_coordinates(
+                    5.2 + rng.random() * 0.3, -4.1 + rng.random() * 0.3, rng.random() < 0.5
+                )
+            })
+        sheets[f'BENCH {line:03d}'] = pd.DataFrame(rows)
+    return sheets
+
+
+def mutate(sheets, change_rate, seed):
+    """Move change_rate of the stops and add/remove a stop on every other line."""
+    rng = random.Random(seed + 1)
+    changed = {}
+    for index, (name, df) in enumerate(sheets.items()):
+        df = df.copy()
+        moved = df.sample(frac=change_rate, random_state=rng.randrange(2 ** 31)).index
+        df.loc[moved, COORDINATES_COLUMN] = [
+            format_coordinates(5.2 + rng.random() * 0.3, -4.1 + rng.random() * 0.3, False) for _ in moved
+        ]
+        if index % 2:
+            df = df.drop(df.index[len(df) // 2])
+            df = pd.concat([df, pd.DataFrame([{
+                NAME_COLUMN: f'Arret {name} new', COORDINATES_COLUMN: '5.3000000, -4.0000000'
+            }])], ignore_index=True)
+        changed[name] = df.reset_index(drop=True)
+    return changed
+
+
+def write_workbook(sheets, path):
+    with pd.ExcelWriter(path, engine='openpyxl') as writer:
+        for name, df in sheets.items():
+            df.to_excel(writer, sheet_name=name, index=False)
+
+
+def bench_parse(sheets):
+    total = sum(len(df) for df in sheets.values())
+    started = time.perf_counter()
+    for df in sheets.values():
+        legacy_read_sheet(df)
+    legacy = time.perf_counter() - started
+    started = time.perf_counter()
+    for df in sheets.values():
+        read_sheet(df)
+    vectorized = time.perf_counter() - started
+    print(f'parse {total} stops: iterrows {legacy * 1000:8.1f}ms  vectorized {vectorized * 1000:8.1f}ms  '
+          f'-> x{legacy / vectorized:.1f}')
+
+
+def cleanup(app, names):
+    from models.public import db, Line, Station, Stop
+    with app.app_context():
+        line_ids = db.session.query(Line.id).filter(Line.name.in_(names))
+        station_ids = [row[0] for row in db.session.query(Stop.station_id).filter(Stop.line_id.in_(line_ids))]
+        Stop.query.filter(Stop.line_id.in_(line_ids)).delete(synchronize_session=False)
+        if station_ids:
+            Station.query.filter(Station.id.in_(station_ids)).delete(synchronize_session=False)
+        Line.query.filter(Line.name.in_(names)).delete(synchronize_session=False)
+        db.session.commit()
+
+
+def bench_import(sheets, args, directory):
+    from app import create_app
+    app = create_app()
+    names = list(sheets)
+    cleanup(app, names)
+
+    original = os.path.join(directory, 'lines.xlsx')
+    modified = os.path.join(directory, 'lines_changed.xlsx')
+    write_workbook(sheets, original)
+    write_workbook(mutate(sheets, args.change_rate, args.seed), modified)
+
+    try:
+        for label, path in (('initial', original), ('unchanged', original), ('changed', modified)):
+            with app.app_context():
+                started = time.perf_counter()
+                totals = import_lines_from_excel(path)
+                elapsed = time.perf_counter() - started
+            written = totals['inserted'] + totals['updated'] + totals['deleted']
+            print(
+                f"{label:<9} {elapsed:7.2f}s  written {written:6d} rows  (inserted {totals['inserted']}, "
+                f"updated {totals['updated']}, deleted {totals['deleted']}, unchanged {totals['unchanged']})"
+            )
+    finally:
+        if not args.keep:
+            cleanup(app, names)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lines', type=int, default=20, help='Sheets in the workbook')
+    parser.add_argument('--stops', type=int, default=500, help='Stops per sheet')
+    parser.add_argument('--change-rate', type=float, default=0.01, help='Share of stops moved for the re-import')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--parse-only', action='store_true', help='Skip the database import')
+    parser.add_argument('--keep', action='store_true', help='Keep the BENCH lines')
+    args = parser.parse_args()
+
+    sheets = build_sheets(args.lines, args.stops, args.seed)
+    bench_parse(sheets)
+    if not args.parse_only:
+        with tempfile.TemporaryDirectory() as directory:
+            bench_import(sheets, args, directory)
+
+
+if __name__ == '__main__':
+    main()
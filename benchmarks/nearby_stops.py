@@ -0,0 +1,75 @@
+"""
+Nearest-stop lookups: grid index (services.stop_index) vs a full NumPy scan.
+
+Builds a synthetic network of --stops stops spread over Abidjan and times
+--lookups random queries of --radius meters with both, checking that they
+return the same stops. No database needed:
+
+    python benchmarks/nearby_stops.py --stops 50000 --radius 500
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+from services.stop_index import StopIndex, haversine_meters  # noqa: E402
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def full_scan(latitudes, longitudes, lat, lon, radius, limit):
+    distances = haversine_meters(lat, lon, latitudes, longitudes)
+    within = np.flatnonzero(distances <= radius)
+    return within[np.argsort(distances[within], kind='stable')][:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--stops', type=int, default=50000)
+    parser.add_argument('--lookups', type=int, default=5000)
+    parser.add_argument('--radius', type=float, default=500, help='Search radius in meters')
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--cell-degrees', type=float, default=0.01)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    stops = [
+        (uuid.uuid4(), 5.2 + rng.random() * 0.3, -4.1 + rng.random() * 0.3, i % 40, uuid.uuid4(), f'Ligne {i // 40}', f'Arret {i}')
+        for i in range(args.stops)
+    ]
+    started = time.perf_counter()
+    index = StopIndex(stops, args.cell_degrees)
+    print(f'built index of {len(index)} stops in {len(index.cells)} cells: {(time.perf_counter() - started) * 1000:.1f}ms')
+
+    queries = [(5.2 + rng.random() * 0.3, -4.1 + rng.random() * 0.3) for _ in range(args.lookups)]
+    grid, scan, mismatches = [], [], 0
+    for lat, lon in queries:
+        started = time.perf_counter()
+        found = index.nearby(lat, lon, args.radius, args.limit)
+        grid.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        expected = full_scan(index.latitudes, index.longitudes, lat, lon, args.radius, args.limit)
+        scan.append(time.perf_counter() - started)
+        if [stop[0] for stop, _ in found] != [index.stops[i][0] for i in expected]:
+            mismatches += 1
+
+    for name, timings in (('grid index', grid), ('full scan', scan)):
+        print(
+            f'{name:<10} p50 {percentile(timings, 0.5) * 1e6:8.1f}us  p99 {percentile(timings, 0.99) * 1e6:8.1f}us  '
+            f'{len(timings) / sum(timings):10.0f} lookups/s'
+        )
+    print('results match' if not mismatches else f'{mismatches} lookups differ')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,204 @@
+"""
+End-to-end payment load test against the provider simulator.
+
+Starts benchmarks/provider_simulator.py in-process, points the Wave, Orange
+Money and MTN MoMo clients at it and serves the app over real HTTP, so the
+simulator's webhooks reach /api/payments/webhook. Then it drives flows at a
+target rate (open loop):
+
+    POST /api/bookings -> POST /api/payments/initiate -> poll
+    GET /api/payments/status/<booking_id> until the payment is final
+
+The webhook inbox is processed in a background thread (and, with --async,
+the payment job worker runs too). Reports throughput, outcomes and
+p50/p95/p99 latency per stage. End-to-end latency is measured from each
+flow's scheduled start, so falling behind the target rate shows up in it.
+
+Needs a migrated PostgreSQL database (DATABASE_URL):
+
+    python benchmarks/payment_load.py --rate 50 --requests 1000 --latency 80 --callback-delay 1
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests  # noqa: E402
+from requests.adapters import HTTPAdapter  # noqa: E402
+from werkzeug.serving import make_server  # noqa: E402
+from app import create_app  # noqa: E402
+from config import Config  # noqa: E402
+from models.public import db  # noqa: E402
+from models.clients import Booking, Payment, PaymentWebhookEvent  # noqa: E402
+from services import payment_jobs, webhook_inbox  # noqa: E402
+from booking_stress import cleanup, setup  # noqa: E402
+from provider_simulator import ProviderSimulator  # noqa: E402
+
+STAGES = ('booking', 'initiate', 'confirm', 'total')
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def process_webhooks(app, stop, interval):
+    config = app.config
+    while not stop.is_set():
+        with app.app_context():
+            try:
+                webhook_inbox.process_inbox(
+                    config['WEBHOOK_BATCH_SIZE'], config['WEBHOOK_UNMATCHED_GRACE_SECONDS'], config['WEBHOOK_RETRY_SECONDS']
+                )
+            except Exception as e:
+                db.session.rollback()
+                print(f'[webhooks] {e}')
+            finally:
+                db.session.remove()
+        stop.wait(interval)
+
+
+def run_flow(session, base, token, trip_id, method, args):
+    headers = {'Authorization': f'Bearer {token}'}
+    timings = {}
+
+    started = time.perf_counter()
+    response = session.post(f'{base}/api/bookings', headers=headers, json={
+        'trip_id': trip_id,
+        'number_of_seats': 1,
+        'passenger_name': 'Payment Load',
+        'passenger_phone': '0700000000'
+    })
+    timings['booking'] = time.perf_counter() - started
+    if response.status_code != 201:
+        return 'booking_error', timings
+    booking_id = response.json()['booking']['id']
+
+    if args.async_initiation:
+        headers = dict(headers, Prefer='respond-async')
+    started = time.perf_counter()
+    response = session.post(f'{base}/api/payments/initiate', headers=headers, json={
+        'booking_id': booking_id,
+        'payment_method': method
+    })
+    timings['initiate'] = time.perf_counter() - started
+    if response.status_code not in (200, 202):
+        return 'initiate_error', timings
+
+    started = time.perf_counter()
+    deadline = started + args.timeout
+    while time.perf_counter() < deadline:
+        response = session.get(f'{base}/api/payments/status/{booking_id}', headers=headers)
+        status = response.json().get('payment', {}).get('status') if response.status_code == 200 else None
+        if status in ('completed', 'failed'):
+            timings['confirm'] = time.perf_counter() - started
+            return status, timings
+        time.sleep(args.poll_interval)
+    return 'timeout', timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rate', type=float, default=50, help='Flows started per second')
+    parser.add_argument('--requests', type=int, default=500, help='Number of flows')
+    parser.add_argument('--workers', type=int, default=128, help='Client threads')
+    parser.add_argument('--methods', default='wave,orange_money,mtn_momo', help='Payment methods, used in turn')
+    parser.add_argument('--async', dest='async_initiation', action='store_true', help='Initiate with Prefer: respond-async')
+    parser.add_argument('--latency', type=float, default=80, help='Simulated provider latency in ms')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of provider API calls answered 503')
+    parser.add_argument('--decline-rate', type=float, default=0.0, help='Share of payments declined')
+    parser.add_argument('--callback-delay', type=float, default=1.0, help='Seconds before the provider calls back')
+    parser.add_argument('--duplicate-rate', type=float, default=0.1, help='Share of callbacks sent twice')
+    parser.add_argument('--poll-interval', type=float, default=0.2, help='Client status polling interval (s)')
+    parser.add_argument('--process-interval', type=float, default=0.2, help='Webhook inbox processing interval (s)')
+    parser.add_argument('--timeout', type=float, default=60, help='Give up on a payment after this many seconds')
+    parser.add_argument('--keep', action='store_true', help='Keep the test user, trip, bookings and payments')
+    args = parser.parse_args()
+    methods = args.methods.split(',')
+
+    simulator = ProviderSimulator(
+        latency=args.latency / 1000, error_rate=args.error_rate, decline_rate=args.decline_rate,
+        callback_delay=args.callback_delay, duplicate_rate=args.duplicate_rate
+    ).start()
+    Config.WAVE_API_URL = f'{simulator.url}/wave'
+    Config.ORANGE_MONEY_API_URL = f'{simulator.url}/orange'
+    Config.MTN_MOMO_API_URL = f'{simulator.url}/mtn'
+
+    app = create_app()
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    base = f'http://127.0.0.1:{server.server_port}'
+    app.config['BASE_URL'] = base
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    stop = threading.Event()
+    threading.Thread(target=process_webhooks, args=(app, stop, args.process_interval), daemon=True).start()
+    if args.async_initiation:
+        # Runs until the process exits
+        threading.Thread(target=payment_jobs.work, args=(app,), daemon=True).start()
+
+    user_id, trip_id, token = setup(app, args.requests)
+    session = requests.Session()
+    session.mount('http://', HTTPAdapter(pool_maxsize=args.workers))
+
+    started = time.perf_counter()
+
+    def flow(index):
+        # Open loop: each flow starts on schedule whether or not earlier ones finished
+        scheduled = started + index / args.rate
+        time.sleep(max(0.0, scheduled - time.perf_counter()))
+        outcome, timings = run_flow(session, base, token, trip_id, methods[index % len(methods)], args)
+        if outcome in ('completed', 'failed'):
+            timings['total'] = time.perf_counter() - scheduled
+        return outcome, timings
+
+    try:
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            results = list(pool.map(flow, range(args.requests)))
+        elapsed = time.perf_counter() - started
+
+        outcomes = {}
+        for outcome, _ in results:
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+        final = outcomes.get('completed', 0) + outcomes.get('failed', 0)
+        print(
+            f"{args.requests} flows at {args.rate:g}/s target: {final} reached a final payment state in {elapsed:.2f}s "
+            f"-> {final / elapsed:.1f} flows/s"
+        )
+        print('outcomes: ' + ', '.join(f'{name}={count}' for name, count in sorted(outcomes.items())))
+        for stage in STAGES:
+            values = [timings[stage] for _, timings in results if stage in timings]
+            if values:
+                print(
+                    f"  {stage:<9} p50 {percentile(values, 0.5) * 1000:7.0f}ms  "
+                    f"p95 {percentile(values, 0.95) * 1000:7.0f}ms  p99 {percentile(values, 0.99) * 1000:7.0f}ms"
+                )
+        print(f'simulator: {simulator.stats}')
+
+        with app.app_context():
+            confirmed = Booking.query.filter_by(trip_id=trip_id, status='confirmed').count()
+            completed = Payment.query.join(Booking).filter(Booking.trip_id == trip_id, Payment.status == 'completed').count()
+        consistent = confirmed == completed == outcomes.get('completed', 0)
+        print(f"confirmed bookings={confirmed} completed payments={completed} -> {'OK' if consistent else 'MISMATCH'}")
+        ok = consistent and final == args.requests
+        print('PASSED' if ok else 'FAILED')
+    finally:
+        stop.set()
+        simulator.stop()
+        server.shutdown()
+        if not args.keep:
+            with app.app_context():
+                transaction_ids = db.session.query(Payment.transaction_id).join(Booking).filter(Booking.trip_id == trip_id)
+                PaymentWebhookEvent.query.filter(
+                    PaymentWebhookEvent.transaction_id.in_(transaction_ids)
+                ).delete(synchronize_session=False)
+                db.session.commit()
+            cleanup(app, user_id, trip_id)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,238 @@
+"""
+Local stand-in for the Wave, Orange Money and MTN MoMo APIs.
+
+Serves the endpoints our provider clients call, under one prefix per
+provider, and later posts the payment outcome to the callback URL each
+initiation carried (our /api/payments/webhook):
+
+    Wave          POST /wave/payments, GET /wave/payments/<id>
+    Orange Money  POST /orange/ci/v1/webpayment, GET /orange/ci/v1/transactionstatus
+    MTN MoMo      POST /mtn/collection/token/, POST /mtn/collection/v1_0/requesttopay,
+                  GET /mtn/collection/v1_0/requesttopay/<reference>
+
+Latency, API error rate, decline rate, callback delay and duplicate
+callbacks are configurable. Point the app at it with:
+
+    WAVE_API_URL=http://127.0.0.1:8900/wave
+    ORANGE_MONEY_API_URL=http://127.0.0.1:8900/orange
+    MTN_MOMO_API_URL=http://127.0.0.1:8900/mtn
+
+    python benchmarks/provider_simulator.py --port 8900 --latency 80 --callback-delay 2
+
+benchmarks/payment_load.py starts one in-process.
+"""
+import argparse
+import heapq
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+# What each provider calls a final state
+_OUTCOMES = {
+    'wave': {'completed': 'succeeded', 'failed': 'failed', 'pending': 'processing'},
+    'orange': {'completed': 'SUCCESS', 'failed': 'FAILED', 'pending': 'PENDING'},
+    'mtn': {'completed': 'SUCCESSFUL', 'failed': 'FAILED', 'pending': 'PENDING'}
+}
+
+
+class ProviderSimulator(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.05, jitter=0.5, error_rate=0.0,
+                 decline_rate=0.0, callback_delay=1.0, duplicate_rate=0.0, callback_workers=8):
+        super().__init__((host, port), SimulatorHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.decline_rate = decline_rate
+        self.callback_delay = callback_delay
+        self.duplicate_rate = duplicate_rate
+        self.lock = threading.Lock()
+        # transaction id -> {'provider', 'outcome', 'status'}
+        self.payments = {}
+        self.stats = {'requests': 0, 'errors': 0, 'tokens': 0, 'initiated': 0, 'verified': 0,
+                      'callbacks': 0, 'duplicates': 0, 'callback_errors': 0}
+        self._callbacks = []
+        self._callbacks_ready = threading.Condition(self.lock)
+        self._callback_session = requests.Session()
+        self._stopping = False
+        self._threads = [
+            threading.Thread(target=self._send_callbacks, name=f'callbacks-{index}', daemon=True)
+            for index in range(callback_workers)
+        ]
+
+    @property
+    def url(self):
+        return f'http://{self.server_address[0]}:{self.server_address[1]}'
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+        threading.Thread(target=self.serve_forever, name='provider-simulator', daemon=True).start()
+        return self
+
+    def stop(self):
+        with self.lock:
+            self._stopping = True
+            self._callbacks_ready.notify_all()
+        self.shutdown()
+
+    def count(self, key, amount=1):
+        with self.lock:
+            self.stats[key] += amount
+
+    def delay(self):
+        if self.latency > 0:
+            time.sleep(self.latency * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+    def register(self, provider, transaction_id, callback_url):
+        """Record an initiation and schedule its callback."""
+        outcome = 'failed' if random.random() < self.decline_rate else 'completed'
+        with self.lock:
+            self.payments[transaction_id] = {'provider': provider, 'outcome': outcome, 'status': 'pending'}
+            self.stats['initiated'] += 1
+            if callback_url:
+                due = time.monotonic() + self.callback_delay
+                heapq.heappush(self._callbacks, (due, transaction_id, callback_url))
+                if random.random() < self.duplicate_rate:
+                    heapq.heappush(self._callbacks, (due + self.callback_delay / 2, transaction_id, callback_url))
+                    self.stats['duplicates'] += 1
+                self._callbacks_ready.notify()
+
+    def status(self, transaction_id):
+        with self.lock:
+            payment = self.payments.get(transaction_id)
+            if payment is None:
+                return None
+            return _OUTCOMES[payment['provider']][payment['status']]
+
+    def _send_callbacks(self):
+        while True:
+            with self.lock:
+                while not self._stopping and (not self._callbacks or self._callbacks[0][0] > time.monotonic()):
+                    wait = self._callbacks[0][0] - time.monotonic() if self._callbacks else None
+                    self._callbacks_ready.wait(wait)
+                if self._stopping:
+                    return
+                _, transaction_id, callback_url = heapq.heappop(self._callbacks)
+                payment = self.payments[transaction_id]
+                payment['status'] = payment['outcome']
+                status = _OUTCOMES[payment['provider']][payment['outcome']]
+            try:
+                self._callback_session.post(
+                    callback_url, json={'transaction_id': transaction_id, 'status': status}, timeout=10
+                )
+                self.count('callbacks')
+            except requests.RequestException:
+                self.count('callback_errors')
+
+
+class SimulatorHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _status(self, status, **fields):
+        if status is None:
+            self._reply(404, {'error': 'unknown transaction'})
+        else:
+            self._reply(200, dict(fields, status=status))
+
+    def _json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def _failing(self):
+        server = self.server
+        server.count('requests')
+        server.delay()
+        if random.random() < server.error_rate:
+            server.count('errors')
+            self._reply(503, {'error': 'simulated provider outage'})
+            return True
+        return False
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        payload = self._json()
+        if self._failing():
+            return
+        server = self.server
+
+        if path == '/wave/payments':
+            transaction_id = f'wave-{uuid.uuid4().hex[:16]}'
+            server.register('wave', transaction_id, payload.get('callback_url'))
+            self._reply(201, {'id': transaction_id, 'payment_url': f'{server.url}/pay/{transaction_id}'})
+        elif path == '/orange/ci/v1/webpayment':
+            pay_token = f'om-{uuid.uuid4().hex[:16]}'
+            server.register('orange', pay_token, payload.get('notif_url'))
+            self._reply(201, {'pay_token': pay_token, 'payment_url': f'{server.url}/pay/{pay_token}'})
+        elif path == '/mtn/collection/token/':
+            server.count('tokens')
+            self._reply(200, {'access_token': uuid.uuid4().hex, 'token_type': 'access_token', 'expires_in': 3600})
+        elif path == '/mtn/collection/v1_0/requesttopay':
+            server.register('mtn', self.headers.get('X-Reference-Id'), self.headers.get('X-Callback-Url'))
+            self._reply(202, {})
+        else:
+            self._reply(404, {'error': f'unknown endpoint {path}'})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if self._failing():
+            return
+        server = self.server
+        server.count('verified')
+
+        if url.path.startswith('/wave/payments/'):
+            transaction_id = url.path.rsplit('/', 1)[1]
+            self._status(server.status(transaction_id), id=transaction_id)
+        elif url.path == '/orange/ci/v1/transactionstatus':
+            self._status(server.status(parse_qs(url.query).get('order_id', [''])[0]))
+        elif url.path.startswith('/mtn/collection/v1_0/requesttopay/'):
+            self._status(server.status(url.path.rsplit('/', 1)[1]))
+        else:
+            self._reply(404, {'error': f'unknown endpoint {url.path}'})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--latency', type=float, default=50, help='Mean API latency in ms')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of API calls answered 503')
+    parser.add_argument('--decline-rate', type=float, default=0.0, help='Share of payments that end up failed')
+    parser.add_argument('--callback-delay', type=float, default=1.0, help='Seconds between initiation and webhook')
+    parser.add_argument('--duplicate-rate', type=float, default=0.0, help='Share of webhooks sent twice')
+    args = parser.parse_args()
+
+    simulator = ProviderSimulator(
+        args.host, args.port, latency=args.latency / 1000, error_rate=args.error_rate,
+        decline_rate=args.decline_rate, callback_delay=args.callback_delay, duplicate_rate=args.duplicate_rate
+    ).start()
+    print(f'Provider simulator on {simulator.url} (Ctrl+C to stop)')
+    try:
+        while True:
+            time.sleep(10)
+            print(simulator.stats)
+    except KeyboardInterrupt:
+        simulator.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Booking throughput on one hot trip, single seat counter vs striped counters.
+
+Creates two identical trips, one with a single seat counter row (every
+booking locks the same row, as when seats lived on scheduled_trips) and one
+striped into --slots rows, then fires the same burst of concurrent
+POST /api/bookings at each and reports throughput and latency. Seat totals
+are checked against the bookings after each run.
+
+Needs a migrated PostgreSQL database (DATABASE_URL):
+
+    python benchmarks/seat_counter_contention.py --requests 2000 --workers 64 --slots 16
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from booking_stress import check_trip, cleanup, fire, setup  # noqa: E402
+
+
+def run(app, label, slots, args):
+    user_id, trip_id, token = setup(app, args.seats, slots)
+    payload = {
+        'trip_id': trip_id,
+        'number_of_seats': 1,
+        'passenger_name': 'Contention Test',
+        'passenger_phone': '0000000000'
+    }
+
+    def book(_):
+        started = time.perf_counter()
+        status, _ = fire(app, 'POST', '/api/bookings', token, payload)
+        return status, time.perf_counter() - started
+
+    try:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            results = list(pool.map(book, range(args.requests)))
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(latency for _, latency in results)
+        created = sum(1 for status, _ in results if status == 201)
+        errors = sum(1 for status, _ in results if status not in (201, 400))
+        print(
+            f"[{label}] {created} bookings in {elapsed:.2f}s -> {created / elapsed:.0f} bookings/s, "
+            f"p50 {latencies[len(latencies) // 2] * 1000:.0f}ms, "
+            f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:.0f}ms, {errors} errors"
+        )
+        ok = check_trip(app, trip_id, args.seats, label) and not errors
+        return created / elapsed, ok
+    finally:
+        if not args.keep:
+            cleanup(app, user_id, trip_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--workers', type=int, default=64)
+    parser.add_argument('--slots', type=int, default=16, help='Seat counter slots of the striped trip')
+    parser.add_argument('--seats', type=int, default=None, help='Trip capacity (default: enough for every request)')
+    parser.add_argument('--keep', action='store_true', help='Keep the test users, trips and bookings')
+    args = parser.parse_args()
+    args.seats = args.seats or args.requests
+
+    app = create_app()
+    single, single_ok = run(app, '1 slot', 1, args)
+    striped, striped_ok = run(app, f'{args.slots} slots', args.slots, args)
+    print(f"striped / single throughput: {striped / single:.2f}x")
+
+    ok = single_ok and striped_ok
+    print('PASSED' if ok else 'FAILED')
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,267 @@
+import click
+from flask.cli import AppGroup
+
+trips_cli = AppGroup('trips', help='Scheduled trip maintenance commands.')
+bookings_cli = AppGroup('bookings', help='Booking maintenance commands.')
+payments_cli = AppGroup('payments', help='Payment worker commands.')
+lines_cli = AppGroup('lines', help='Line catalog commands.')
+scheduler_cli = AppGroup('scheduler', help='Background job commands.')
+
+
+@trips_cli.command('explain-search')
+@click.option('--from', 'departure_city', default='Abidjan', help='Departure city to search for.')
+@click.option('--to', 'arrival_city', default=None, help='Arrival city to search for.')
+@click.option('--date', 'date', default=None, help='Travel date (YYYY-MM-DD).')
+@click.option('--allow-seqscan', is_flag=True, help='Let the planner pick a seq scan if it is cheaper.')
+def explain_search_command(departure_city, arrival_city, date, allow_seqscan):
+    """EXPLAIN the trip search query and fail unless a search index serves it."""
+    from services.trip_search import SEARCH_INDEXES, explain_search, parse_search_date
+
+    date_obj = parse_search_date(date) if date else None
+    plan, indexes = explain_search(departure_city, arrival_city, date_obj, disable_seqscan=not allow_seqscan)
+
+    click.echo(f"Plan root: {plan[0]['Plan']['Node Type']}")
+    click.echo(f"Indexes used: {', '.join(indexes) or 'none'}")
+
+    if not set(indexes) & set(SEARCH_INDEXES):
+        raise click.ClickException('Trip search is not using a search index')
+    click.echo('OK: trip search is index-backed')
+
+
+@trips_cli.command('check-query-budgets')
+def check_query_budgets_command():
+    """Call the endpoints that declare a query budget, with budgets enforced."""
+    from flask import current_app
+    from flask_jwt_extended import create_access_token
+    from models.clients import Booking
+    from models.partners import ScheduledTrip
+    from models.public import User
+
+    app = current_app._get_current_object()
+    app.config['QUERY_BUDGET_CHECKS'] = True
+    # Budget overruns raise AssertionError: let them reach the test client
+    app.config['PROPAGATE_EXCEPTIONS'] = True
+
+    trip = ScheduledTrip.query.order_by(ScheduledTrip.departure_time.desc()).first()
+    booking = Booking.query.order_by(Booking.id.desc()).first()
+    admin = User.query.filter_by(role='admin').first()
+    checks = []
+    if trip:
+        cities = f'departure_city={trip.departure_city}&arrival_city={trip.arrival_city}'
+        checks += [
+            (f'/api/trips?{cities}', None),
+            (f'/api/trips?{cities}&stream=1', None),
+            (f'/api/trips/calendar?{cities}&start={trip.departure_time.date().isoformat()}', None),
+            (f'/api/trips/{trip.id}', None),
+            (f'/api/trips/{trip.id}/seats', None)
+        ]
+    if booking:
+        checks += [
+            ('/api/bookings', booking.user_id),
+            (f'/api/bookings/{booking.id}', booking.user_id),
+            (f'/api/payments/status/{booking.id}', booking.user_id)
+        ]
+    if admin:
+        checks += [('/api/vehicles', admin.id), ('/api/vehicles/available', admin.id)]
+    if not checks:
+        raise click.ClickException('No trips, bookings or admin user to check against')
+
+    client = app.test_client()
+    failures = 0
+    for url, user_id in checks:
+        headers = {'Authorization': f'Bearer {create_access_token(identity=user_id)}'} if user_id else {}
+        try:
+            response = client.get(url, headers=headers)
+            # Streamed bodies run their queries here
+            response.get_data()
+            click.echo(f'OK    {response.status_code} {url}')
+        except AssertionError as e:
+            failures += 1
+            click.echo(f'OVER  {url}\n{e}')
+    if failures:
+        raise click.ClickException(f'{failures} endpoints exceeded their query budget')
+    click.echo(f'All {len(checks)} endpoints within their query budget')
+
+
+@trips_cli.command('rebuild-availability')
+def rebuild_availability_command():
+    """Recompute the route/date availability rollup from scheduled_trips."""
+    from services import availability
+
+    rows = availability.rebuild_all()
+    click.echo(f'Rebuilt {rows} route/date availability rows')
+
+
+@trips_cli.command('fold-availability')
+def fold_availability_command():
+    """Merge pending seat deltas into the route/date availability rollup."""
+    from services import availability
+
+    click.echo(f'Folded {availability.fold_seat_deltas()} seat deltas')
+
+
+@trips_cli.command('reconcile-seats')
+def reconcile_seats_command():
+    """Rebalance striped seat counters and correct them against the bookings."""
+    from services.seat_reconciler import reconcile_seat_counters
+
+    totals = reconcile_seat_counters()
+    click.echo(
+        f"Checked {totals['trips']} trips: rebalanced {totals['rebalanced']}, "
+        f"corrected {totals['corrected']} ({totals['seats']:+d} seats)"
+    )
+
+
+@trips_cli.command('stripe-seats')
+@click.argument('trip_id', type=int)
+@click.option('--slots', type=int, required=True, help='Number of seat counter slots.')
+def stripe_seats_command(trip_id, slots):
+    """Split a trip's seat counter into SLOTS rows for a busy departure."""
+    from services.seat_reconciler import stripe_trip
+
+    if slots < 1:
+        raise click.BadParameter('must be at least 1', param_hint='--slots')
+    result = stripe_trip(trip_id, slots)
+    if result is None:
+        raise click.ClickException(f'Trip {trip_id} has no seat counters')
+    rows, _ = result
+    if rows is None:
+        click.echo(f'Trip {trip_id} already has {slots} balanced slots')
+    else:
+        click.echo(f"Trip {trip_id}: {', '.join(str(row['available_seats']) for row in rows)} seats per slot")
+
+
+@bookings_cli.command('sweep-holds')
+@click.option('--batch-size', type=int, default=None, help='Bookings expired per statement.')
+def sweep_holds_command(batch_size):
+    """Expire unpaid pending bookings whose hold has passed and release their seats."""
+    from flask import current_app
+    from services.hold_sweeper import sweep_expired_holds
+
+    totals = sweep_expired_holds(batch_size or current_app.config['HOLD_SWEEP_BATCH_SIZE'])
+    click.echo(f"Expired {totals['bookings']} bookings, released {totals['seats']} seats on {totals['trips']} trips")
+
+
+@bookings_cli.command('purge-idempotency-keys')
+def purge_idempotency_keys_command():
+    """Delete expired Idempotency-Key records."""
+    from services.idempotency import purge_expired
+
+    click.echo(f'Purged {purge_expired()} expired idempotency keys')
+
+
+@bookings_cli.command('promote-waitlist')
+@click.option('--max-trips', type=int, default=None, help='Trips handled in this run.')
+def promote_waitlist_command(max_trips):
+    """Turn waitlist entries into pending bookings on trips with free seats."""
+    from flask import current_app
+    from services.waitlist import promote_waitlisted
+
+    config = current_app.config
+    totals = promote_waitlisted(config['WAITLIST_HOLD_TTL_MINUTES'], max_trips or config['WAITLIST_PROMOTE_BATCH_SIZE'])
+    click.echo(
+        f"Promoted {totals['bookings']} entries ({totals['seats']} seats) on {totals['trips']} trips, "
+        f"expired {totals['expired']} entries"
+    )
+
+
+@payments_cli.command('work')
+@click.option('--provider', 'providers', multiple=True, help='Only drain this provider\'s queue (repeatable).')
+@click.option('--once', is_flag=True, help='Exit once no job is due instead of polling.')
+def payments_work_command(providers, once):
+    """Run queued payment initiations with bounded concurrency per provider."""
+    from flask import current_app
+    from services.payment_jobs import work
+    from services.payment_providers import PROVIDERS
+
+    unknown = set(providers) - set(PROVIDERS)
+    if unknown:
+        raise click.BadParameter(f"unknown provider {', '.join(sorted(unknown))}", param_hint='--provider')
+    app = current_app._get_current_object()
+    totals = work(app, list(providers) or None, once=once)
+    click.echo(f"Initiated {totals['done']} payments, {totals['retry']} to retry, {totals['failed']} failed")
+
+
+@payments_cli.command('process-webhooks')
+@click.option('--batch-size', type=int, default=None, help='Callbacks applied per transaction.')
+def process_webhooks_command(batch_size):
+    """Apply received provider callbacks to payments and bookings."""
+    from flask import current_app
+    from services.webhook_inbox import process_inbox
+
+    config = current_app.config
+    totals = process_inbox(
+        batch_size or config['WEBHOOK_BATCH_SIZE'],
+        config['WEBHOOK_UNMATCHED_GRACE_SECONDS'],
+        config['WEBHOOK_RETRY_SECONDS']
+    )
+    click.echo(
+        f"Processed {totals['events']} callbacks: {totals['applied']} applied, "
+        f"{totals['deferred']} waiting for their payment"
+    )
+
+
+@payments_cli.command('reconcile')
+@click.option('--stale-minutes', type=int, default=None, help='Check payments pending for at least this long.')
+@click.option('--concurrency', type=int, default=None, help='Concurrent status checks per provider.')
+@click.option('--page-size', type=int, default=None, help='Payments read per page.')
+def reconcile_payments_command(stale_minutes, concurrency, page_size):
+    """Check stale pending payments with their provider and apply the answers."""
+    from flask import current_app
+    from services.payment_reconciler import reconcile_pending_payments
+
+    config = current_app.config
+    totals = reconcile_pending_payments(
+        stale_minutes if stale_minutes is not None else config['PAYMENT_RECONCILE_STALE_MINUTES'],
+        page_size or config['PAYMENT_RECONCILE_PAGE_SIZE'],
+        concurrency or config['PAYMENT_RECONCILE_CONCURRENCY'],
+        config['PAYMENT_RECONCILE_MAX_AGE_HOURS']
+    )
+    providers = ', '.join(f'{provider}: {count}' for provider, count in totals['providers'].items()) or 'none'
+    click.echo(
+        f"Checked {totals['payments']} payments in {totals['seconds']}s ({totals['per_second']}/s; {providers}): "
+        f"{totals['completed']} completed, {totals['failed']} failed, {totals['pending']} still pending, "
+        f"{totals['errors']} errors; {totals['applied']} changes applied"
+    )
+
+
+@lines_cli.command('import')
+@click.option('--file', 'file_path', default=None, help='Workbook to import (default: LINES_FILE).')
+@click.option('--force', is_flag=True, help='Import even if the workbook is unchanged since the last import.')
+def import_lines_command(file_path, force):
+    """Import lines and their stops from the Excel workbook if it changed."""
+    from flask import current_app
+    from services.lines_file import import_if_changed
+
+    totals = import_if_changed(file_path or current_app.config['LINES_FILE'], force=force)
+    if totals is None:
+        click.echo('Nothing imported')
+        return
+    click.echo(
+        f"Imported {totals['lines']} lines: {totals['inserted']} stops added, {totals['updated']} updated, "
+        f"{totals['deleted']} removed, {totals['unchanged']} unchanged, {totals['skipped']} skipped"
+    )
+    if totals['failed']:
+        raise click.ClickException(f"{totals['failed']} lines could not be saved")
+
+
+@scheduler_cli.command('run')
+def run_scheduler_command():
+    """Run the background jobs in this process until interrupted."""
+    from flask import current_app
+
+    scheduler = current_app.extensions['scheduler']
+    click.echo(f"Running {', '.join(job['name'] for job in scheduler.jobs)}")
+    try:
+        scheduler.run()
+    except KeyboardInterrupt:
+        scheduler.stop()
+
+
+def register_commands(app):
+    """Attach the maintenance CLI groups to the app (`flask trips ...`)."""
+    app.cli.add_command(trips_cli)
+    app.cli.add_command(bookings_cli)
+    app.cli.add_command(payments_cli)
+    app.cli.add_command(lines_cli)
+    app.cli.add_command(scheduler_cli)
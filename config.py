@@ -22,4 +22,117 @@ class Config:
     MTN_MOMO_API_KEY = os.environ.get('MTN_MOMO_API_KEY') or ''
     MTN_MOMO_SUBSCRIPTION_KEY = os.environ.get('MTN_MOMO_SUBSCRIPTION_KEY') or ''
     MTN_MOMO_API_URL = os.environ.get('MTN_MOMO_API_URL') or 'https://sandbox.momodeveloper.mtn.com'
-
+    
+    # Payment provider HTTP clients: keep-alive connections per provider (size the
+    # pool to the number of worker threads), timeouts in seconds, retries with backoff
+    HTTP_POOL_MAXSIZE = int(os.environ.get('HTTP_POOL_MAXSIZE') or 20)
+    HTTP_CONNECT_TIMEOUT = float(os.environ.get('HTTP_CONNECT_TIMEOUT') or 3.05)
+    HTTP_READ_TIMEOUT = float(os.environ.get('HTTP_READ_TIMEOUT') or 20)
+    HTTP_RETRIES = int(os.environ.get('HTTP_RETRIES') or 2)
+    HTTP_RETRY_BACKOFF = float(os.environ.get('HTTP_RETRY_BACKOFF') or 0.3)
+    # Read timeout follows observed latency: p99 x multiplier, between the minimum and HTTP_READ_TIMEOUT
+    HTTP_MIN_READ_TIMEOUT = float(os.environ.get('HTTP_MIN_READ_TIMEOUT') or 2)
+    HTTP_TIMEOUT_P99_MULTIPLIER = float(os.environ.get('HTTP_TIMEOUT_P99_MULTIPLIER') or 3)
+    
+    # Per-provider circuit breaker over the last CIRCUIT_WINDOW_SIZE calls: opens on too
+    # many failed or slow calls, rejects calls for CIRCUIT_OPEN_SECONDS, then probes
+    CIRCUIT_WINDOW_SIZE = int(os.environ.get('CIRCUIT_WINDOW_SIZE') or 50)
+    CIRCUIT_MIN_CALLS = int(os.environ.get('CIRCUIT_MIN_CALLS') or 10)
+    CIRCUIT_FAILURE_RATE = float(os.environ.get('CIRCUIT_FAILURE_RATE') or 0.5)
+    CIRCUIT_SLOW_CALL_SECONDS = float(os.environ.get('CIRCUIT_SLOW_CALL_SECONDS') or 5)
+    CIRCUIT_SLOW_CALL_RATE = float(os.environ.get('CIRCUIT_SLOW_CALL_RATE') or 0.8)
+    CIRCUIT_OPEN_SECONDS = int(os.environ.get('CIRCUIT_OPEN_SECONDS') or 30)
+    CIRCUIT_HALF_OPEN_PROBES = int(os.environ.get('CIRCUIT_HALF_OPEN_PROBES') or 1)
+    # Asynchronous payment initiation (also per request with `Prefer: respond-async`):
+    # /initiate queues the provider call and `flask payments work` drains the queue
+    PAYMENT_ASYNC_INITIATION = os.environ.get('PAYMENT_ASYNC_INITIATION', '').lower() in ('1', 'true', 'yes')
+    PAYMENT_WORKER_CONCURRENCY = int(os.environ.get('PAYMENT_WORKER_CONCURRENCY') or 8)
+    PAYMENT_WORKER_POLL_SECONDS = float(os.environ.get('PAYMENT_WORKER_POLL_SECONDS') or 1)
+    PAYMENT_JOB_MAX_ATTEMPTS = int(os.environ.get('PAYMENT_JOB_MAX_ATTEMPTS') or 3)
+    PAYMENT_JOB_RETRY_BACKOFF_SECONDS = int(os.environ.get('PAYMENT_JOB_RETRY_BACKOFF_SECONDS') or 10)
+    PAYMENT_JOB_LEASE_SECONDS = int(os.environ.get('PAYMENT_JOB_LEASE_SECONDS') or 120)
+    
+    # Payment webhook inbox: callbacks are applied in batches; callbacks matching no
+    # payment yet are retried until the grace period is over
+    WEBHOOK_BATCH_SIZE = int(os.environ.get('WEBHOOK_BATCH_SIZE') or 500)
+    WEBHOOK_UNMATCHED_GRACE_SECONDS = int(os.environ.get('WEBHOOK_UNMATCHED_GRACE_SECONDS') or 600)
+    WEBHOOK_RETRY_SECONDS = int(os.environ.get('WEBHOOK_RETRY_SECONDS') or 15)
+    
+    # Status checks of payments still pending this long after their last update
+    # (webhook lost), threads per provider, payments read per page
+    PAYMENT_RECONCILE_STALE_MINUTES = int(os.environ.get('PAYMENT_RECONCILE_STALE_MINUTES') or 10)
+    PAYMENT_RECONCILE_MAX_AGE_HOURS = int(os.environ.get('PAYMENT_RECONCILE_MAX_AGE_HOURS') or 48)
+    PAYMENT_RECONCILE_CONCURRENCY = int(os.environ.get('PAYMENT_RECONCILE_CONCURRENCY') or 8)
+    PAYMENT_RECONCILE_PAGE_SIZE = int(os.environ.get('PAYMENT_RECONCILE_PAGE_SIZE') or 200)
+    
+    # Provider access tokens are refreshed this many seconds before they expire
+    PROVIDER_TOKEN_REFRESH_MARGIN_SECONDS = int(os.environ.get('PROVIDER_TOKEN_REFRESH_MARGIN_SECONDS') or 60)
+    
+    # Trip search pagination
+    TRIPS_PAGE_SIZE = int(os.environ.get('TRIPS_PAGE_SIZE') or 50)
+    TRIPS_MAX_PAGE_SIZE = int(os.environ.get('TRIPS_MAX_PAGE_SIZE') or 200)
+    TRIPS_STREAM_BATCH_SIZE = int(os.environ.get('TRIPS_STREAM_BATCH_SIZE') or 500)
+    
+    # In-process trip search cache (size 0 or TTL 0 disables it)
+    TRIP_SEARCH_CACHE_SIZE = int(os.environ.get('TRIP_SEARCH_CACHE_SIZE') or 512)
+    TRIP_SEARCH_CACHE_TTL = int(os.environ.get('TRIP_SEARCH_CACHE_TTL') or 30)
+    
+    # In-memory grid index of all stops for GET /api/stops/nearby: cell size in degrees
+    # (0.01 ~ 1.1 km), seconds between checks of the lines catalog version, radius bounds
+    STOP_INDEX_CELL_DEGREES = float(os.environ.get('STOP_INDEX_CELL_DEGREES') or 0.01)
+    STOP_INDEX_CHECK_SECONDS = int(os.environ.get('STOP_INDEX_CHECK_SECONDS') or 30)
+    STOPS_NEARBY_DEFAULT_RADIUS_METERS = int(os.environ.get('STOPS_NEARBY_DEFAULT_RADIUS_METERS') or 500)
+    STOPS_NEARBY_MAX_RADIUS_METERS = int(os.environ.get('STOPS_NEARBY_MAX_RADIUS_METERS') or 5000)
+    STOPS_NEARBY_MAX_LIMIT = int(os.environ.get('STOPS_NEARBY_MAX_LIMIT') or 100)
+    
+    # Journey planner (GET /api/routes/plan): stops of different lines this close are
+    # transfer points; a transfer costs PLAN_TRANSFER_PENALTY_METERS plus the walk
+    # (x PLAN_WALK_FACTOR) on top of the distance ridden
+    PLAN_TRANSFER_RADIUS_METERS = int(os.environ.get('PLAN_TRANSFER_RADIUS_METERS') or 300)
+    PLAN_TRANSFER_PENALTY_METERS = int(os.environ.get('PLAN_TRANSFER_PENALTY_METERS') or 2000)
+    PLAN_WALK_FACTOR = float(os.environ.get('PLAN_WALK_FACTOR') or 2.0)
+    PLAN_MAX_TRANSFERS = int(os.environ.get('PLAN_MAX_TRANSFERS') or 3)
+    PLAN_MAX_ITINERARIES = int(os.environ.get('PLAN_MAX_ITINERARIES') or 3)
+    
+    # Fail requests that exceed the per-endpoint query budgets (tests/profiling only)
+    QUERY_BUDGET_CHECKS = os.environ.get('QUERY_BUDGET_CHECKS', '').lower() in ('1', 'true', 'yes')
+    
+    # Unpaid pending bookings release their seats after this many minutes
+    BOOKING_HOLD_TTL_MINUTES = int(os.environ.get('BOOKING_HOLD_TTL_MINUTES') or 15)
+    HOLD_SWEEP_BATCH_SIZE = int(os.environ.get('HOLD_SWEEP_BATCH_SIZE') or 1000)
+    
+    # Booking history pagination
+    BOOKINGS_PAGE_SIZE = int(os.environ.get('BOOKINGS_PAGE_SIZE') or 20)
+    BOOKINGS_MAX_PAGE_SIZE = int(os.environ.get('BOOKINGS_MAX_PAGE_SIZE') or 100)
+    
+    # Maximum number of items in one POST /api/bookings/batch request
+    BOOKING_BATCH_MAX_ITEMS = int(os.environ.get('BOOKING_BATCH_MAX_ITEMS') or 20)
+    
+    # Waitlist: hold given to bookings promoted from the waitlist, trips handled per run
+    WAITLIST_HOLD_TTL_MINUTES = int(os.environ.get('WAITLIST_HOLD_TTL_MINUTES') or 60)
+    WAITLIST_PROMOTE_BATCH_SIZE = int(os.environ.get('WAITLIST_PROMOTE_BATCH_SIZE') or 100)
+    
+    # Seat counter slots per new trip; raise it (or run `flask trips stripe-seats`)
+    # for departures booked by many users at once
+    SEAT_COUNTER_SLOTS = max(1, int(os.environ.get('SEAT_COUNTER_SLOTS') or 1))
+    
+    # Idempotency-Key support on booking creation and payment initiation
+    IDEMPOTENCY_TTL_SECONDS = int(os.environ.get('IDEMPOTENCY_TTL_SECONDS') or 3600)
+    IDEMPOTENCY_WAIT_SECONDS = int(os.environ.get('IDEMPOTENCY_WAIT_SECONDS') or 10)
+    
+    # Line workbook imported at server start: 'background' (once the server is up),
+    # 'inline' (before it starts) or 'off' (run `flask lines import` instead).
+    # Skipped while the file's content hash matches the last import.
+    LINES_FILE = os.environ.get('LINES_FILE', 'lines.xlsx')
+    LINES_STARTUP_IMPORT = os.environ.get('LINES_STARTUP_IMPORT', 'background').lower()
+    
+    # In-app maintenance jobs (hold sweeper, ...); disable when they run from cron/CLI.
+    # Webhook processing and waitlist promotion always run unless their interval is 0.
+    SCHEDULER_ENABLED = os.environ.get('SCHEDULER_ENABLED', '').lower() in ('1', 'true', 'yes')
+    HOLD_SWEEP_INTERVAL_SECONDS = int(os.environ.get('HOLD_SWEEP_INTERVAL_SECONDS') or 60)
+    IDEMPOTENCY_PURGE_INTERVAL_SECONDS = int(os.environ.get('IDEMPOTENCY_PURGE_INTERVAL_SECONDS') or 600)
+    SEAT_RECONCILE_INTERVAL_SECONDS = int(os.environ.get('SEAT_RECONCILE_INTERVAL_SECONDS') or 600)
+    AVAILABILITY_FOLD_INTERVAL_SECONDS = int(os.environ.get('AVAILABILITY_FOLD_INTERVAL_SECONDS') or 60)
+    WAITLIST_PROMOTE_INTERVAL_SECONDS = int(os.environ.get('WAITLIST_PROMOTE_INTERVAL_SECONDS') or 30)
+    WEBHOOK_PROCESS_INTERVAL_SECONDS = int(os.environ.get('WEBHOOK_PROCESS_INTERVAL_SECONDS') or 2)
+    PAYMENT_RECONCILE_INTERVAL_SECONDS = int(os.environ.get('PAYMENT_RECONCILE_INTERVAL_SECONDS') or 300)
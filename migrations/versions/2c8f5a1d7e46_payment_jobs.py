@@ -0,0 +1,48 @@
+"""Payment initiation jobs
+
+Revision ID: 2c8f5a1d7e46
+Revises: 4e8b1f6a9c35
+Create Date: 2026-10-21 09:12:47.318205
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2c8f5a1d7e46'
+down_revision = '4e8b1f6a9c35'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('payments', sa.Column('payment_url', sa.String(length=500), nullable=True), schema='clients')
+
+    op.create_table('payment_jobs',
+    sa.Column('id', sa.BigInteger(), nullable=False),
+    sa.Column('payment_id', sa.Integer(), nullable=False),
+    sa.Column('provider', sa.String(length=20), nullable=False),
+    sa.Column('phone', sa.String(length=20), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('run_after', sa.DateTime(), nullable=False),
+    sa.Column('locked_until', sa.DateTime(), nullable=True),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['payment_id'], ['clients.payments.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('payment_id'),
+    schema='clients'
+    )
+    op.create_index(
+        'ix_payment_jobs_provider_queued', 'payment_jobs', ['provider', 'id'],
+        schema='clients', postgresql_where=sa.text("status = 'queued'")
+    )
+
+
+def downgrade():
+    op.drop_index('ix_payment_jobs_provider_queued', table_name='payment_jobs', schema='clients')
+    op.drop_table('payment_jobs', schema='clients')
+    op.drop_column('payments', 'payment_url', schema='clients')
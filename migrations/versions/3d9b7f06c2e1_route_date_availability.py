@@ -0,0 +1,47 @@
+"""Route/date availability rollup
+
+Revision ID: 3d9b7f06c2e1
+Revises: 8c4e2a91f3b7
+Create Date: 2026-10-18 11:03:27.540912
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3d9b7f06c2e1'
+down_revision = '8c4e2a91f3b7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('route_date_availability',
+    sa.Column('departure_city_key', sa.String(length=100), nullable=False),
+    sa.Column('arrival_city_key', sa.String(length=100), nullable=False),
+    sa.Column('travel_date', sa.Date(), nullable=False),
+    sa.Column('departure_city', sa.String(length=100), nullable=False),
+    sa.Column('arrival_city', sa.String(length=100), nullable=False),
+    sa.Column('trip_count', sa.Integer(), nullable=False),
+    sa.Column('min_price', sa.Float(), nullable=True),
+    sa.Column('available_seats', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('departure_city_key', 'arrival_city_key', 'travel_date'),
+    schema='partners'
+    )
+    op.execute("""
+        INSERT INTO partners.route_date_availability
+            (departure_city_key, arrival_city_key, travel_date, departure_city, arrival_city,
+             trip_count, min_price, available_seats, updated_at)
+        SELECT departure_city_key, arrival_city_key, departure_time::date,
+               min(departure_city), min(arrival_city), count(*), min(price),
+               coalesce(sum(available_seats), 0), now()
+        FROM partners.scheduled_trips
+        WHERE status = 'active'
+        GROUP BY departure_city_key, arrival_city_key, departure_time::date
+    """)
+
+
+def downgrade():
+    op.drop_table('route_date_availability', schema='partners')
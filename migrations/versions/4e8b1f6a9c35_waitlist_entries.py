@@ -0,0 +1,50 @@
+"""Waitlist entries
+
+Revision ID: 4e8b1f6a9c35
+Revises: 9a4c7e2d5b18
+Create Date: 2026-10-20 16:41:12.093584
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4e8b1f6a9c35'
+down_revision = '9a4c7e2d5b18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('waitlist_entries',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('trip_id', sa.Integer(), nullable=False),
+    sa.Column('number_of_seats', sa.Integer(), nullable=False),
+    sa.Column('passenger_name', sa.String(length=100), nullable=False),
+    sa.Column('passenger_phone', sa.String(length=20), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('booking_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('promoted_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['booking_id'], ['clients.bookings.id'], ),
+    sa.ForeignKeyConstraint(['trip_id'], ['partners.scheduled_trips.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['public.users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    schema='clients'
+    )
+    op.create_index(
+        'ix_waitlist_entries_trip_waiting', 'waitlist_entries', ['trip_id', 'id'],
+        schema='clients', postgresql_where=sa.text("status = 'waiting'")
+    )
+    op.create_index(
+        'uq_waitlist_entries_user_trip_waiting', 'waitlist_entries', ['user_id', 'trip_id'],
+        unique=True, schema='clients', postgresql_where=sa.text("status = 'waiting'")
+    )
+
+
+def downgrade():
+    op.drop_index('uq_waitlist_entries_user_trip_waiting', table_name='waitlist_entries', schema='clients')
+    op.drop_index('ix_waitlist_entries_trip_waiting', table_name='waitlist_entries', schema='clients')
+    op.drop_table('waitlist_entries', schema='clients')
@@ -0,0 +1,24 @@
+"""Index stops by line
+
+Revision ID: 5b9e2c7d4f10
+Revises: 7f3a9d2b6c81
+Create Date: 2026-10-22 10:48:19.561732
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b9e2c7d4f10'
+down_revision = '7f3a9d2b6c81'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_stops_line_id_order', 'stops', ['line_id', 'order'], schema='public')
+
+
+def downgrade():
+    op.drop_index('ix_stops_line_id_order', table_name='stops', schema='public')
@@ -0,0 +1,53 @@
+"""Seat maps
+
+Revision ID: 6d2f8a4c1e73
+Revises: 1b7d3e9f4a60
+Create Date: 2026-10-19 14:22:08.540917
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '6d2f8a4c1e73'
+down_revision = '1b7d3e9f4a60'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('scheduled_trips', sa.Column('seat_map', postgresql.BIT(varying=True), nullable=True), schema='partners')
+    op.add_column('scheduled_trips', sa.Column('blocked_seat_map', postgresql.BIT(varying=True), nullable=True), schema='partners')
+    op.add_column('bookings', sa.Column('seat_mask', postgresql.BIT(varying=True), nullable=True), schema='clients')
+
+    # Trips without pending/confirmed bookings get a seat map, the seats held
+    # back through available_seats being blocked. Trips with bookings keep
+    # counting seats only, as those bookings have no seat numbers.
+    op.execute("""
+        UPDATE partners.scheduled_trips t
+        SET seat_map = (repeat('0', t.available_seats) || repeat('1', t.total_seats - t.available_seats))::varbit,
+            blocked_seat_map = (repeat('0', t.available_seats) || repeat('1', t.total_seats - t.available_seats))::varbit
+        WHERE t.total_seats > 0
+          AND t.available_seats <= t.total_seats
+          AND NOT EXISTS (
+              SELECT 1 FROM clients.bookings b
+              WHERE b.trip_id = t.id AND b.status IN ('pending', 'confirmed')
+          )
+    """)
+
+    op.create_check_constraint(
+        'ck_scheduled_trips_seat_map_matches_counter',
+        'scheduled_trips',
+        "seat_map IS NULL OR (length(seat_map) = total_seats"
+        " AND available_seats = length(replace(seat_map::text, '1', '')))",
+        schema='partners'
+    )
+
+
+def downgrade():
+    op.drop_constraint('ck_scheduled_trips_seat_map_matches_counter', 'scheduled_trips', schema='partners', type_='check')
+    op.drop_column('bookings', 'seat_mask', schema='clients')
+    op.drop_column('scheduled_trips', 'blocked_seat_map', schema='partners')
+    op.drop_column('scheduled_trips', 'seat_map', schema='partners')
@@ -0,0 +1,42 @@
+"""Payment webhook inbox
+
+Revision ID: 7f3a9d2b6c81
+Revises: 2c8f5a1d7e46
+Create Date: 2026-10-21 14:26:03.845117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7f3a9d2b6c81'
+down_revision = '2c8f5a1d7e46'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('payment_webhook_events',
+    sa.Column('id', sa.BigInteger(), nullable=False),
+    sa.Column('provider', sa.String(length=20), nullable=False),
+    sa.Column('transaction_id', sa.String(length=100), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('payload', sa.Text(), nullable=False),
+    sa.Column('received_at', sa.DateTime(), nullable=False),
+    sa.Column('available_at', sa.DateTime(), nullable=False),
+    sa.Column('processed_at', sa.DateTime(), nullable=True),
+    sa.Column('result', sa.String(length=20), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('provider', 'transaction_id', 'status', name='uq_payment_webhook_events_provider_txn_status'),
+    schema='clients'
+    )
+    op.create_index(
+        'ix_payment_webhook_events_unprocessed', 'payment_webhook_events', ['available_at'],
+        schema='clients', postgresql_where=sa.text('processed_at IS NULL')
+    )
+
+
+def downgrade():
+    op.drop_index('ix_payment_webhook_events_unprocessed', table_name='payment_webhook_events', schema='clients')
+    op.drop_table('payment_webhook_events', schema='clients')
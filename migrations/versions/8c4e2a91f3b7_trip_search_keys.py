@@ -0,0 +1,70 @@
+"""Normalized city keys and search indexes on scheduled_trips
+
+Revision ID: 8c4e2a91f3b7
+Revises: 51188e12091d
+Create Date: 2026-10-18 09:12:40.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from services.normalization import normalize_city
+
+
+# revision identifiers, used by Alembic.
+revision = '8c4e2a91f3b7'
+down_revision = '51188e12091d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('scheduled_trips', sa.Column('departure_city_key', sa.String(length=100), nullable=True), schema='partners')
+    op.add_column('scheduled_trips', sa.Column('arrival_city_key', sa.String(length=100), nullable=True), schema='partners')
+
+    # Backfill with the same folding the application uses (Postgres unaccent is
+    # an optional extension, so it is done here rather than in SQL).
+    bind = op.get_bind()
+    trips = sa.table(
+        'scheduled_trips',
+        sa.column('id', sa.Integer),
+        sa.column('departure_city', sa.String),
+        sa.column('arrival_city', sa.String),
+        sa.column('departure_city_key', sa.String),
+        sa.column('arrival_city_key', sa.String),
+        schema='partners'
+    )
+    rows = bind.execute(sa.select(trips.c.id, trips.c.departure_city, trips.c.arrival_city)).fetchall()
+    if rows:
+        bind.execute(
+            trips.update()
+            .where(trips.c.id == sa.bindparam('trip_id'))
+            .values(departure_city_key=sa.bindparam('dep_key'), arrival_city_key=sa.bindparam('arr_key')),
+            [
+                {'trip_id': r.id, 'dep_key': normalize_city(r.departure_city), 'arr_key': normalize_city(r.arrival_city)}
+                for r in rows
+            ]
+        )
+
+    op.alter_column('scheduled_trips', 'departure_city_key', nullable=False, schema='partners')
+    op.alter_column('scheduled_trips', 'arrival_city_key', nullable=False, schema='partners')
+
+    op.create_index(
+        'ix_scheduled_trips_search_departure', 'scheduled_trips',
+        ['status', 'departure_city_key', 'departure_time'],
+        schema='partners',
+        postgresql_ops={'departure_city_key': 'varchar_pattern_ops'}
+    )
+    op.create_index(
+        'ix_scheduled_trips_search_arrival', 'scheduled_trips',
+        ['status', 'arrival_city_key', 'departure_time'],
+        schema='partners',
+        postgresql_ops={'arrival_city_key': 'varchar_pattern_ops'}
+    )
+
+
+def downgrade():
+    op.drop_index('ix_scheduled_trips_search_arrival', table_name='scheduled_trips', schema='partners')
+    op.drop_index('ix_scheduled_trips_search_departure', table_name='scheduled_trips', schema='partners')
+    op.drop_column('scheduled_trips', 'arrival_city_key', schema='partners')
+    op.drop_column('scheduled_trips', 'departure_city_key', schema='partners')
@@ -0,0 +1,30 @@
+"""Line workbook import fingerprints
+
+Revision ID: 8e1c4b7a2f95
+Revises: 5b9e2c7d4f10
+Create Date: 2026-10-22 15:12:40.318027
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e1c4b7a2f95'
+down_revision = '5b9e2c7d4f10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('line_imports',
+    sa.Column('source', sa.String(length=255), nullable=False),
+    sa.Column('content_hash', sa.String(length=64), nullable=False),
+    sa.Column('imported_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('source'),
+    schema='public'
+    )
+
+
+def downgrade():
+    op.drop_table('line_imports', schema='public')
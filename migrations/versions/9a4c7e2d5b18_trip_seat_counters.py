@@ -0,0 +1,102 @@
+"""Trip seat counters and route/date seat deltas
+
+Revision ID: 9a4c7e2d5b18
+Revises: 6d2f8a4c1e73
+Create Date: 2026-10-20 10:05:31.772410
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '9a4c7e2d5b18'
+down_revision = '6d2f8a4c1e73'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('trip_seat_counters',
+    sa.Column('trip_id', sa.Integer(), nullable=False),
+    sa.Column('slot', sa.SmallInteger(), nullable=False),
+    sa.Column('available_seats', sa.Integer(), nullable=False),
+    sa.Column('seat_map', postgresql.BIT(varying=True), nullable=True),
+    sa.CheckConstraint('available_seats >= 0', name='ck_trip_seat_counters_available_seats_nonnegative'),
+    sa.CheckConstraint(
+        "seat_map IS NULL OR available_seats = length(replace(seat_map::text, '1', ''))",
+        name='ck_trip_seat_counters_seat_map_matches_counter'
+    ),
+    sa.ForeignKeyConstraint(['trip_id'], ['partners.scheduled_trips.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('trip_id', 'slot'),
+    schema='partners'
+    )
+
+    op.create_table('route_date_seat_deltas',
+    sa.Column('id', sa.BigInteger(), nullable=False),
+    sa.Column('departure_city_key', sa.String(length=100), nullable=False),
+    sa.Column('arrival_city_key', sa.String(length=100), nullable=False),
+    sa.Column('travel_date', sa.Date(), nullable=False),
+    sa.Column('delta', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    schema='partners'
+    )
+    op.create_index(
+        'ix_route_date_seat_deltas_route_date', 'route_date_seat_deltas',
+        ['departure_city_key', 'arrival_city_key', 'travel_date'], schema='partners'
+    )
+
+    # Every trip starts with a single slot holding its current inventory
+    op.execute("""
+        INSERT INTO partners.trip_seat_counters (trip_id, slot, available_seats, seat_map)
+        SELECT id, 0, available_seats, seat_map FROM partners.scheduled_trips
+    """)
+
+    op.drop_constraint('ck_scheduled_trips_seat_map_matches_counter', 'scheduled_trips', schema='partners', type_='check')
+    op.drop_constraint('ck_scheduled_trips_available_seats_nonnegative', 'scheduled_trips', schema='partners', type_='check')
+    op.drop_column('scheduled_trips', 'seat_map', schema='partners')
+    op.drop_column('scheduled_trips', 'available_seats', schema='partners')
+
+
+def downgrade():
+    op.add_column('scheduled_trips', sa.Column('available_seats', sa.Integer(), nullable=True), schema='partners')
+    op.add_column('scheduled_trips', sa.Column('seat_map', postgresql.BIT(varying=True), nullable=True), schema='partners')
+    op.execute("""
+        UPDATE partners.scheduled_trips t
+        SET available_seats = c.available_seats, seat_map = c.seat_map
+        FROM (
+            SELECT trip_id, sum(available_seats) AS available_seats, bit_and(seat_map) AS seat_map
+            FROM partners.trip_seat_counters
+            GROUP BY trip_id
+        ) c
+        WHERE c.trip_id = t.id
+    """)
+    op.execute("UPDATE partners.scheduled_trips SET available_seats = 0 WHERE available_seats IS NULL")
+    op.alter_column('scheduled_trips', 'available_seats', nullable=False, schema='partners')
+    op.create_check_constraint(
+        'ck_scheduled_trips_available_seats_nonnegative', 'scheduled_trips', 'available_seats >= 0', schema='partners'
+    )
+    op.create_check_constraint(
+        'ck_scheduled_trips_seat_map_matches_counter',
+        'scheduled_trips',
+        "seat_map IS NULL OR (length(seat_map) = total_seats"
+        " AND available_seats = length(replace(seat_map::text, '1', '')))",
+        schema='partners'
+    )
+    op.drop_table('trip_seat_counters', schema='partners')
+    op.execute("""
+        UPDATE partners.route_date_availability r
+        SET available_seats = r.available_seats + d.delta
+        FROM (
+            SELECT departure_city_key, arrival_city_key, travel_date, sum(delta) AS delta
+            FROM partners.route_date_seat_deltas
+            GROUP BY departure_city_key, arrival_city_key, travel_date
+        ) d
+        WHERE r.departure_city_key = d.departure_city_key
+          AND r.arrival_city_key = d.arrival_city_key
+          AND r.travel_date = d.travel_date
+    """)
+    op.drop_index('ix_route_date_seat_deltas_route_date', table_name='route_date_seat_deltas', schema='partners')
+    op.drop_table('route_date_seat_deltas', schema='partners')
@@ -0,0 +1,34 @@
+"""Catalog version counters for ETags
+
+Revision ID: a61f5c3e8d24
+Revises: 3d9b7f06c2e1
+Create Date: 2026-10-18 13:41:08.722315
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a61f5c3e8d24'
+down_revision = '3d9b7f06c2e1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('catalog_versions',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('name'),
+    schema='public'
+    )
+    op.execute("""
+        INSERT INTO public.catalog_versions (name, version, updated_at)
+        VALUES ('lines', 1, now() at time zone 'utc'), ('vehicles', 1, now() at time zone 'utc')
+    """)
+
+
+def downgrade():
+    op.drop_table('catalog_versions', schema='public')
@@ -0,0 +1,29 @@
+"""Forbid negative available_seats on scheduled_trips
+
+Revision ID: c27e94b1d053
+Revises: a61f5c3e8d24
+Create Date: 2026-10-18 15:20:51.093377
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c27e94b1d053'
+down_revision = 'a61f5c3e8d24'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_check_constraint(
+        'ck_scheduled_trips_available_seats_nonnegative',
+        'scheduled_trips',
+        'available_seats >= 0',
+        schema='partners'
+    )
+
+
+def downgrade():
+    op.drop_constraint('ck_scheduled_trips_available_seats_nonnegative', 'scheduled_trips', schema='partners', type_='check')
@@ -0,0 +1,37 @@
+"""Hold expiry on pending bookings
+
+Revision ID: e5a0d7c4b912
+Revises: c27e94b1d053
+Create Date: 2026-10-18 17:02:33.481220
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a0d7c4b912'
+down_revision = 'c27e94b1d053'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('bookings', sa.Column('hold_expires_at', sa.DateTime(), nullable=True), schema='clients')
+    # Existing unpaid holds get the default 15 minute TTL from their creation,
+    # so the first sweep releases the ones already abandoned
+    op.execute("""
+        UPDATE clients.bookings
+        SET hold_expires_at = created_at + interval '15 minutes'
+        WHERE status = 'pending'
+    """)
+    op.create_index(
+        'ix_bookings_pending_hold_expiry', 'bookings', ['hold_expires_at'],
+        schema='clients',
+        postgresql_where=sa.text("status = 'pending'")
+    )
+
+
+def downgrade():
+    op.drop_index('ix_bookings_pending_hold_expiry', table_name='bookings', schema='clients')
+    op.drop_column('bookings', 'hold_expires_at', schema='clients')
@@ -0,0 +1,28 @@
+"""Index for paginated booking history
+
+Revision ID: f83b16e2a7c5
+Revises: e5a0d7c4b912
+Create Date: 2026-10-18 18:26:14.905637
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f83b16e2a7c5'
+down_revision = 'e5a0d7c4b912'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        'ix_bookings_user_created', 'bookings',
+        ['user_id', sa.text('created_at DESC'), sa.text('id DESC')],
+        schema='clients'
+    )
+
+
+def downgrade():
+    op.drop_index('ix_bookings_user_created', table_name='bookings', schema='clients')
@@ -1,5 +1,7 @@
 from datetime import datetime
+from sqlalchemy.dialects.postgresql import BIT
 from models.public import db
+from services import seat_map
 
 
 class Client(db.Model):
@@ -84,17 +86,31 @@ class Transaction(db.Model):
 
 class Booking(db.Model):
     __tablename__ = 'bookings'
-    __table_args__ = {'schema': 'clients'}
+    __table_args__ = (
+        # Only pending bookings are swept, so the index stays small
+        db.Index(
+            'ix_bookings_pending_hold_expiry', 'hold_expires_at',
+            postgresql_where=db.text("status = 'pending'")
+        ),
+        # Booking history: WHERE user_id = ? ORDER BY created_at DESC, id DESC
+        db.Index('ix_bookings_user_created', 'user_id', db.text('created_at DESC'), db.text('id DESC')),
+        {'schema': 'clients'}
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('public.users.id'), nullable=False)
     trip_id = db.Column(db.Integer, db.ForeignKey('partners.scheduled_trips.id'), nullable=False)
     number_of_seats = db.Column(db.Integer, nullable=False, default=1)
+    # The booking's seats as a mask over the trip's seat_map (NULL if the
+    # trip has no seat map)
+    seat_mask = db.Column(BIT(varying=True), nullable=True)
     total_price = db.Column(db.Float, nullable=False)
-    status = db.Column(db.String(20), default='pending')  # pending, confirmed, cancelled
+    status = db.Column(db.String(20), default='pending')  # pending, confirmed, cancelled, expired
     passenger_name = db.Column(db.String(100), nullable=False)
     passenger_phone = db.Column(db.String(20), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Seats of an unpaid pending booking are released once this passes
+    hold_expires_at = db.Column(db.DateTime, nullable=True)
     
     payment = db.relationship('Payment', backref='booking', uselist=False, lazy=True)
     
@@ -104,13 +120,31 @@ class Booking(db.Model):
             'user_id': self.user_id,
             'trip_id': self.trip_id,
             'number_of_seats': self.number_of_seats,
+            'seat_numbers': seat_map.decode(self.seat_mask),
             'total_price': self.total_price,
             'status': self.status,
             'passenger_name': self.passenger_name,
             'passenger_phone': self.passenger_phone,
             'created_at': self.created_at.isoformat(),
+            'hold_expires_at': self.hold_expires_at.isoformat() if self.hold_expires_at else None,
             'trip': self.scheduled_trip.to_dict() if self.scheduled_trip else None
         }
+    
+    def to_summary_dict(self):
+        trip = self.scheduled_trip
+        return {
+            'id': self.id,
+            'trip_id': self.trip_id,
+            'number_of_seats': self.number_of_seats,
+            'seat_numbers': seat_map.decode(self.seat_mask),
+            'total_price': self.total_price,
+            'status': self.status,
+            'created_at': self.created_at.isoformat(),
+            'hold_expires_at': self.hold_expires_at.isoformat() if self.hold_expires_at else None,
+            'departure_city': trip.departure_city if trip else None,
+            'arrival_city': trip.arrival_city if trip else None,
+            'departure_time': trip.departure_time.isoformat() if trip else None
+        }
 
 class Payment(db.Model):
     __tablename__ = 'payments'
@@ -121,8 +155,9 @@ class Payment(db.Model):
     amount = db.Column(db.Float, nullable=False)
     payment_method = db.Column(db.String(20), nullable=False)  # wave, orange_money, mtn_momo
     transaction_id = db.Column(db.String(100), unique=True, nullable=True)
-    status = db.Column(db.String(20), default='pending')  # pending, completed, failed
+    status = db.Column(db.String(20), default='pending')  # initiating, pending, completed, failed
     payment_provider_response = db.Column(db.Text, nullable=True)
+    payment_url = db.Column(db.String(500), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -134,9 +169,122 @@ class Payment(db.Model):
             'payment_method': self.payment_method,
             'transaction_id': self.transaction_id,
             'status': self.status,
+            'payment_url': self.payment_url,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat()
         }
 
 
-        
+class PaymentJob(db.Model):
+    """Queued call to a provider's initiate endpoint, drained by `flask payments work`."""
+    __tablename__ = 'payment_jobs'
+    __table_args__ = (
+        # Queue of a provider: WHERE provider = ? AND status = 'queued' AND run_after <= now ORDER BY id
+        db.Index(
+            'ix_payment_jobs_provider_queued', 'provider', 'id',
+            postgresql_where=db.text("status = 'queued'")
+        ),
+        {'schema': 'clients'}
+    )
+
+    id = db.Column(db.BigInteger, primary_key=True)
+    # One job per payment; initiating it again re-queues the same row
+    payment_id = db.Column(db.Integer, db.ForeignKey('clients.payments.id', ondelete='CASCADE'), nullable=False, unique=True)
+    provider = db.Column(db.String(20), nullable=False)
+    phone = db.Column(db.String(20), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, done, failed, cancelled
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    run_after = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_until = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class PaymentWebhookEvent(db.Model):
+    """Provider callback as received, applied to its payment by services.webhook_inbox."""
+    __tablename__ = 'payment_webhook_events'
+    __table_args__ = (
+        # A resent callback is the same event
+        db.UniqueConstraint('provider', 'transaction_id', 'status', name='uq_payment_webhook_events_provider_txn_status'),
+        # Processor queue: WHERE processed_at IS NULL AND available_at <= now
+        db.Index(
+            'ix_payment_webhook_events_unprocessed', 'available_at',
+            postgresql_where=db.text('processed_at IS NULL')
+        ),
+        {'schema': 'clients'}
+    )
+
+    id = db.Column(db.BigInteger, primary_key=True)
+    provider = db.Column(db.String(20), nullable=False, default='')
+    transaction_id = db.Column(db.String(100), nullable=False)
+    status = db.Column(db.String(20), nullable=False)  # pending, completed, failed (normalized)
+    payload = db.Column(db.Text, nullable=False)
+    received_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # Unmatched events are retried until this time, then given up on
+    available_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    processed_at = db.Column(db.DateTime, nullable=True)
+    result = db.Column(db.String(20), nullable=True)  # applied, ignored, unknown_payment, error
+
+
+class IdempotencyKey(db.Model):
+    """Outcome of a request sent with an Idempotency-Key header, replayed to retries."""
+    __tablename__ = 'idempotency_keys'
+    __table_args__ = (
+        db.Index('ix_idempotency_keys_expires_at', 'expires_at'),
+        {'schema': 'clients'}
+    )
+
+    user_id = db.Column(db.Integer, db.ForeignKey('public.users.id'), primary_key=True)
+    key = db.Column(db.String(100), primary_key=True)
+    endpoint = db.Column(db.String(100), nullable=False)
+    fingerprint = db.Column(db.String(64), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='processing')  # processing, completed
+    response_code = db.Column(db.Integer, nullable=True)
+    response_body = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+
+class WaitlistEntry(db.Model):
+    """A request for seats on a sold-out trip, promoted to a booking in FIFO order."""
+    __tablename__ = 'waitlist_entries'
+    __table_args__ = (
+        # FIFO queue of a trip: WHERE trip_id = ? AND status = 'waiting' ORDER BY id
+        db.Index(
+            'ix_waitlist_entries_trip_waiting', 'trip_id', 'id',
+            postgresql_where=db.text("status = 'waiting'")
+        ),
+        # One place in the queue per user and trip
+        db.Index(
+            'uq_waitlist_entries_user_trip_waiting', 'user_id', 'trip_id',
+            unique=True,
+            postgresql_where=db.text("status = 'waiting'")
+        ),
+        {'schema': 'clients'}
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('public.users.id'), nullable=False)
+    trip_id = db.Column(db.Integer, db.ForeignKey('partners.scheduled_trips.id'), nullable=False)
+    number_of_seats = db.Column(db.Integer, nullable=False, default=1)
+    passenger_name = db.Column(db.String(100), nullable=False)
+    passenger_phone = db.Column(db.String(20), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='waiting')  # waiting, promoted, cancelled, expired
+    booking_id = db.Column(db.Integer, db.ForeignKey('clients.bookings.id'), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    promoted_at = db.Column(db.DateTime, nullable=True)
+
+    def to_dict(self, position=None):
+        return {
+            'id': self.id,
+            'trip_id': self.trip_id,
+            'number_of_seats': self.number_of_seats,
+            'passenger_name': self.passenger_name,
+            'passenger_phone': self.passenger_phone,
+            'status': self.status,
+            'position': position,
+            'booking_id': self.booking_id,
+            'created_at': self.created_at.isoformat(),
+            'promoted_at': self.promoted_at.isoformat() if self.promoted_at else None
+        }
@@ -1,5 +1,8 @@
 from datetime import datetime
+from sqlalchemy.dialects.postgresql import BIT
+from sqlalchemy.orm import validates
 from models.public import db
+from services.normalization import normalize_city
 
 
 class Partner(db.Model):
@@ -63,18 +66,74 @@ class Transaction(db.Model):
             'updated_at': self.updated_at
         }
 
+class TripSeatCounter(db.Model):
+    """
+    Seat inventory of a trip, striped into one or more slots whose counts add
+    up to the trip's available seats. Concurrent bookings on a busy trip take
+    seats from different slots, so they don't queue on a single row lock.
+
+    On trips with a seat map every free seat is '0' in exactly one slot's map
+    and taken seats are '1' in all of them: the trip's map is the bit_and of
+    its slots.
+    """
+    __tablename__ = 'trip_seat_counters'
+    __table_args__ = (
+        db.CheckConstraint('available_seats >= 0', name='ck_trip_seat_counters_available_seats_nonnegative'),
+        # With a seat map, available_seats is the number of '0' bits in it
+        db.CheckConstraint(
+            "seat_map IS NULL OR available_seats = length(replace(seat_map::text, '1', ''))",
+            name='ck_trip_seat_counters_seat_map_matches_counter'
+        ),
+        {'schema': 'partners'}
+    )
+
+    trip_id = db.Column(db.Integer, db.ForeignKey('partners.scheduled_trips.id', ondelete='CASCADE'), primary_key=True)
+    slot = db.Column(db.SmallInteger, primary_key=True)
+    available_seats = db.Column(db.Integer, nullable=False)
+    # One bit per seat of the trip, '1' = taken or free in another slot. NULL
+    # for trips created before seat selection: those only count seats.
+    seat_map = db.Column(BIT(varying=True), nullable=True)
+
+
 class ScheduledTrip(db.Model):
     __tablename__ = 'scheduled_trips'
-    __table_args__ = {'schema': 'partners'}
+    __table_args__ = (
+        # Search path for GET /api/trips: equality on status, prefix match on the
+        # normalized city key (pattern ops so LIKE 'abid%' can use the btree),
+        # then a departure_time range.
+        db.Index(
+            'ix_scheduled_trips_search_departure',
+            'status', 'departure_city_key', 'departure_time',
+            postgresql_ops={'departure_city_key': 'varchar_pattern_ops'}
+        ),
+        db.Index(
+            'ix_scheduled_trips_search_arrival',
+            'status', 'arrival_city_key', 'departure_time',
+            postgresql_ops={'arrival_city_key': 'varchar_pattern_ops'}
+        ),
+        {'schema': 'partners'}
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     departure_city = db.Column(db.String(100), nullable=False)
     arrival_city = db.Column(db.String(100), nullable=False)
+    # Accent/case folded copies of the cities, maintained by the validators below
+    departure_city_key = db.Column(db.String(100), nullable=False)
+    arrival_city_key = db.Column(db.String(100), nullable=False)
     departure_time = db.Column(db.DateTime, nullable=False)
     arrival_time = db.Column(db.DateTime, nullable=False)
     price = db.Column(db.Float, nullable=False)
-    available_seats = db.Column(db.Integer, nullable=False, default=18)
     total_seats = db.Column(db.Integer, nullable=False, default=18)
+    # Seats are counted in trip_seat_counters; reads sum the slots
+    available_seats = db.column_property(
+        db.select(db.func.coalesce(db.func.sum(TripSeatCounter.available_seats), 0))
+        .where(TripSeatCounter.trip_id == id)
+        .correlate_except(TripSeatCounter)
+        .scalar_subquery()
+    )
+    # Seats kept off sale (driver, crew), one bit per seat. NULL for trips
+    # created before seat selection.
+    blocked_seat_map = db.Column(BIT(varying=True), nullable=True)
     driver_name = db.Column(db.String(100), nullable=False)
     driver_phone = db.Column(db.String(20), nullable=False)
     # vehicle_number = db.Column(db.String(50), nullable=False) # Deprecated in favor of vehicle_id
@@ -84,6 +143,16 @@ class ScheduledTrip(db.Model):
     
     bookings = db.relationship('models.clients.Booking', backref='scheduled_trip', lazy=True)
     
+    @validates('departure_city')
+    def _set_departure_city_key(self, key, value):
+        self.departure_city_key = normalize_city(value)
+        return value
+    
+    @validates('arrival_city')
+    def _set_arrival_city_key(self, key, value):
+        self.arrival_city_key = normalize_city(value)
+        return value
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -94,6 +163,7 @@ class ScheduledTrip(db.Model):
             'price': self.price,
             'available_seats': self.available_seats,
             'total_seats': self.total_seats,
+            'seat_selection': self.blocked_seat_map is not None,
             'driver_name': self.driver_name,
             'driver_phone': self.driver_phone,
             'vehicle_id': self.vehicle_id,
@@ -103,4 +173,57 @@ class ScheduledTrip(db.Model):
         }
 
 
-    
\ No newline at end of file
+class RouteDateSeatDelta(db.Model):
+    """
+    Seat changes not yet folded into route_date_availability. Bookings append
+    a row here instead of updating the route/date rollup row they share.
+    """
+    __tablename__ = 'route_date_seat_deltas'
+    __table_args__ = (
+        db.Index('ix_route_date_seat_deltas_route_date', 'departure_city_key', 'arrival_city_key', 'travel_date'),
+        {'schema': 'partners'}
+    )
+
+    id = db.Column(db.BigInteger, primary_key=True)
+    departure_city_key = db.Column(db.String(100), nullable=False)
+    arrival_city_key = db.Column(db.String(100), nullable=False)
+    travel_date = db.Column(db.Date, nullable=False)
+    delta = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class RouteDateAvailability(db.Model):
+    """Per route and day rollup of active trips, served to the calendar view."""
+    __tablename__ = 'route_date_availability'
+    __table_args__ = {'schema': 'partners'}
+
+    departure_city_key = db.Column(db.String(100), primary_key=True)
+    arrival_city_key = db.Column(db.String(100), primary_key=True)
+    travel_date = db.Column(db.Date, primary_key=True)
+    departure_city = db.Column(db.String(100), nullable=False)
+    arrival_city = db.Column(db.String(100), nullable=False)
+    trip_count = db.Column(db.Integer, nullable=False, default=0)
+    min_price = db.Column(db.Float, nullable=True)
+    available_seats = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Seat deltas appended since the last fold, added on read
+    pending_seats = db.column_property(
+        db.select(db.func.coalesce(db.func.sum(RouteDateSeatDelta.delta), 0))
+        .where(
+            RouteDateSeatDelta.departure_city_key == departure_city_key,
+            RouteDateSeatDelta.arrival_city_key == arrival_city_key,
+            RouteDateSeatDelta.travel_date == travel_date
+        )
+        .correlate_except(RouteDateSeatDelta)
+        .scalar_subquery()
+    )
+
+    def to_dict(self):
+        return {
+            'date': self.travel_date.isoformat(),
+            'departure_city': self.departure_city,
+            'arrival_city': self.arrival_city,
+            'trip_count': self.trip_count,
+            'min_price': self.min_price,
+            'available_seats': self.available_seats + self.pending_seats
+        }
@@ -70,7 +70,11 @@ class Station(db.Model):
 
 class Stop(db.Model):
     __tablename__ = 'stops'
-    __table_args__ = {'schema': 'public'}
+    __table_args__ = (
+        # Stops of a line in order, and the importer's per-line diff
+        db.Index('ix_stops_line_id_order', 'line_id', 'order'),
+        {'schema': 'public'}
+    )
 
     id = db.Column(db.UUID(as_uuid=True), primary_key=True)
     line_id = db.Column(db.UUID(as_uuid=True), db.ForeignKey('public.lines.id'), nullable=False)
@@ -81,7 +85,7 @@ class Stop(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-    def __to_dict(self):
+    def to_dict(self):
         return {
             'id': self.id,
             'line_id': self.line_id,
@@ -89,10 +93,30 @@ class Stop(db.Model):
             'longitude': self.longitude,
             'latitude': self.latitude,
             'order': self.order,
-            'created_at': self.created_at,
-            'updated_at': self.updated_at
+            'created_at': self.created_at.isoformat(),
+            'updated_at': self.updated_at.isoformat()
         }
 
+class CatalogVersion(db.Model):
+    """Change counter per catalog (lines, vehicles), used to build ETags cheaply."""
+    __tablename__ = 'catalog_versions'
+    __table_args__ = {'schema': 'public'}
+
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=1)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class LineImport(db.Model):
+    """Fingerprint of the last workbook imported from each source file."""
+    __tablename__ = 'line_imports'
+    __table_args__ = {'schema': 'public'}
+
+    source = db.Column(db.String(255), primary_key=True)
+    content_hash = db.Column(db.String(64), nullable=False)
+    imported_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
 class Step(db.Model):
     __tablename__ = 'steps'
     __table_args__ = {'schema': 'public'}
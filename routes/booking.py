@@ -1,13 +1,21 @@
-from flask import Blueprint, request, jsonify
+from datetime import datetime, timedelta
+from flask import Blueprint, current_app, request, jsonify
 from models.public import db
 from models.clients import Booking
-from models.partners import ScheduledTrip
+from sqlalchemy import insert, tuple_, update
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from services import availability, inventory, seat_map
+from services.idempotency import idempotent
+from services.loading import load_plan
+from services.pagination import decode_cursor, encode_cursor, parse_limit
+from services.query_counter import query_budget
+from services.trip_cache import trip_search_cache
 
 booking_bp = Blueprint('booking', __name__, url_prefix='/api/bookings')
 
 @booking_bp.route('', methods=['POST'])
 @jwt_required()
+@idempotent('create_booking')
 def create_booking():
     try:
         user_id = get_jwt_identity()
@@ -19,16 +27,27 @@ def create_booking():
             if not data.get(field):
                 return jsonify({'error': f'{field} is required'}), 400
         
-        trip = ScheduledTrip.query.get(data['trip_id'])
-        if not trip:
-            return jsonify({'error': 'Trip not found'}), 404
+        number_of_seats = int(data['number_of_seats'])
+        if number_of_seats < 1:
+            return jsonify({'error': 'number_of_seats must be at least 1'}), 400
         
-        if trip.status != 'active':
-            return jsonify({'error': 'Trip is not available for booking'}), 400
+        # Optional seat selection; unpicked seats are assigned automatically
+        seat_numbers = None
+        if data.get('seat_numbers') is not None:
+            try:
+                seat_numbers = seat_map.parse_seat_numbers(data['seat_numbers'])
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            if len(seat_numbers) != number_of_seats:
+                return jsonify({'error': 'seat_numbers must list number_of_seats seats'}), 400
         
-        number_of_seats = int(data['number_of_seats'])
-        if number_of_seats > trip.available_seats:
-            return jsonify({'error': 'Not enough seats available'}), 400
+        # Check and take the seats in one statement so concurrent bookings
+        # can't both pass the check and overbook the trip
+        trip = inventory.reserve_seats(data['trip_id'], number_of_seats, seat_numbers)
+        if trip is None:
+            db.session.rollback()
+            message, status_code = inventory.reservation_failure(data['trip_id'], number_of_seats, seat_numbers)
+            return jsonify({'error': message}), status_code
         
         total_price = trip.price * number_of_seats
         
@@ -36,17 +55,19 @@ def create_booking():
             user_id=user_id,
             trip_id=trip.id,
             number_of_seats=number_of_seats,
+            seat_mask=trip.seat_mask,
             total_price=total_price,
             passenger_name=data['passenger_name'],
             passenger_phone=data['passenger_phone'],
-            status='pending'
+            status='pending',
+            hold_expires_at=datetime.utcnow() + timedelta(minutes=current_app.config['BOOKING_HOLD_TTL_MINUTES'])
         )
         
-        # Update available seats
-        trip.available_seats -= number_of_seats
+        availability.apply_seat_delta(trip, -number_of_seats)
         
         db.session.add(booking)
         db.session.commit()
+        trip_search_cache.invalidate_trip(trip)
         
         return jsonify({
             'message': 'Booking created successfully',
@@ -57,26 +78,192 @@ def create_booking():
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@booking_bp.route('/batch', methods=['POST'])
+@jwt_required()
+@idempotent('create_bookings_batch')
+def create_bookings_batch():
+    try:
+        user_id = get_jwt_identity()
+        data = request.get_json() or {}
+        items = data.get('items')
+        
+        max_items = current_app.config['BOOKING_BATCH_MAX_ITEMS']
+        if not isinstance(items, list) or not items:
+            return jsonify({'error': 'items must be a non-empty list'}), 400
+        if len(items) > max_items:
+            return jsonify({'error': f'At most {max_items} items per batch'}), 400
+        
+        # Validation, reported per item
+        errors = []
+        required_fields = ['trip_id', 'number_of_seats', 'passenger_name', 'passenger_phone']
+        for index, item in enumerate(items):
+            missing = [field for field in required_fields if not isinstance(item, dict) or not item.get(field)]
+            if missing:
+                errors.append({'index': index, 'error': f'{missing[0]} is required'})
+                continue
+            try:
+                item['trip_id'] = int(item['trip_id'])
+                item['number_of_seats'] = int(item['number_of_seats'])
+            except (TypeError, ValueError):
+                errors.append({'index': index, 'error': 'trip_id and number_of_seats must be integers'})
+                continue
+            if item['number_of_seats'] < 1:
+                errors.append({'index': index, 'error': 'number_of_seats must be at least 1'})
+                continue
+            if item.get('seat_numbers') is not None:
+                try:
+                    item['seat_numbers'] = seat_map.parse_seat_numbers(item['seat_numbers'])
+                except ValueError as e:
+                    errors.append({'index': index, 'error': str(e)})
+                    continue
+                if len(item['seat_numbers']) != item['number_of_seats']:
+                    errors.append({'index': index, 'error': 'seat_numbers must list number_of_seats seats'})
+        if errors:
+            return jsonify({'error': 'Invalid booking items', 'errors': errors}), 400
+        
+        seats_by_trip = {}
+        picked_by_trip = {}
+        for index, item in enumerate(items):
+            seats_by_trip[item['trip_id']] = seats_by_trip.get(item['trip_id'], 0) + item['number_of_seats']
+            picked = picked_by_trip.setdefault(item['trip_id'], [])
+            if set(picked) & set(item.get('seat_numbers') or ()):
+                errors.append({'index': index, 'error': 'Seat picked twice in this batch'})
+            picked.extend(item.get('seat_numbers') or ())
+        if errors:
+            return jsonify({'error': 'Invalid booking items', 'errors': errors}), 400
+        
+        # Reserve trip by trip in ascending id order, so concurrent batches
+        # touching the same trips take their row locks in the same order
+        trips = {}
+        failed = []
+        for trip_id in sorted(seats_by_trip):
+            trip = inventory.reserve_seats(trip_id, seats_by_trip[trip_id], picked_by_trip[trip_id])
+            if trip is None:
+                failed.append(trip_id)
+            else:
+                trips[trip_id] = trip
+        
+        if failed:
+            db.session.rollback()
+            for trip_id in failed:
+                message, _ = inventory.reservation_failure(trip_id, seats_by_trip[trip_id], picked_by_trip[trip_id])
+                errors.extend(
+                    {'index': index, 'error': message}
+                    for index, item in enumerate(items) if item['trip_id'] == trip_id
+                )
+            return jsonify({'error': 'Some trips could not be booked', 'errors': errors}), 409
+        
+        # Hand the automatically assigned seats of each trip out to the items
+        # that didn't pick theirs, in request order
+        assigned_by_trip = {
+            trip_id: [number for number in seat_map.decode(trip.seat_mask) if number not in picked_by_trip[trip_id]]
+            for trip_id, trip in trips.items() if trip.seat_mask is not None
+        }
+        masks = []
+        for item in items:
+            trip = trips[item['trip_id']]
+            if trip.seat_mask is None:
+                masks.append(None)
+                continue
+            numbers = item.get('seat_numbers')
+            if numbers is None:
+                assigned = assigned_by_trip[item['trip_id']]
+                numbers, assigned_by_trip[item['trip_id']] = assigned[:item['number_of_seats']], assigned[item['number_of_seats']:]
+            masks.append(seat_map.encode(numbers, len(trip.seat_mask)))
+        
+        now = datetime.utcnow()
+        hold_expires_at = now + timedelta(minutes=current_app.config['BOOKING_HOLD_TTL_MINUTES'])
+        rows = [{
+            'user_id': user_id,
+            'trip_id': item['trip_id'],
+            'number_of_seats': item['number_of_seats'],
+            'seat_mask': mask,
+            'total_price': trips[item['trip_id']].price * item['number_of_seats'],
+            'status': 'pending',
+            'passenger_name': item['passenger_name'],
+            'passenger_phone': item['passenger_phone'],
+            'created_at': now,
+            'hold_expires_at': hold_expires_at
+        } for item, mask in zip(items, masks)]
+        
+        # One multi-row INSERT for the whole batch
+        booking_ids = db.session.execute(
+            insert(Booking.__table__).values(rows).returning(Booking.__table__.c.id)
+        ).scalars().all()
+        
+        availability.apply_seat_deltas([(trips[trip_id], -seats) for trip_id, seats in seats_by_trip.items()])
+        
+        db.session.commit()
+        for trip in trips.values():
+            trip_search_cache.invalidate_trip(trip)
+        
+        bookings = Booking.query.options(*load_plan('booking')).filter(Booking.id.in_(booking_ids)).order_by(Booking.id).all()
+        
+        return jsonify({
+            'message': 'Bookings created successfully',
+            'bookings': [booking.to_dict() for booking in bookings]
+        }), 201
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
 @booking_bp.route('', methods=['GET'])
+@query_budget(1)
 @jwt_required()
 def get_user_bookings():
     try:
         user_id = get_jwt_identity()
-        bookings = Booking.query.filter_by(user_id=user_id).order_by(Booking.created_at.desc()).all()
+        cursor = request.args.get('cursor')
+        statuses = [s for s in request.args.get('status', '').split(',') if s]
+        expand_trip = request.args.get('expand') == 'trip'
+        
+        try:
+            limit = parse_limit(
+                request.args.get('limit'),
+                current_app.config['BOOKINGS_PAGE_SIZE'],
+                current_app.config['BOOKINGS_MAX_PAGE_SIZE']
+            )
+            after = decode_cursor(cursor, 2) if cursor else None
+        except ValueError:
+            return jsonify({'error': 'Invalid limit or cursor'}), 400
+        
+        query = Booking.query.options(*load_plan('booking' if expand_trip else 'booking_summary')).filter(
+            Booking.user_id == user_id
+        )
+        if statuses:
+            query = query.filter(Booking.status.in_(statuses))
+        if after:
+            query = query.filter(tuple_(Booking.created_at, Booking.id) < tuple_(*after))
+        
+        # Newest first, served by the (user_id, created_at DESC, id DESC) index
+        bookings = query.order_by(Booking.created_at.desc(), Booking.id.desc()).limit(limit + 1).all()
+        has_more = len(bookings) > limit
+        bookings = bookings[:limit]
+        
+        next_cursor = None
+        if has_more:
+            last = bookings[-1]
+            next_cursor = encode_cursor(last.created_at, last.id)
         
         return jsonify({
-            'bookings': [booking.to_dict() for booking in bookings]
+            'bookings': [
+                booking.to_dict() if expand_trip else booking.to_summary_dict()
+                for booking in bookings
+            ],
+            'next_cursor': next_cursor
         }), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @booking_bp.route('/<int:booking_id>', methods=['GET'])
+@query_budget(1)
 @jwt_required()
 def get_booking(booking_id):
     try:
         user_id = get_jwt_identity()
-        booking = Booking.query.get(booking_id)
+        booking = Booking.query.options(*load_plan('booking')).get(booking_id)
         
         if not booking:
             return jsonify({'error': 'Booking not found'}), 404
@@ -94,7 +281,7 @@ def get_booking(booking_id):
 def cancel_booking(booking_id):
     try:
         user_id = get_jwt_identity()
-        booking = Booking.query.get(booking_id)
+        booking = Booking.query.options(*load_plan('booking')).get(booking_id)
         
         if not booking:
             return jsonify({'error': 'Booking not found'}), 404
@@ -102,15 +289,25 @@ def cancel_booking(booking_id):
         if booking.user_id != user_id:
             return jsonify({'error': 'Unauthorized'}), 403
         
-        if booking.status == 'cancelled':
+        # Claim the cancellation atomically: of two concurrent cancels only one
+        # gets a row back, so seats are restored exactly once
+        cancelled = db.session.execute(
+            update(Booking)
+            .where(Booking.id == booking_id, Booking.status.in_(('pending', 'confirmed')))
+            .values(status='cancelled')
+            .returning(Booking.trip_id, Booking.number_of_seats, Booking.seat_mask)
+        ).first()
+        
+        if not cancelled:
+            db.session.rollback()
             return jsonify({'error': 'Booking already cancelled'}), 400
         
         # Restore seats
-        trip = booking.scheduled_trip
-        trip.available_seats += booking.number_of_seats
+        trip = inventory.release_seats(cancelled.trip_id, cancelled.number_of_seats, cancelled.seat_mask)
+        availability.apply_seat_delta(trip, cancelled.number_of_seats)
         
-        booking.status = 'cancelled'
         db.session.commit()
+        trip_search_cache.invalidate_trip(trip)
         
         return jsonify({
             'message': 'Booking cancelled successfully',
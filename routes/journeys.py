@@ -0,0 +1,47 @@
+from flask import Blueprint, current_app, jsonify, request
+from services.route_planner import route_graph
+
+journeys_bp = Blueprint('journeys', __name__, url_prefix='/api/routes')
+
+def _int_arg(name, default, maximum, minimum=0):
+    value = request.args.get(name)
+    if value in (None, ''):
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValueError(f'{name} must be an integer between {minimum} and {maximum}')
+    if not minimum <= number <= maximum:
+        raise ValueError(f'{name} must be an integer between {minimum} and {maximum}')
+    return number
+
+@journeys_bp.route('/plan', methods=['GET'])
+def plan_route():
+    """Best itineraries between two stations over the line network (in-memory graph)."""
+    config = current_app.config
+    origin = (request.args.get('from') or '').strip()
+    destination = (request.args.get('to') or '').strip()
+    if not origin or not destination:
+        return jsonify({'error': 'from and to are required'}), 400
+    try:
+        max_transfers = _int_arg('max_transfers', config['PLAN_MAX_TRANSFERS'], config['PLAN_MAX_TRANSFERS'])
+        limit = _int_arg('limit', config['PLAN_MAX_ITINERARIES'], config['PLAN_MAX_ITINERARIES'], minimum=1)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        graph = route_graph.get()
+        sources, targets = graph.resolve(origin), graph.resolve(destination)
+        for value, stops in ((origin, sources), (destination, targets)):
+            if not stops:
+                return jsonify({'error': f'Unknown station: {value}'}), 404
+        if set(sources) & set(targets):
+            return jsonify({'error': 'from and to are the same station'}), 400
+
+        found = graph.plan(sources, targets, max_transfers, limit)
+        return jsonify({
+            'itineraries': [graph.itinerary(cost, transfers, edges) for cost, transfers, edges in found],
+            'count': len(found)
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
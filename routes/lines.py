@@ -1,14 +1,24 @@
 from flask import Blueprint, jsonify
+from services import catalog_versions
+from services.conditional import conditional
 from services.line_service import LineService
 
 lines_bp = Blueprint('lines', __name__, url_prefix='/api/lines')
 
+def lines_validator(line_id=None, resource=''):
+    # Lines and stops only change through the Excel import, which bumps 'lines'
+    version, updated_at = catalog_versions.get_versions(catalog_versions.LINES)[catalog_versions.LINES]
+    scope = ''.join(f'-{part}' for part in (line_id, resource) if part)
+    return f'lines-{version}{scope}', updated_at
+
 @lines_bp.route('/', methods=['GET'])
+@conditional(lines_validator)
 def get_lines():
     lines = LineService.get_all_lines()
     return jsonify([line.to_dict() for line in lines]), 200
 
 @lines_bp.route('/<uuid:line_id>', methods=['GET'])
+@conditional(lines_validator)
 def get_line(line_id):
     line = LineService.get_line_by_id(line_id)
     if not line:
@@ -16,6 +26,7 @@ def get_line(line_id):
     return jsonify(line.to_dict()), 200
 
 @lines_bp.route('/<uuid:line_id>/stops', methods=['GET'])
+@conditional(lambda line_id: lines_validator(line_id, 'stops'))
 def get_line_stops(line_id):
     stops = LineService.get_stops_by_line_id(line_id)
     return jsonify([stop.to_dict() for stop in stops]), 200
@@ -1,15 +1,42 @@
-from flask import Blueprint, request, jsonify
+from datetime import datetime, timedelta
+from flask import Blueprint, current_app, request, jsonify, url_for
+from sqlalchemy import update
 from models.public import db
 from models.clients import Payment, Booking
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from services.wave_payment import WavePaymentService
-from services.orange_money import OrangeMoneyService
-from services.mtn_momo import MTNMomoService
+from services.idempotency import idempotent
+from services.loading import load_plan
+from services.query_counter import query_budget
+from services import http, payment_jobs, webhook_inbox
+from services.circuit_breaker import ProviderUnavailable
+from services.payment_providers import PROVIDERS, get_service
 
 payment_bp = Blueprint('payment', __name__, url_prefix='/api/payments')
 
+def _wants_async():
+    prefer = request.headers.get('Prefer', '')
+    return current_app.config['PAYMENT_ASYNC_INITIATION'] or 'respond-async' in prefer.lower()
+
+def _provider_unavailable(payment_method):
+    response = jsonify({
+        'error': f'{payment_method} is temporarily unavailable, please choose another payment method',
+        'available_methods': [name for name in PROVIDERS if not http.breaker(name).is_open()]
+    })
+    response.headers['Retry-After'] = str(current_app.config['CIRCUIT_OPEN_SECONDS'])
+    return response, 503
+
+def _settle_initiation(payment_id, **values):
+    # Conditional, like the job worker: a payment a webhook already moved on stays put
+    db.session.execute(
+        update(Payment)
+        .where(Payment.id == payment_id, Payment.status == 'initiating')
+        .values(updated_at=datetime.utcnow(), **values)
+        .execution_options(synchronize_session=False)
+    )
+
 @payment_bp.route('/initiate', methods=['POST'])
 @jwt_required()
+@idempotent('initiate_payment')
 def initiate_payment():
     try:
         user_id = get_jwt_identity()
@@ -30,21 +57,35 @@ def initiate_payment():
         
         payment_method = data['payment_method'].lower()
         
+        # Keep the seats held while the customer completes the payment. Conditional
+        # so a hold the sweeper has just expired is not revived.
+        hold_until = datetime.utcnow() + timedelta(minutes=current_app.config['BOOKING_HOLD_TTL_MINUTES'])
+        extended = db.session.execute(
+            update(Booking)
+            .where(Booking.id == booking.id, Booking.status == 'pending')
+            .values(hold_expires_at=db.func.greatest(Booking.hold_expires_at, hold_until))
+            .returning(Booking.id)
+        ).first()
+        if not extended:
+            db.session.rollback()
+            return jsonify({'error': 'Booking is not pending payment'}), 400
+        
         # Check if payment already exists
         existing_payment = Payment.query.filter_by(booking_id=booking.id).first()
         if existing_payment and existing_payment.status == 'completed':
             return jsonify({'error': 'Payment already completed'}), 400
         
         # Initialize payment service based on method
-        if payment_method == 'wave':
-            service = WavePaymentService()
-        elif payment_method == 'orange_money':
-            service = OrangeMoneyService()
-        elif payment_method == 'mtn_momo':
-            service = MTNMomoService()
-        else:
+        service = get_service(payment_method)
+        if service is None:
             return jsonify({'error': 'Invalid payment method'}), 400
         
+        # Fail fast while the provider's circuit is open so the client can
+        # offer another method right away
+        if http.breaker(payment_method).is_open():
+            db.session.rollback()
+            return _provider_unavailable(payment_method)
+        
         # Create or update payment record
         if existing_payment:
             payment = existing_payment
@@ -58,15 +99,53 @@ def initiate_payment():
             )
             db.session.add(payment)
         
+        phone = data.get('phone', booking.passenger_phone)
+        # Flushed first: the reference sent to the provider carries the payment id
+        payment.status = 'initiating'
+        db.session.flush()
+        if _wants_async():
+            # Queue the provider call for `flask payments work` instead of
+            # holding this worker and transaction for the provider's latency
+            payment_jobs.enqueue(payment, phone)
+            db.session.commit()
+            
+            status_url = url_for('payment.get_payment_status', booking_id=booking.id)
+            response = jsonify({
+                'message': 'Payment initiation queued',
+                'payment': payment.to_dict(),
+                'status_url': status_url
+            })
+            response.headers['Location'] = status_url
+            return response, 202
+        
+        # A job queued by an earlier asynchronous /initiate would call the
+        # provider a second time
+        if existing_payment and not payment_jobs.cancel_queued(payment.id):
+            db.session.rollback()
+            return jsonify({'error': 'Payment initiation already in progress'}), 409
+        
+        # Commit the hold extension and the payment before calling the provider,
+        # so the booking row isn't locked for the length of the call
+        payment_id, amount, reference = payment.id, booking.total_price, f"MB{booking.id}{payment.id}"
+        db.session.commit()
+        
         # Initiate payment with provider
-        payment_response = service.initiate_payment(
-            amount=booking.total_price,
-            phone=data.get('phone', booking.passenger_phone),
-            transaction_id=f"MB{booking.id}{payment.id}"
+        try:
+            payment_response = service.initiate_payment(amount=amount, phone=phone, transaction_id=reference)
+        except Exception as e:
+            _settle_initiation(payment_id, status='failed', payment_provider_response=str(e))
+            db.session.commit()
+            if isinstance(e, ProviderUnavailable):
+                return _provider_unavailable(payment_method)
+            raise
+        
+        _settle_initiation(
+            payment_id,
+            status='pending',
+            transaction_id=payment_response.get('transaction_id'),
+            payment_url=payment_response.get('payment_url'),
+            payment_provider_response=str(payment_response)
         )
-        
-        payment.transaction_id = payment_response.get('transaction_id')
-        payment.payment_provider_response = str(payment_response)
         db.session.commit()
         
         return jsonify({
@@ -80,8 +159,24 @@ def initiate_payment():
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@payment_bp.route('/providers', methods=['GET'])
+def list_providers():
+    """Payment methods with this worker process's circuit breaker state."""
+    try:
+        providers = [dict(payment_method=name, **http.breaker(name).snapshot()) for name in PROVIDERS]
+        return jsonify({'providers': providers}), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @payment_bp.route('/webhook', methods=['POST'])
 def payment_webhook():
+    """
+    Acknowledge a provider callback with a single insert into the webhook
+    inbox; the serving process's process-payment-webhooks job applies it to
+    the payment and booking within WEBHOOK_PROCESS_INTERVAL_SECONDS.
+    Resent callbacks are deduplicated on (provider, transaction_id, status).
+    """
     try:
         data = request.get_json()
         transaction_id = data.get('transaction_id')
@@ -89,28 +184,25 @@ def payment_webhook():
         if not transaction_id:
             return jsonify({'error': 'transaction_id is required'}), 400
         
-        payment = Payment.query.filter_by(transaction_id=transaction_id).first()
-        if not payment:
-            return jsonify({'error': 'Payment not found'}), 404
-        
-        # Update payment status based on webhook data
-        status = data.get('status', 'pending').lower()
-        if status in ['completed', 'success', 'paid']:
-            payment.status = 'completed'
-            payment.booking.status = 'confirmed'
-        elif status in ['failed', 'cancelled', 'error']:
-            payment.status = 'failed'
-        
-        payment.payment_provider_response = str(data)
+        # Our callback URLs carry ?provider=<payment method>, the key the
+        # reconciler records its status checks under, so both deduplicate
+        provider = request.args.get('provider') or data.get('provider') or ''
+        created = webhook_inbox.record(
+            provider=str(provider).lower()[:20],
+            transaction_id=str(transaction_id),
+            status=data.get('status', 'pending'),
+            payload=request.get_data(as_text=True)
+        )
         db.session.commit()
         
-        return jsonify({'message': 'Webhook processed successfully'}), 200
+        return jsonify({'message': 'Webhook received', 'duplicate': not created}), 200
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 @payment_bp.route('/status/<int:booking_id>', methods=['GET'])
+@query_budget(2)
 @jwt_required()
 def get_payment_status(booking_id):
     try:
@@ -123,7 +215,7 @@ def get_payment_status(booking_id):
         if booking.user_id != user_id:
             return jsonify({'error': 'Unauthorized'}), 403
         
-        payment = Payment.query.filter_by(booking_id=booking_id).first()
+        payment = Payment.query.options(*load_plan('payment')).filter_by(booking_id=booking_id).first()
         
         if not payment:
             return jsonify({'error': 'Payment not found'}), 404
@@ -0,0 +1,57 @@
+import math
+from flask import Blueprint, current_app, jsonify, request
+from services.stop_index import stop_index
+
+stops_bp = Blueprint('stops', __name__, url_prefix='/api/stops')
+
+def _float_arg(name, default=None):
+    value = request.args.get(name)
+    if value in (None, ''):
+        if default is None:
+            raise ValueError(f'{name} is required')
+        return float(default)
+    try:
+        number = float(value)
+    except ValueError:
+        raise ValueError(f'{name} must be a number')
+    if not math.isfinite(number):
+        raise ValueError(f'{name} must be a number')
+    return number
+
+@stops_bp.route('/nearby', methods=['GET'])
+def nearby_stops():
+    """Stops within `radius` meters of (lat, lon), nearest first, served from the in-memory stop index."""
+    config = current_app.config
+    try:
+        lat = _float_arg('lat')
+        lon = _float_arg('lon')
+        radius = _float_arg('radius', config['STOPS_NEARBY_DEFAULT_RADIUS_METERS'])
+        limit = _float_arg('limit', 20)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if not -90 <= lat <= 90 or not -180 <= lon <= 180:
+        return jsonify({'error': 'lat must be between -90 and 90 and lon between -180 and 180'}), 400
+    if not 0 < radius <= config['STOPS_NEARBY_MAX_RADIUS_METERS']:
+        return jsonify({'error': f"radius must be between 0 and {config['STOPS_NEARBY_MAX_RADIUS_METERS']} meters"}), 400
+    if limit != int(limit) or not 1 <= limit <= config['STOPS_NEARBY_MAX_LIMIT']:
+        return jsonify({'error': f"limit must be an integer between 1 and {config['STOPS_NEARBY_MAX_LIMIT']}"}), 400
+
+    try:
+        results = stop_index.get().nearby(lat, lon, radius, int(limit))
+        return jsonify({
+            'stops': [
+                {
+                    'id': stop_id,
+                    'station': station_name,
+                    'latitude': latitude,
+                    'longitude': longitude,
+                    'order': order,
+                    'line': {'id': line_id, 'name': line_name},
+                    'distance_meters': round(distance, 1)
+                }
+                for (stop_id, latitude, longitude, order, line_id, line_name, station_name), distance in results
+            ],
+            'count': len(results)
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -1,44 +1,165 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
 from models.public import db
 from models.partners import ScheduledTrip
-from flask_jwt_extended import jwt_required
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from services import availability, catalog_versions, inventory, seat_map
+from services.conditional import conditional
+from services.loading import load_plan
+from services.pagination import decode_cursor, encode_cursor, parse_limit
+from services.normalization import normalize_city
+from services.query_counter import query_budget
+from services.trip_cache import trip_search_cache
+from services.trip_search import build_search_query, order_for_keyset, parse_search_date
 from datetime import datetime
 
 trip_bp = Blueprint('trip', __name__, url_prefix='/api/trips')
 
 @trip_bp.route('', methods=['GET'])
+@query_budget(1)
 def get_trips():
     try:
         departure_city = request.args.get('departure_city')
         arrival_city = request.args.get('arrival_city')
         date = request.args.get('date')
+        cursor = request.args.get('cursor')
+        stream = request.args.get('stream', '').lower() in ('1', 'true', 'yes')
         
-        query = ScheduledTrip.query.filter_by(status='active')
-        
-        if departure_city:
-            query = query.filter(ScheduledTrip.departure_city.ilike(f'%{departure_city}%'))
-        if arrival_city:
-            query = query.filter(ScheduledTrip.arrival_city.ilike(f'%{arrival_city}%'))
+        date_obj = None
         if date:
             try:
-                date_obj = datetime.strptime(date, '%Y-%m-%d').date()
-                query = query.filter(db.func.date(ScheduledTrip.departure_time) == date_obj)
+                date_obj = parse_search_date(date)
             except ValueError:
                 return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
         
-        trips = query.all()
+        try:
+            limit = parse_limit(
+                request.args.get('limit'),
+                current_app.config['TRIPS_PAGE_SIZE'],
+                current_app.config['TRIPS_MAX_PAGE_SIZE']
+            )
+            after = decode_cursor(cursor, 2) if cursor else None
+        except ValueError:
+            return jsonify({'error': 'Invalid limit or cursor'}), 400
+        
+        query = order_for_keyset(build_search_query(departure_city, arrival_city, date_obj), after)
+        query = query.options(*load_plan('trip'))
+        
+        if stream:
+            return _stream_trips(query)
+        
+        cache_key = (
+            normalize_city(departure_city) or '',
+            normalize_city(arrival_city) or '',
+            date_obj,
+            cursor,
+            limit
+        )
+        if trip_search_cache.enabled:
+            cached = trip_search_cache.get(cache_key)
+            if cached is not None:
+                return jsonify(cached), 200
+        generation = trip_search_cache.generation()
+        
+        # Fetch one extra row to know whether another page exists
+        trips = query.limit(limit + 1).all()
+        has_more = len(trips) > limit
+        trips = trips[:limit]
+        
+        next_cursor = None
+        if has_more:
+            last = trips[-1]
+            next_cursor = encode_cursor(last.departure_time, last.id)
+        
+        payload = {
+            'trips': [trip.to_dict() for trip in trips],
+            'next_cursor': next_cursor
+        }
+        if trip_search_cache.enabled:
+            trip_search_cache.set(cache_key, payload, generation)
+        
+        return jsonify(payload), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def _stream_trips(query):
+    """
+    Write the whole result set as a JSON array, one row at a time, from a
+    server-side cursor so memory stays flat regardless of the match count.
+    """
+    batch_size = current_app.config['TRIPS_STREAM_BATCH_SIZE']
+    rows = query.yield_per(batch_size)
+    
+    def generate():
+        yield '{"trips": ['
+        for index, trip in enumerate(rows):
+            yield (',' if index else '') + current_app.json.dumps(trip.to_dict())
+        yield '], "next_cursor": null}'
+    
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
+@trip_bp.route('/calendar', methods=['GET'])
+@query_budget(1)
+def get_trip_calendar():
+    try:
+        departure_city = request.args.get('departure_city')
+        arrival_city = request.args.get('arrival_city')
+        
+        if not departure_city or not arrival_city or not request.args.get('start'):
+            return jsonify({'error': 'departure_city, arrival_city and start are required'}), 400
+        
+        try:
+            start_date = parse_search_date(request.args['start'])
+            end_date = parse_search_date(request.args.get('end') or request.args['start'])
+        except ValueError:
+            return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+        
+        if end_date < start_date or (end_date - start_date).days >= availability.MAX_CALENDAR_DAYS:
+            return jsonify({'error': f'Date range must cover 1 to {availability.MAX_CALENDAR_DAYS} days'}), 400
+        
+        days = availability.get_calendar(
+            normalize_city(departure_city),
+            normalize_city(arrival_city),
+            start_date,
+            end_date
+        )
         
         return jsonify({
-            'trips': [trip.to_dict() for trip in trips]
+            'start': start_date.isoformat(),
+            'end': end_date.isoformat(),
+            'days': [day.to_dict() for day in days]
         }), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@trip_bp.route('/cache/stats', methods=['GET'])
+@jwt_required()
+def get_search_cache_stats():
+    from models.public import User
+    user = User.query.get(get_jwt_identity())
+    if not user or user.role != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+    return jsonify({'cache': trip_search_cache.stats()}), 200
+
+def trip_validator(trip_id):
+    # Trips have no updated_at: tag on the columns that change after creation
+    # (seats, status) plus the vehicles catalog embedded in the payload.
+    state = db.session.execute(
+        db.select(ScheduledTrip.available_seats, ScheduledTrip.status)
+        .where(ScheduledTrip.id == trip_id)
+    ).first()
+    if state is None:
+        return None
+    vehicles_version, _ = catalog_versions.get_versions(catalog_versions.VEHICLES)[catalog_versions.VEHICLES]
+    return f'trip-{trip_id}-{state.available_seats}-{state.status}-v{vehicles_version}', None
+
 @trip_bp.route('/<int:trip_id>', methods=['GET'])
+@conditional(trip_validator)
+@query_budget(1)
 def get_trip(trip_id):
     try:
-        trip = ScheduledTrip.query.get(trip_id)
+        trip = ScheduledTrip.query.options(*load_plan('trip')).get(trip_id)
         
         if not trip:
             return jsonify({'error': 'Trip not found'}), 404
@@ -48,6 +169,20 @@ def get_trip(trip_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@trip_bp.route('/<int:trip_id>/seats', methods=['GET'])
+@query_budget(1)
+def get_trip_seats(trip_id):
+    try:
+        layout = inventory.seat_layout(trip_id)
+        
+        if not layout:
+            return jsonify({'error': 'Trip not found'}), 404
+        
+        return jsonify(layout), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @trip_bp.route('', methods=['POST'])
 @jwt_required()
 def create_trip():
@@ -96,14 +231,36 @@ def create_trip():
         if overlapping:
              return jsonify({'error': 'Vehicle is already booked for this time range'}), 409
         
+        # Seat map: blocked seats (driver, crew) are set from the start. An
+        # empty list means no blocked seats; without a list, seats held back
+        # through available_seats are the last ones.
+        total_seats = int(data.get('total_seats', vehicle.capacity))
+        available_seats = int(data.get('available_seats', total_seats))
+        if data.get('blocked_seats') == []:
+            blocked_seats = []
+            available_seats = total_seats
+        elif data.get('blocked_seats') is not None:
+            try:
+                blocked_seats = seat_map.parse_seat_numbers(data['blocked_seats'])
+            except ValueError as e:
+                return jsonify({'error': str(e).replace('seat_numbers', 'blocked_seats')}), 400
+            if blocked_seats[-1] > total_seats:
+                return jsonify({'error': 'blocked_seats must be within total_seats'}), 400
+            available_seats = total_seats - len(blocked_seats)
+        else:
+            if not 0 <= available_seats <= total_seats:
+                return jsonify({'error': 'available_seats must be between 0 and total_seats'}), 400
+            blocked_seats = list(range(available_seats + 1, total_seats + 1))
+        blocked_seat_map = seat_map.encode(blocked_seats, total_seats)
+        
         trip = ScheduledTrip(
             departure_city=data['departure_city'],
             arrival_city=data['arrival_city'],
             departure_time=departure_time,
             arrival_time=arrival_time,
             price=float(data['price']),
-            available_seats=int(data.get('available_seats', vehicle.capacity)), # Default to vehicle capacity
-            total_seats=int(data.get('total_seats', vehicle.capacity)),
+            total_seats=total_seats,
+            blocked_seat_map=blocked_seat_map,
             driver_name=data['driver_name'],
             driver_phone=data['driver_phone'],
             # vehicle_number=data['vehicle_number'], # Deprecated
@@ -112,7 +269,11 @@ def create_trip():
         )
         
         db.session.add(trip)
+        db.session.flush()
+        inventory.create_counters(trip, available_seats, blocked_seat_map, current_app.config['SEAT_COUNTER_SLOTS'])
+        availability.add_trip(trip, available_seats)
         db.session.commit()
+        trip_search_cache.invalidate_trip(trip)
         
         return jsonify({
             'message': 'Trip created successfully',
@@ -4,7 +4,11 @@ from models.vehicles import Vehicle
 from models.partners import ScheduledTrip
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime
-from sqlalchemy import or_
+from sqlalchemy import or_, select
+from services import catalog_versions
+from services.conditional import conditional_response
+from services.loading import load_plan
+from services.query_counter import query_budget
 
 vehicles_bp = Blueprint('vehicles', __name__, url_prefix='/api/vehicles')
 
@@ -16,18 +20,25 @@ def admin_required():
     return True
 
 @vehicles_bp.route('', methods=['GET'])
+@query_budget(3)
 @jwt_required()
 def get_vehicles():
     if not admin_required():
         return jsonify({'error': 'Unauthorized'}), 403
         
     try:
-        vehicles = Vehicle.query.all()
-        return jsonify({'vehicles': [v.to_dict() for v in vehicles]}), 200
+        version, updated_at = catalog_versions.get_versions(catalog_versions.VEHICLES)[catalog_versions.VEHICLES]
+        
+        def build():
+            vehicles = Vehicle.query.options(*load_plan('vehicle')).all()
+            return jsonify({'vehicles': [v.to_dict() for v in vehicles]}), 200
+        
+        return conditional_response(f'vehicles-{version}', updated_at, build)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @vehicles_bp.route('/available', methods=['GET'])
+@query_budget(1)
 @jwt_required()
 def get_available_vehicles():
     # if not admin_required():
@@ -43,17 +54,17 @@ def get_available_vehicles():
         start_time = datetime.fromisoformat(start_time_str.replace('Z', '+00:00'))
         end_time = datetime.fromisoformat(end_time_str.replace('Z', '+00:00'))
         
-        # Find vehicles that have overlapping trips
-        overlapping_trips = ScheduledTrip.query.filter(
+        # Vehicles with an overlapping trip, resolved in the database rather than
+        # loading every overlapping trip row
+        busy_vehicle_ids = select(ScheduledTrip.vehicle_id).where(
             ScheduledTrip.status == 'active',
+            ScheduledTrip.vehicle_id.isnot(None),
             or_(
                 (ScheduledTrip.departure_time <= end_time) & (ScheduledTrip.arrival_time >= start_time)
             )
-        ).all()
-        
-        busy_vehicle_ids = [trip.vehicle_id for trip in overlapping_trips if trip.vehicle_id]
+        )
         
-        available_vehicles = Vehicle.query.filter(
+        available_vehicles = Vehicle.query.options(*load_plan('vehicle')).filter(
             Vehicle.status == 'ACTIVE',
             ~Vehicle.id.in_(busy_vehicle_ids)
         ).all()
@@ -89,6 +100,7 @@ def create_vehicle():
         )
         
         db.session.add(vehicle)
+        catalog_versions.bump(catalog_versions.VEHICLES)
         db.session.commit()
         
         return jsonify({'message': 'Vehicle created', 'vehicle': vehicle.to_dict()}), 201
@@ -116,6 +128,7 @@ def update_vehicle(vehicle_id):
         if 'image_url' in data: vehicle.image_url = data['image_url']
         if 'status' in data: vehicle.status = data['status']
         
+        catalog_versions.bump(catalog_versions.VEHICLES)
         db.session.commit()
         return jsonify({'message': 'Vehicle updated', 'vehicle': vehicle.to_dict()}), 200
         
@@ -0,0 +1,124 @@
+from datetime import datetime
+from flask import Blueprint, request, jsonify
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from models.public import db
+from models.clients import WaitlistEntry
+from models.partners import ScheduledTrip
+from services import waitlist
+
+waitlist_bp = Blueprint('waitlist', __name__, url_prefix='/api/waitlist')
+
+@waitlist_bp.route('', methods=['POST'])
+@jwt_required()
+def join_waitlist():
+    try:
+        user_id = get_jwt_identity()
+        data = request.get_json()
+        
+        # Validation
+        required_fields = ['trip_id', 'number_of_seats', 'passenger_name', 'passenger_phone']
+        for field in required_fields:
+            if not data.get(field):
+                return jsonify({'error': f'{field} is required'}), 400
+        
+        number_of_seats = int(data['number_of_seats'])
+        if number_of_seats < 1:
+            return jsonify({'error': 'number_of_seats must be at least 1'}), 400
+        
+        trip = ScheduledTrip.query.get(data['trip_id'])
+        if not trip:
+            return jsonify({'error': 'Trip not found'}), 404
+        
+        if trip.status != 'active' or trip.departure_time <= datetime.utcnow():
+            return jsonify({'error': 'Trip is not available for booking'}), 400
+        
+        if number_of_seats > trip.total_seats:
+            return jsonify({'error': 'Not enough seats on this trip'}), 400
+        
+        if trip.available_seats >= number_of_seats:
+            return jsonify({'error': 'Seats are available, book the trip directly'}), 400
+        
+        entry = WaitlistEntry(
+            user_id=user_id,
+            trip_id=trip.id,
+            number_of_seats=number_of_seats,
+            passenger_name=data['passenger_name'],
+            passenger_phone=data['passenger_phone'],
+            status='waiting'
+        )
+        db.session.add(entry)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return jsonify({'error': 'Already on the waitlist for this trip'}), 409
+        
+        position = db.session.execute(
+            db.select(waitlist.position_column()).where(WaitlistEntry.id == entry.id)
+        ).scalar()
+        
+        return jsonify({
+            'message': 'Added to the waitlist',
+            'entry': entry.to_dict(position)
+        }), 201
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@waitlist_bp.route('', methods=['GET'])
+@jwt_required()
+def get_waitlist_entries():
+    try:
+        user_id = get_jwt_identity()
+        
+        rows = db.session.execute(
+            db.select(WaitlistEntry, waitlist.position_column())
+            .where(WaitlistEntry.user_id == user_id)
+            .order_by(WaitlistEntry.created_at.desc(), WaitlistEntry.id.desc())
+        ).all()
+        
+        return jsonify({'entries': [entry.to_dict(position) for entry, position in rows]}), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@waitlist_bp.route('/<int:entry_id>', methods=['DELETE'])
+@jwt_required()
+def leave_waitlist(entry_id):
+    try:
+        user_id = get_jwt_identity()
+        entry = WaitlistEntry.query.get(entry_id)
+        
+        if not entry:
+            return jsonify({'error': 'Waitlist entry not found'}), 404
+        
+        if entry.user_id != user_id:
+            return jsonify({'error': 'Unauthorized'}), 403
+        
+        # Conditional: the promotion worker locks the entries it promotes, so
+        # this waits for it and then no longer matches a promoted entry
+        left = db.session.execute(
+            update(WaitlistEntry)
+            .where(WaitlistEntry.id == entry_id, WaitlistEntry.status == 'waiting')
+            .values(status='cancelled')
+            .returning(WaitlistEntry.id)
+        ).first()
+        
+        if not left:
+            db.session.rollback()
+            return jsonify({'error': 'Waitlist entry is no longer waiting'}), 400
+        
+        db.session.commit()
+        db.session.refresh(entry)
+        
+        return jsonify({
+            'message': 'Removed from the waitlist',
+            'entry': entry.to_dict()
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,167 @@
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import cast, func, select, Date
+from sqlalchemy.dialects.postgresql import insert
+from models.public import db
+from models.partners import RouteDateAvailability, RouteDateSeatDelta, ScheduledTrip
+
+MAX_CALENDAR_DAYS = 62
+
+
+def apply_seat_delta(trip, delta):
+    """
+    Shift the remaining seats of the trip's route/date by `delta` (negative when
+    seats are booked). Runs in the caller's transaction so the change commits
+    together with the booking.
+
+    The delta is appended to route_date_seat_deltas rather than updating the
+    rollup row, which every booking on the route/date would otherwise queue
+    on. Reads add the pending deltas; fold_seat_deltas() merges them.
+    """
+    apply_seat_deltas([(trip, delta)])
+
+
+def apply_seat_deltas(changes):
+    """
+    Bulk form of apply_seat_delta for [(trip, delta), ...]: deltas are summed
+    per route/date and appended with a single multi-row INSERT.
+    """
+    totals = defaultdict(int)
+    for trip, delta in changes:
+        if delta and trip.status == 'active':
+            totals[(trip.departure_city_key, trip.arrival_city_key, trip.departure_time.date())] += delta
+    rows = [{
+        'departure_city_key': departure_key,
+        'arrival_city_key': arrival_key,
+        'travel_date': travel_date,
+        'delta': delta,
+        'created_at': datetime.utcnow()
+    } for (departure_key, arrival_key, travel_date), delta in totals.items() if delta]
+    if rows:
+        db.session.execute(insert(RouteDateSeatDelta.__table__).values(rows))
+
+
+# Fold in one statement (one snapshot): deltas appended meanwhile stay for the
+# next run.
+_FOLD_SQL = db.text("""
+    WITH folded AS (
+        DELETE FROM partners.route_date_seat_deltas
+        RETURNING departure_city_key, arrival_city_key, travel_date, delta
+    ), per_day AS (
+        SELECT departure_city_key, arrival_city_key, travel_date, sum(delta) AS delta, count(*) AS deltas
+        FROM folded
+        GROUP BY departure_city_key, arrival_city_key, travel_date
+    ), applied AS (
+        UPDATE partners.route_date_availability r
+        SET available_seats = r.available_seats + per_day.delta,
+            updated_at = now()
+        FROM per_day
+        WHERE r.departure_city_key = per_day.departure_city_key
+          AND r.arrival_city_key = per_day.arrival_city_key
+          AND r.travel_date = per_day.travel_date
+    )
+    SELECT coalesce(sum(deltas), 0) FROM per_day
+""")
+
+
+def fold_seat_deltas():
+    """
+    Merge the pending seat deltas into the rollup rows. Returns the number of
+    delta rows folded.
+    """
+    folded = db.session.execute(_FOLD_SQL).scalar()
+    db.session.commit()
+    return int(folded)
+
+
+def add_trip(trip, available_seats):
+    """
+    Count a newly created active trip, with its `available_seats`, in its
+    route/date row.
+    """
+    if trip.status != 'active':
+        return
+    table = RouteDateAvailability.__table__
+    stmt = insert(table).values(
+        departure_city_key=trip.departure_city_key,
+        arrival_city_key=trip.arrival_city_key,
+        travel_date=trip.departure_time.date(),
+        departure_city=trip.departure_city,
+        arrival_city=trip.arrival_city,
+        trip_count=1,
+        min_price=trip.price,
+        available_seats=available_seats,
+        updated_at=datetime.utcnow()
+    )
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=['departure_city_key', 'arrival_city_key', 'travel_date'],
+        set_={
+            'trip_count': table.c.trip_count + 1,
+            'min_price': func.least(table.c.min_price, stmt.excluded.min_price),
+            'available_seats': table.c.available_seats + stmt.excluded.available_seats,
+            'updated_at': stmt.excluded.updated_at
+        }
+    ))
+
+
+def _rollup_select(*criteria):
+    travel_date = cast(ScheduledTrip.departure_time, Date)
+    return (
+        select(
+            ScheduledTrip.departure_city_key,
+            ScheduledTrip.arrival_city_key,
+            travel_date.label('travel_date'),
+            func.min(ScheduledTrip.departure_city).label('departure_city'),
+            func.min(ScheduledTrip.arrival_city).label('arrival_city'),
+            func.count(ScheduledTrip.id).label('trip_count'),
+            func.min(ScheduledTrip.price).label('min_price'),
+            func.coalesce(func.sum(ScheduledTrip.available_seats), 0).label('available_seats'),
+            func.now().label('updated_at')
+        )
+        .where(ScheduledTrip.status == 'active', *criteria)
+        .group_by(ScheduledTrip.departure_city_key, ScheduledTrip.arrival_city_key, travel_date)
+    )
+
+
+def rebuild_all():
+    """
+    Rebuild the whole rollup in one statement. Also the way to resync after a
+    trip is cancelled or repriced, which a seat delta can't express (min_price).
+    Returns the number of rows.
+    """
+    # One snapshot for the recount and the deltas it replaces, so a booking
+    # committing meanwhile is either in both or in neither
+    db.session.connection(execution_options={'isolation_level': 'REPEATABLE READ'})
+    db.session.execute(RouteDateSeatDelta.__table__.delete())
+    db.session.execute(RouteDateAvailability.__table__.delete())
+    _insert_rollup(_rollup_select())
+    db.session.commit()
+    return RouteDateAvailability.query.count()
+
+
+def _insert_rollup(rollup):
+    table = RouteDateAvailability.__table__
+    db.session.execute(
+        table.insert().from_select(
+            ['departure_city_key', 'arrival_city_key', 'travel_date', 'departure_city',
+             'arrival_city', 'trip_count', 'min_price', 'available_seats', 'updated_at'],
+            rollup
+        )
+    )
+
+
+def get_calendar(departure_key, arrival_key, start_date, end_date):
+    """
+    Rollup rows for a route over [start_date, end_date], in one query.
+    """
+    return (
+        RouteDateAvailability.query
+        .filter(
+            RouteDateAvailability.departure_city_key == departure_key,
+            RouteDateAvailability.arrival_city_key == arrival_key,
+            RouteDateAvailability.travel_date >= start_date,
+            RouteDateAvailability.travel_date <= end_date
+        )
+        .order_by(RouteDateAvailability.travel_date)
+        .all()
+    )
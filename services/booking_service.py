@@ -0,0 +1,51 @@
+from sqlalchemy import update
+from models.public import db
+from models.clients import Booking
+from services import availability, inventory, seat_map
+
+
+def confirm_paid_booking(booking_id):
+    """
+    Confirm a booking whose payment completed. Every transition is a
+    conditional UPDATE so it can't race the hold sweeper or a cancel.
+
+    A booking whose hold already expired gets its seats back if the trip still
+    has them. Returns (confirmed, trip) where `trip` is the trip row whose seats
+    changed (for cache invalidation after commit), or None.
+    """
+    if db.session.execute(
+        update(Booking)
+        .where(Booking.id == booking_id, Booking.status == 'pending')
+        .values(status='confirmed')
+        .returning(Booking.id)
+    ).first():
+        return True, None
+
+    expired = db.session.execute(
+        update(Booking)
+        .where(Booking.id == booking_id, Booking.status == 'expired')
+        .values(status='confirmed')
+        .returning(Booking.trip_id, Booking.number_of_seats, Booking.seat_mask)
+    ).first()
+    if not expired:
+        return False, None
+
+    # Take the same seats back if they are still free, otherwise any free ones
+    trip = None
+    if expired.seat_mask is not None:
+        trip = inventory.reserve_seats(expired.trip_id, expired.number_of_seats, seat_map.decode(expired.seat_mask))
+    if trip is None:
+        trip = inventory.reserve_seats(expired.trip_id, expired.number_of_seats)
+    if trip is None:
+        db.session.execute(
+            update(Booking).where(Booking.id == booking_id).values(status='expired')
+        )
+        print(f"Booking {booking_id} was paid after its hold expired and the trip is full: refund needed")
+        return False, None
+
+    if trip.seat_mask != expired.seat_mask:
+        db.session.execute(
+            update(Booking).where(Booking.id == booking_id).values(seat_mask=trip.seat_mask)
+        )
+    availability.apply_seat_delta(trip, -expired.number_of_seats)
+    return True, trip
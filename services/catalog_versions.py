@@ -0,0 +1,33 @@
+from datetime import datetime
+from sqlalchemy.dialects.postgresql import insert
+from models.public import db, CatalogVersion
+
+LINES = 'lines'
+VEHICLES = 'vehicles'
+
+
+def bump(name):
+    """
+    Record a change to a catalog. Runs in the caller's transaction so the new
+    version only becomes visible with the data it describes.
+    """
+    table = CatalogVersion.__table__
+    stmt = insert(table).values(name=name, version=1, updated_at=datetime.utcnow())
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=['name'],
+        set_={'version': table.c.version + 1, 'updated_at': stmt.excluded.updated_at}
+    ))
+
+
+def get_versions(*names):
+    """
+    {name: (version, updated_at)} for the requested catalogs, in one query.
+    Catalogs that were never bumped report version 0.
+    """
+    rows = db.session.execute(
+        db.select(CatalogVersion.name, CatalogVersion.version, CatalogVersion.updated_at)
+        .where(CatalogVersion.name.in_(names))
+    ).all()
+    versions = {name: (0, None) for name in names}
+    versions.update({row.name: (row.version, row.updated_at) for row in rows})
+    return versions
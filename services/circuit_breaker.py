@@ -0,0 +1,135 @@
+import threading
+import time
+from collections import deque
+
+
+class ProviderUnavailable(Exception):
+    """Raised instead of calling a provider whose circuit is open."""
+
+
+class CircuitBreaker:
+    """
+    Per-process circuit breaker over the last `window` calls to one provider.
+
+    closed: calls go through. Once at least `min_calls` are in the window, the
+    circuit opens if the share of failed calls reaches `failure_rate` or the
+    share of calls slower than `slow_call_seconds` reaches `slow_call_rate`.
+    open: calls fail at once with ProviderUnavailable for `open_seconds`.
+    half_open: up to `half_open_probes` calls are let through; the circuit
+    closes (with an empty window) when they all succeed and re-opens on the
+    first failure.
+
+    It also derives the read timeout from observed latency: p99 of the
+    successful calls in the window times `timeout_multiplier`, kept within
+    [min_read_timeout, max_read_timeout].
+    """
+
+    def __init__(self, name, window=50, min_calls=10, failure_rate=0.5, slow_call_seconds=5.0,
+                 slow_call_rate=0.8, open_seconds=30, half_open_probes=1,
+                 min_read_timeout=2.0, max_read_timeout=20.0, timeout_multiplier=3.0):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.min_read_timeout = min_read_timeout
+        self.max_read_timeout = max_read_timeout
+        self.timeout_multiplier = timeout_multiplier
+        # (succeeded, duration) of the last calls
+        self._calls = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._state = 'closed'
+        self._opened_at = None
+        self._probes = 0
+        self._probe_successes = 0
+        self.rejected = 0
+
+    def _half_open_due(self, now):
+        return self._state == 'open' and now - self._opened_at >= self.open_seconds
+
+    def is_open(self):
+        """True while calls would be rejected (no side effects)."""
+        with self._lock:
+            if self._state == 'open':
+                return not self._half_open_due(time.monotonic())
+            return self._state == 'half_open' and self._probes >= self.half_open_probes
+
+    def before_call(self):
+        """Reserve a call or raise ProviderUnavailable."""
+        with self._lock:
+            now = time.monotonic()
+            if self._half_open_due(now):
+                self._state = 'half_open'
+                self._probes = 0
+                self._probe_successes = 0
+            if self._state == 'open' or (self._state == 'half_open' and self._probes >= self.half_open_probes):
+                self.rejected += 1
+                raise ProviderUnavailable(f'{self.name} is temporarily unavailable')
+            if self._state == 'half_open':
+                self._probes += 1
+
+    def record(self, succeeded, duration):
+        with self._lock:
+            if self._state == 'half_open':
+                if not succeeded:
+                    self._trip()
+                    return
+                self._probe_successes += 1
+                if self._probe_successes >= self.half_open_probes:
+                    self._state = 'closed'
+                    self._calls.clear()
+                return
+            if self._state == 'open':
+                # A call let through before the circuit opened
+                return
+
+            self._calls.append((succeeded, duration))
+            calls = len(self._calls)
+            if calls < self.min_calls:
+                return
+            failed = sum(1 for ok, _ in self._calls if not ok)
+            slow = sum(1 for _, seconds in self._calls if seconds >= self.slow_call_seconds)
+            if failed / calls >= self.failure_rate or slow / calls >= self.slow_call_rate:
+                self._trip()
+
+    def _trip(self):
+        self._state = 'open'
+        self._opened_at = time.monotonic()
+        self._calls.clear()
+        print(f"[circuit] {self.name}: open for {self.open_seconds}s")
+
+    def _percentile(self, durations, percentile):
+        index = min(len(durations) - 1, int(len(durations) * percentile))
+        return durations[index]
+
+    def read_timeout(self):
+        with self._lock:
+            durations = sorted(seconds for ok, seconds in self._calls if ok)
+        if len(durations) < self.min_calls:
+            return self.max_read_timeout
+        timeout = self._percentile(durations, 0.99) * self.timeout_multiplier
+        return min(self.max_read_timeout, max(self.min_read_timeout, timeout))
+
+    def snapshot(self):
+        with self._lock:
+            state = self._state
+            if self._half_open_due(time.monotonic()):
+                state = 'half_open'
+            calls = list(self._calls)
+            retry_in = None
+            if state == 'open':
+                retry_in = round(max(0.0, self._opened_at + self.open_seconds - time.monotonic()), 1)
+        durations = sorted(seconds for ok, seconds in calls if ok)
+        return {
+            'state': state,
+            'available': state != 'open',
+            'retry_in_seconds': retry_in,
+            'calls': len(calls),
+            'failure_rate': round(sum(1 for ok, _ in calls if not ok) / len(calls), 3) if calls else 0.0,
+            'p50_ms': round(self._percentile(durations, 0.5) * 1000) if durations else None,
+            'p99_ms': round(self._percentile(durations, 0.99) * 1000) if durations else None,
+            'read_timeout_seconds': round(self.read_timeout(), 2),
+            'rejected': self.rejected
+        }
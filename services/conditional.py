@@ -0,0 +1,56 @@
+from datetime import timezone
+from functools import wraps
+from flask import make_response, request
+
+
+def _not_modified(etag, last_modified):
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if last_modified and request.if_modified_since:
+        return last_modified.replace(microsecond=0) <= request.if_modified_since
+    return False
+
+
+def conditional_response(etag, last_modified, build):
+    """
+    Answer 304 when the client already holds `etag` (or a copy at least as new
+    as `last_modified`), otherwise call `build()` and tag its response.
+
+    `etag` must come from a version counter or row state, never from the
+    payload, so the 304 path does not load or serialize anything.
+    `last_modified` is a naive UTC datetime or None.
+    """
+    if last_modified is not None and last_modified.tzinfo is None:
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+
+    if _not_modified(etag, last_modified):
+        response = make_response('', 304)
+    else:
+        response = make_response(build())
+        if response.status_code != 200:
+            return response
+
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    # Let clients keep the body but revalidate it on every use
+    response.cache_control.no_cache = True
+    return response
+
+
+def conditional(validator):
+    """
+    View decorator for conditional GETs. `validator(**view_kwargs)` returns
+    (etag, last_modified), or None to skip straight to the view (e.g. the
+    resource does not exist and the view will 404).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            state = validator(**kwargs)
+            if state is None:
+                return view(*args, **kwargs)
+            etag, last_modified = state
+            return conditional_response(etag, last_modified, lambda: view(*args, **kwargs))
+        return wrapper
+    return decorator
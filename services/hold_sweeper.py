@@ -0,0 +1,79 @@
+from datetime import datetime
+from models.public import db
+from services import availability
+from services.trip_cache import trip_search_cache
+
+# One statement per batch: pick expired unpaid holds (SKIP LOCKED so parallel
+# sweepers and in-flight cancels don't block each other), flip them to
+# 'expired', then give the seats back with one UPDATE per batch: summed per
+# trip (seat map bits OR-ed together and cleared) into one random seat counter
+# slot of the trip.
+_SWEEP_SQL = db.text("""
+    WITH candidates AS (
+        SELECT b.id
+        FROM clients.bookings b
+        WHERE b.status = 'pending'
+          AND b.hold_expires_at < :now
+          AND NOT EXISTS (
+              SELECT 1 FROM clients.payments p
+              WHERE p.booking_id = b.id AND p.status = 'completed'
+          )
+        ORDER BY b.hold_expires_at
+        LIMIT :batch_size
+        FOR UPDATE OF b SKIP LOCKED
+    ), expired AS (
+        UPDATE clients.bookings b
+        SET status = 'expired'
+        FROM candidates c
+        WHERE b.id = c.id
+        RETURNING b.trip_id, b.number_of_seats, b.seat_mask
+    ), per_trip AS (
+        SELECT trip_id, sum(number_of_seats) AS seats, count(*) AS bookings,
+               bit_or(seat_mask) AS seat_mask
+        FROM expired
+        GROUP BY trip_id
+    ), target AS (
+        SELECT DISTINCT ON (s.trip_id) s.trip_id, s.slot, p.seats, p.bookings, p.seat_mask
+        FROM per_trip p
+        JOIN partners.trip_seat_counters s ON s.trip_id = p.trip_id
+        ORDER BY s.trip_id, random()
+    ), released AS (
+        UPDATE partners.trip_seat_counters s
+        SET available_seats = s.available_seats + target.seats,
+            seat_map = CASE WHEN target.seat_mask IS NULL THEN s.seat_map
+                            ELSE s.seat_map & ~target.seat_mask END
+        FROM target
+        WHERE s.trip_id = target.trip_id AND s.slot = target.slot
+        RETURNING s.trip_id, target.seats, target.bookings
+    )
+    SELECT t.id, t.status, t.departure_city_key, t.arrival_city_key, t.departure_time,
+           r.seats, r.bookings
+    FROM released r
+    JOIN partners.scheduled_trips t ON t.id = r.trip_id
+""")
+
+
+def sweep_expired_holds(batch_size=1000, now=None):
+    """
+    Expire pending bookings whose hold has passed and that have no completed
+    payment, returning their seats. Works in committed batches of `batch_size`
+    until nothing is left. Returns {'bookings', 'seats', 'trips'} totals.
+    """
+    now = now or datetime.utcnow()
+    totals = {'bookings': 0, 'seats': 0, 'trips': 0}
+
+    while True:
+        trips = db.session.execute(_SWEEP_SQL, {'now': now, 'batch_size': batch_size}).all()
+        availability.apply_seat_deltas([(trip, trip.seats) for trip in trips])
+        db.session.commit()
+
+        for trip in trips:
+            trip_search_cache.invalidate_trip(trip)
+
+        swept = sum(trip.bookings for trip in trips)
+        totals['bookings'] += swept
+        totals['seats'] += sum(trip.seats for trip in trips)
+        totals['trips'] += len(trips)
+
+        if swept < batch_size:
+            return totals
@@ -0,0 +1,119 @@
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from config import Config
+from services.circuit_breaker import CircuitBreaker
+
+# Methods safe to send twice. Other requests are only retried when the
+# connection could not be opened, i.e. before anything reached the provider.
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+
+_sessions = {}
+_lock = threading.Lock()
+
+
+def timeout():
+    """Fixed (connect, read) timeout, for calls outside a provider session."""
+    return Config.HTTP_CONNECT_TIMEOUT, Config.HTTP_READ_TIMEOUT
+
+
+class ProviderSession(requests.Session):
+    """
+    Session whose calls go through the provider's circuit breaker: rejected
+    with ProviderUnavailable while it is open, and timed and recorded
+    otherwise. Any exception (transport errors included) and 5xx answers
+    (after retries) count as failures; 4xx are the caller's problem and count
+    as successes.
+    """
+
+    def __init__(self, breaker):
+        super().__init__()
+        self.breaker = breaker
+
+    def timeout(self):
+        """(connect, read) timeout, the read part adapted to observed latency."""
+        return Config.HTTP_CONNECT_TIMEOUT, self.breaker.read_timeout()
+
+    def request(self, method, url, *args, **kwargs):
+        self.breaker.before_call()
+        started = time.monotonic()
+        try:
+            response = super().request(method, url, *args, **kwargs)
+        except BaseException:
+            # Any error, not only transport ones: before_call() may have taken
+            # the half-open probe slot, which only record() gives back
+            self.breaker.record(False, time.monotonic() - started)
+            raise
+        self.breaker.record(response.status_code < 500, time.monotonic() - started)
+        return response
+
+
+def _build_breaker(name):
+    return CircuitBreaker(
+        name,
+        window=Config.CIRCUIT_WINDOW_SIZE,
+        min_calls=Config.CIRCUIT_MIN_CALLS,
+        failure_rate=Config.CIRCUIT_FAILURE_RATE,
+        slow_call_seconds=Config.CIRCUIT_SLOW_CALL_SECONDS,
+        slow_call_rate=Config.CIRCUIT_SLOW_CALL_RATE,
+        open_seconds=Config.CIRCUIT_OPEN_SECONDS,
+        half_open_probes=Config.CIRCUIT_HALF_OPEN_PROBES,
+        min_read_timeout=Config.HTTP_MIN_READ_TIMEOUT,
+        max_read_timeout=Config.HTTP_READ_TIMEOUT,
+        timeout_multiplier=Config.HTTP_TIMEOUT_P99_MULTIPLIER
+    )
+
+
+def _build_session(name):
+    retry = Retry(
+        total=Config.HTTP_RETRIES,
+        connect=Config.HTTP_RETRIES,
+        read=Config.HTTP_RETRIES,
+        status=Config.HTTP_RETRIES,
+        backoff_factor=Config.HTTP_RETRY_BACKOFF,
+        status_forcelist=(429, 502, 503, 504),
+        allowed_methods=IDEMPOTENT_METHODS,
+        respect_retry_after_header=True,
+        # Hand the last response back to the caller, which reports the error
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=Config.HTTP_POOL_MAXSIZE,
+        max_retries=retry,
+        # Wait for a free connection rather than opening throwaway ones
+        pool_block=True
+    )
+    session = ProviderSession(_build_breaker(name))
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_session(name):
+    """
+    Process-wide pooled session for one payment provider. Connections are
+    kept alive and reused across requests and threads (urllib3 pools are
+    thread-safe), so only the first call to a provider pays the TCP + TLS
+    handshake.
+    """
+    session = _sessions.get(name)
+    if session is None:
+        with _lock:
+            session = _sessions.get(name)
+            if session is None:
+                session = _sessions[name] = _build_session(name)
+    return session
+
+
+def breaker(name):
+    return get_session(name).breaker
+
+
+def close_sessions():
+    with _lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
@@ -0,0 +1,218 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import Response, current_app, jsonify, make_response, request
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import delete, select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert
+from models.public import db
+from models.clients import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 100
+
+_table = IdempotencyKey.__table__
+
+
+class _FrontCache:
+    """
+    Small in-process LRU of completed responses, so a retry that lands on the
+    same worker is answered without touching the database.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, cache_key):
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is None:
+                return None
+            if entry['expires_at'] < datetime.utcnow():
+                del self._entries[cache_key]
+                return None
+            self._entries.move_to_end(cache_key)
+            return entry
+
+    def set(self, cache_key, entry):
+        with self._lock:
+            self._entries[cache_key] = entry
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+_front_cache = _FrontCache()
+
+# Requests of this process currently running under a key; duplicates wait on
+# the event instead of polling the database.
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+
+
+def _fingerprint(endpoint):
+    digest = hashlib.sha256()
+    digest.update(f'{request.method} {endpoint}\n'.encode())
+    digest.update(request.get_data(cache=True) or b'')
+    return digest.hexdigest()
+
+
+def _replay(entry):
+    response = Response(entry['response_body'], status=entry['response_code'], mimetype='application/json')
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _claim(user_id, key, endpoint, fingerprint, ttl):
+    """
+    Insert the key as 'processing' on its own connection, committed at once so
+    concurrent duplicates see it. Returns True if this request owns the key.
+    """
+    now = datetime.utcnow()
+    with db.engine.begin() as conn:
+        # A lapsed key can be reused
+        conn.execute(delete(_table).where(
+            _table.c.user_id == user_id, _table.c.key == key, _table.c.expires_at < now
+        ))
+        claimed = conn.execute(
+            insert(_table).values(
+                user_id=user_id, key=key, endpoint=endpoint, fingerprint=fingerprint,
+                status='processing', created_at=now, expires_at=now + timedelta(seconds=ttl)
+            ).on_conflict_do_nothing().returning(_table.c.key)
+        ).first()
+    return claimed is not None
+
+
+def _load(user_id, key):
+    with db.engine.connect() as conn:
+        row = conn.execute(
+            select(_table).where(_table.c.user_id == user_id, _table.c.key == key)
+        ).mappings().first()
+    return dict(row) if row else None
+
+
+def _complete(user_id, key, response):
+    with db.engine.begin() as conn:
+        conn.execute(
+            update(_table)
+            .where(_table.c.user_id == user_id, _table.c.key == key)
+            .values(status='completed', response_code=response.status_code, response_body=response.get_data(as_text=True))
+        )
+
+
+def _release(user_id, key):
+    with db.engine.begin() as conn:
+        conn.execute(delete(_table).where(_table.c.user_id == user_id, _table.c.key == key))
+
+
+def _wait_for_completion(user_id, key, timeout):
+    """
+    Block until the request that owns the key finishes, then return its row.
+    Returns None if it is still running after `timeout` seconds or gave up the
+    key after a server error.
+    """
+    deadline = time.monotonic() + timeout
+    with _in_flight_lock:
+        event = _in_flight.get((user_id, key))
+    if event is not None:
+        # Owner runs in this process: sleep until it signals
+        event.wait(timeout)
+
+    while True:
+        row = _load(user_id, key)
+        if row is None or row['status'] == 'completed':
+            return row
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(0.1)
+
+
+def idempotent(endpoint):
+    """
+    Make a JWT-protected POST safe to retry with an Idempotency-Key header.
+
+    The first request with a key runs the view and stores its response; later
+    requests with the same key and body get that response replayed, and
+    duplicates that arrive while it runs wait for it. A key reused with a
+    different body is rejected with 422. Server errors are not stored, so the
+    client can retry them. Requests without the header are unaffected.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = request.headers.get(HEADER)
+            if not key:
+                return view(*args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return jsonify({'error': f'{HEADER} must be at most {MAX_KEY_LENGTH} characters'}), 400
+
+            user_id = get_jwt_identity()
+            fingerprint = _fingerprint(endpoint)
+            cache_key = (user_id, key)
+
+            cached = _front_cache.get(cache_key)
+            if cached:
+                if cached['fingerprint'] != fingerprint:
+                    return jsonify({'error': f'{HEADER} was already used with a different request'}), 422
+                return _replay(cached)
+
+            config = current_app.config
+            if not _claim(user_id, key, endpoint, fingerprint, config['IDEMPOTENCY_TTL_SECONDS']):
+                row = _load(user_id, key)
+                if row and row['fingerprint'] != fingerprint:
+                    return jsonify({'error': f'{HEADER} was already used with a different request'}), 422
+                if row and row['status'] != 'completed':
+                    row = _wait_for_completion(user_id, key, config['IDEMPOTENCY_WAIT_SECONDS'])
+                if row is None:
+                    return jsonify({'error': 'A request with this Idempotency-Key is still in progress'}), 409
+                _front_cache.set(cache_key, row)
+                return _replay(row)
+
+            event = threading.Event()
+            with _in_flight_lock:
+                _in_flight[cache_key] = event
+            try:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code >= 500:
+                    _release(user_id, key)
+                else:
+                    _complete(user_id, key, response)
+                    _front_cache.set(cache_key, {
+                        'fingerprint': fingerprint,
+                        'response_code': response.status_code,
+                        'response_body': response.get_data(as_text=True),
+                        'expires_at': datetime.utcnow() + timedelta(seconds=config['IDEMPOTENCY_TTL_SECONDS'])
+                    })
+                return response
+            except Exception:
+                _release(user_id, key)
+                raise
+            finally:
+                with _in_flight_lock:
+                    _in_flight.pop(cache_key, None)
+                event.set()
+        return wrapper
+    return decorator
+
+
+def purge_expired(batch_size=5000):
+    """
+    Delete lapsed keys in batches. Returns the number of rows removed.
+    """
+    removed = 0
+    while True:
+        expired = select(_table.c.user_id, _table.c.key).where(
+            _table.c.expires_at < datetime.utcnow()
+        ).limit(batch_size)
+        with db.engine.begin() as conn:
+            count = conn.execute(
+                delete(_table).where(tuple_(_table.c.user_id, _table.c.key).in_(expired))
+            ).rowcount
+        removed += count
+        if count < batch_size:
+            return removed
@@ -1,139 +1,237 @@
 import pandas as pd
 import uuid
+from datetime import datetime
+from sqlalchemy import column, delete, insert, select, update, values, Float, Integer, Uuid
 from models.public import db, Station
 from models.public import Line, Stop
+from services import catalog_versions
+from services.route_planner import route_graph
+from services.stop_index import stop_index
+
+NAME_COLUMN = 'Stops'
+COORDINATES_COLUMN = 'Geographic Coordinates'
+
+# Two spellings show up in the workbook:
+#   '5.2602077, -3.60606'  dot decimals, comma between the numbers
+#   '5,2602077, -3,60606'  comma decimals (French locale), numbers separated by whitespace
+_DOT_DECIMALS = r'^\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*$'
+_COMMA_DECIMALS = r'^\s*(-?\d+(?:,\d+)?)\s*[,;]?\s+(-?\d+(?:,\d+)?)\s*$'
+
+
+def parse_coordinates_series(coords):
+    """
+    Parse a column of 'lat, lon' strings in one pass of pandas string
+    operations. Returns (latitude, longitude) float Series, NaN where a cell
+    is empty or unreadable.
+    """
+    text = coords.astype('string')
+    parts = text.str.extract(_DOT_DECIMALS)
+    missing = parts[0].isna()
+    if missing.any():
+        parts.loc[missing] = text[missing].str.extract(_COMMA_DECIMALS).to_numpy()
+    latitude = pd.to_numeric(parts[0].str.replace(',', '.', regex=False), errors='coerce')
+    longitude = pd.to_numeric(parts[1].str.replace(',', '.', regex=False), errors='coerce')
+    return latitude.astype('float64'), longitude.astype('float64')
+
 
 def parse_coordinates(coord_str):
     """
     Parses a coordinate string like '5,2602077, -3,60606' to (5.2602077, -3.60606).
-    Handles potential variations in delimiters.
+    Returns (None, None) when it can't be read.
     """
     if not isinstance(coord_str, str):
         return None, None
-    
-    try:
-        # Normalize the string: replace commas used as decimal separators (?) or splitters
-        # The example '5,2602077, -3,60606' is tricky. It looks like comma is decimal separator AND splitter?
-        # Let's assume standard format might be "lat, lon" or "lat,lon". 
-        # But if comma is decimal separator (French locale), it's ambiguous: "5,26, -3,60" -> "5.26", "-3.60"
-        
-        # Heuristic: split by comma. 
-        # If 2 parts: lat, lon (dot decimal)
-        # If 4 parts: lat_int, lat_dec, lon_int, lon_dec (comma decimal)
-        # Let's clean up first.
-        
-        parts = [p.strip() for p in coord_str.split(',')]
-        
-        if len(parts) == 2:
-            # Case: 5.26, -3.60 OR 5,26 (if single number? no) OR 526, 360
-            # If parts contain dots, likely "lat, lon"
-            lat = float(parts[0])
-            lon = float(parts[1])
-            return lat, lon
-            
-        elif len(parts) >= 3:
-            # Case '5,2602077, -3,60606' -> ['5', '2602077', '-3', '60606']
-            # Reconstruct: 5.2602077, -3.60606
-            # This logic assumes the structure is specifically [lat_int, lat_dec, lon_int, lon_dec]
-            # And that the second and fourth parts are the decimals.
-            
-            # Note: "Geographic Coordinates" column in inspection showed '5,2602077, -3,60606'
-            # This strongly suggests "5,2602077" is lat and "-3,60606" is lon, using comma as decimal separator.
-            # And they are separated by ", " (comma space).
-            
-            # Let's try to interpret as "float(dots) , float(dots)" first?
-            # Or split by space?
-            pass
-
-        # Robust approach for "5,2602077, -3,60606":
-        # Replace first comma with dot, find the split between numbers, replace second comma with dot.
-        # Maybe simply replacing all commas with dots is wrong if comma is the separator.
-        
-        # Let's look at the example again: '5,2602077, -3,60606'
-        # It seems like there is a space after the middle comma.
-        # Strategy: Split by " " (space).
-        # "5,2602077," and "-3,60606"
-        
-        parts_space = coord_str.split()
-        if len(parts_space) == 2:
-            lat_str = parts_space[0].replace(',', '.').rstrip('.')
-            lon_str = parts_space[1].replace(',', '.').rstrip('.')
-            # Remove trailing comma from lat_str if it was "5,2602077,"
-            if lat_str.endswith(','): lat_str = lat_str[:-1] # Already replaced by dot? No, replace(',', '.') makes it dot.
-            
-            # If the original string was "5,2602077, -3,60606", split by space gives: "5,2602077," and "-3,60606"
-            # lat_str: "5.2602077." (if trailing comma) or just "5.2602077"
-            # Let's be safer.
-            
-            raw_lat = parts_space[0].strip().rstrip(',')
-            raw_lon = parts_space[1].strip()
-            
-            lat = float(raw_lat.replace(',', '.'))
-            lon = float(raw_lon.replace(',', '.'))
-            return lat, lon
-            
-    except Exception as e:
-        print(f"Error parsing coordinates '{coord_str}': {e}")
+    latitude, longitude = parse_coordinates_series(pd.Series([coord_str]))
+    if pd.isna(latitude[0]) or pd.isna(longitude[0]):
         return None, None
-        
-    return None, None
+    return float(latitude[0]), float(longitude[0])
+
+
+def read_sheet(df):
+    """
+    Stops of one sheet as a DataFrame (name, latitude, longitude, order):
+    rows without a stop name or readable coordinates are dropped, `order` is
+    the row's position in the sheet. Returns (stops, skipped rows).
+    """
+    if NAME_COLUMN not in df.columns:
+        return pd.DataFrame(columns=['name', 'latitude', 'longitude', 'order']), len(df)
+    names = df[NAME_COLUMN].astype('string').str.strip()
+    coords = df[COORDINATES_COLUMN] if COORDINATES_COLUMN in df.columns else pd.Series(pd.NA, index=df.index)
+    latitude, longitude = parse_coordinates_series(coords)
+    stops = pd.DataFrame({
+        'name': names,
+        'latitude': latitude,
+        'longitude': longitude,
+        'order': df.index.to_numpy()
+    })
+    named = stops['name'].notna() & (stops['name'] != '')
+    readable = named & stops['latitude'].notna() & stops['longitude'].notna()
+    skipped = int((named & ~readable).sum())
+    return stops[readable].reset_index(drop=True), skipped
+
+
+def _with_keys(stops):
+    # A station can appear more than once on a line (loops): the n-th visit of
+    # a name matches the n-th visit on the other side
+    stops = stops.astype({'name': 'string'}).sort_values('order', kind='stable')
+    return stops.assign(visit=stops.groupby('name').cumcount())
+
+
+def diff_stops(existing, incoming):
+    """
+    Compare the stored stops of a line with the sheet, keyed by (station name,
+    visit). Returns (new, changed, gone) DataFrames: stops to insert, stored
+    stops whose position or coordinates changed (with the new values), and
+    stored stops no longer in the sheet. The last two carry the stored `id`
+    and `station_id`.
+    """
+    merged = _with_keys(incoming).merge(
+        _with_keys(existing), on=['name', 'visit'], how='outer', suffixes=('', '_old'), indicator=True
+    )
+    new = merged[merged['_merge'] == 'left_only']
+    gone = merged[merged['_merge'] == 'right_only']
+    both = merged[merged['_merge'] == 'both']
+    changed = both[
+        (both['order'] != both['order_old'])
+        | (both['latitude'] != both['latitude_old'])
+        | (both['longitude'] != both['longitude_old'])
+    ]
+    return new, changed, gone
+
+
+def _existing_stops(line_id):
+    rows = db.session.execute(
+        select(Stop.id, Stop.station_id, Station.name, Stop.latitude, Stop.longitude, Stop.order)
+        .join(Station, Station.id == Stop.station_id)
+        .where(Stop.line_id == line_id)
+    ).all()
+    return pd.DataFrame(rows, columns=['id', 'station_id', 'name', 'latitude', 'longitude', 'order'])
+
+
+def sync_line_stops(line_id, incoming, now=None):
+    """
+    Bring a line's stops in line with the sheet, writing only the differences:
+    one bulk INSERT each for new stations and stops, one UPDATE ... FROM
+    VALUES for moved stops and one DELETE for removed ones (and their
+    stations). Returns {'inserted', 'updated', 'deleted', 'unchanged'}.
+    """
+    now = now or datetime.utcnow()
+    existing = _existing_stops(line_id)
+    new, changed, gone = diff_stops(existing, incoming)
+
+    if len(new):
+        station_ids = [uuid.uuid4() for _ in range(len(new))]
+        db.session.execute(insert(Station.__table__), [
+            {'id': station_id, 'name': name, 'created_at': now, 'updated_at': now}
+            for station_id, name in zip(station_ids, new['name'])
+        ])
+        db.session.execute(insert(Stop.__table__), [
+            {
+                'id': uuid.uuid4(),
+                'line_id': line_id,
+                'station_id': station_id,
+                'latitude': float(latitude),
+                'longitude': float(longitude),
+                'order': int(order),
+                'created_at': now,
+                'updated_at': now
+            }
+            for station_id, latitude, longitude, order in zip(
+                station_ids, new['latitude'], new['longitude'], new['order']
+            )
+        ])
+
+    if len(changed):
+        moved = values(
+            column('stop_id', Uuid), column('latitude', Float), column('longitude', Float), column('position', Integer),
+            name='moved'
+        ).data([
+            (stop_id, float(latitude), float(longitude), int(order))
+            for stop_id, latitude, longitude, order in zip(
+                changed['id'], changed['latitude'], changed['longitude'], changed['order']
+            )
+        ])
+        db.session.execute(
+            update(Stop)
+            .where(Stop.id == moved.c.stop_id)
+            .values(latitude=moved.c.latitude, longitude=moved.c.longitude, order=moved.c.position, updated_at=now)
+            .execution_options(synchronize_session=False)
+        )
+
+    if len(gone):
+        db.session.execute(
+            delete(Stop).where(Stop.id.in_(list(gone['id']))).execution_options(synchronize_session=False)
+        )
+        # Every stop has its own station row
+        db.session.execute(
+            delete(Station)
+            .where(Station.id.in_(list(gone['station_id'])), ~Station.id.in_(select(Stop.station_id)))
+            .execution_options(synchronize_session=False)
+        )
+
+    return {
+        'inserted': len(new),
+        'updated': len(changed),
+        'deleted': len(gone),
+        'unchanged': len(existing) - len(changed) - len(gone)
+    }
+
 
 def import_lines_from_excel(file_path='lines.xlsx'):
+    """
+    Import every sheet of the workbook as a line (sheet name) and its stops.
+    Re-imports are incremental: only stops that were added, moved or removed
+    are written. Each sheet is committed on its own; sheets that could not be
+    saved are counted in `failed`. Returns per-import totals, or None if the
+    file is missing.
+    """
     print(f"Starting import from {file_path}...")
     try:
-        xl = pd.ExcelFile(file_path)
+        sheets = pd.read_excel(file_path, sheet_name=None)
     except FileNotFoundError:
         print(f"File {file_path} not found. Skipping import.")
-        return
-
-    for sheet_name in xl.sheet_names:
-        print(f"Processing line: {sheet_name}")
-        
-        # Check if line exists, if not create
-        line = Line.query.filter_by(name=sheet_name).first()
-        if not line:
-            line = Line(id=uuid.uuid4(), name=sheet_name)
-            db.session.add(line)
-            db.session.flush() # Get ID
-        
-        # Process stops
-        df = xl.parse(sheet_name)
-        
-        # Clear existing stops for this line to avoid duplicates/conflicts on re-import?
-        # Or simple update? "Sync" implies matching state.
-        # Safest for now: delete all stops for this line and recreate them.
-        Stop.query.filter_by(line_id=line.id).delete()
-        
-        for index, row in df.iterrows():
-            station_name = row.get('Stops')
-            geo_coords = row.get('Geographic Coordinates')
-            
-            if pd.isna(station_name):
-                continue
-                
-            lat, lon = parse_coordinates(geo_coords)
-
-            station_id = uuid.uuid4(),
-            station = Station(
-                id=station_id,
-                name=station_name,
-            )
-            db.session.add(station)
-            stop = Stop(
-                id=uuid.uuid4(),
-                station_id=station_id,
-                line_id=line.id,
-                latitude=lat,
-                longitude=lon,
-                order=index
-            )
-            db.session.add(stop)
-            
+        return None
+
+    lines = {
+        line.name: line.id
+        for line in db.session.execute(select(Line.id, Line.name).where(Line.name.in_(list(sheets)))).all()
+    }
+    totals = {'lines': 0, 'inserted': 0, 'updated': 0, 'deleted': 0, 'unchanged': 0, 'skipped': 0, 'failed': 0}
+
+    for sheet_name, df in sheets.items():
+        stops, skipped = read_sheet(df)
+        totals['skipped'] += skipped
+        if skipped:
+            print(f"Line {sheet_name}: skipped {skipped} stops without readable coordinates")
+
         try:
+            line_id = lines.get(sheet_name)
+            if line_id is None:
+                line_id = uuid.uuid4()
+                db.session.add(Line(id=line_id, name=sheet_name))
+                db.session.flush()
+
+            changes = sync_line_stops(line_id, stops)
+            if changes['inserted'] or changes['updated'] or changes['deleted'] or sheet_name not in lines:
+                catalog_versions.bump(catalog_versions.LINES)
             db.session.commit()
-            print(f"Successfully imported line: {sheet_name}")
         except Exception as e:
             db.session.rollback()
             print(f"Error saving line {sheet_name}: {e}")
+            totals['failed'] += 1
+            continue
+
+        totals['lines'] += 1
+        for key in ('inserted', 'updated', 'deleted', 'unchanged'):
+            totals[key] += changes[key]
+        print(
+            f"Line {sheet_name}: {changes['inserted']} added, {changes['updated']} updated, "
+            f"{changes['deleted']} removed, {changes['unchanged']} unchanged"
+        )
+
+    if totals['inserted'] or totals['updated'] or totals['deleted']:
+        stop_index.reload()
+        route_graph.reload()
 
     print("Import completed.")
+    return totals
@@ -0,0 +1,395 @@
+from collections import namedtuple
+from sqlalchemy import cast, delete, func, insert, literal, select, update
+from sqlalchemy.dialects.postgresql import BIT
+from models.public import db
+from models.clients import Booking
+from models.partners import ScheduledTrip, TripSeatCounter
+from services import seat_map
+
+# Trip columns returned by seat updates: enough to price a booking and to
+# update the availability rollup / search cache without reloading the trip.
+_RETURNING = (
+    ScheduledTrip.id,
+    ScheduledTrip.price,
+    ScheduledTrip.status,
+    ScheduledTrip.departure_city_key,
+    ScheduledTrip.arrival_city_key,
+    ScheduledTrip.departure_time,
+)
+
+# A reserved trip row plus the booking's seats as a mask over the trip's seat
+# map (None on trips without one)
+ReservedTrip = namedtuple('ReservedTrip', [column.key for column in _RETURNING] + ['seat_mask'])
+
+_counters = TripSeatCounter.__table__
+
+
+def _bits(value):
+    return cast(literal(value), BIT(varying=True))
+
+
+def create_counters(trip, available_seats, blocked_seat_map=None, slots=1):
+    """
+    Insert the seat counters of a new trip (flushed, so it has an id). With a
+    seat map the free seats are dealt round-robin over the slots.
+    """
+    db.session.execute(insert(_counters).values(
+        _slot_rows(trip.id, slots, available_seats, blocked_seat_map)
+    ))
+
+
+def _slot_rows(trip_id, slots, available_seats, taken_map=None):
+    if taken_map is None:
+        share, extra = divmod(available_seats, slots)
+        return [{
+            'trip_id': trip_id,
+            'slot': slot,
+            'available_seats': share + (1 if slot < extra else 0),
+            'seat_map': None
+        } for slot in range(slots)]
+
+    free = [index for index, bit in enumerate(taken_map) if bit == '0']
+    rows = []
+    for slot in range(slots):
+        bits = ['1'] * len(taken_map)
+        for index in free[slot::slots]:
+            bits[index] = '0'
+        rows.append({
+            'trip_id': trip_id,
+            'slot': slot,
+            'available_seats': len(free[slot::slots]),
+            'seat_map': ''.join(bits)
+        })
+    return rows
+
+
+def _slots(trip_id, lock=False):
+    query = (
+        select(TripSeatCounter.slot, TripSeatCounter.available_seats, TripSeatCounter.seat_map)
+        .where(TripSeatCounter.trip_id == trip_id)
+        .order_by(TripSeatCounter.slot)
+    )
+    if lock:
+        query = query.with_for_update()
+    return db.session.execute(query).all()
+
+
+def _lock_slot(trip_id, seats, skip_locked):
+    """
+    Lock a random slot of the trip holding at least `seats` seats. With
+    `skip_locked`, slots other bookings are using are passed over.
+    """
+    return db.session.execute(
+        select(TripSeatCounter.slot, TripSeatCounter.available_seats, TripSeatCounter.seat_map)
+        .where(TripSeatCounter.trip_id == trip_id, TripSeatCounter.available_seats >= seats)
+        .order_by(func.random())
+        .limit(1)
+        .with_for_update(skip_locked=skip_locked)
+    ).first()
+
+
+def _owners(rows):
+    """{seat number: slot} for the free seats of a mapped trip."""
+    return {
+        index + 1: row.slot
+        for row in rows
+        for index, bit in enumerate(row.seat_map) if bit == '0'
+    }
+
+
+def _plan_picked(rows, picked):
+    """{slot: (seats, numbers)} taking the picked seats, or None if one isn't free."""
+    if rows[0].seat_map is None:
+        return None
+    owners = _owners(rows)
+    if any(number not in owners for number in picked):
+        return None
+    parts = {}
+    for number in picked:
+        parts.setdefault(owners[number], []).append(number)
+    return {slot: (len(numbers), numbers) for slot, numbers in parts.items()}
+
+
+def _plan_auto(rows, count, exclude=()):
+    """{slot: (seats, numbers)} for `count` seats spread over the slots, or None."""
+    if rows[0].seat_map is None:
+        parts = {}
+        for row in sorted(rows, key=lambda row: -row.available_seats):
+            take = min(count, row.available_seats)
+            if take:
+                parts[row.slot] = (take, None)
+                count -= take
+        return parts if not count else None
+
+    owners = _owners(rows)
+    free = sorted(number for number in owners if number not in exclude)[:count]
+    if len(free) < count:
+        return None
+    parts = {}
+    for number in free:
+        parts.setdefault(owners[number], []).append(number)
+    return {slot: (len(numbers), numbers) for slot, numbers in parts.items()}
+
+
+def _merge(parts, extra):
+    for slot, (seats, numbers) in extra.items():
+        if slot in parts:
+            held, held_numbers = parts[slot]
+            parts[slot] = (held + seats, None if numbers is None else held_numbers + numbers)
+        else:
+            parts[slot] = (seats, numbers)
+    return parts
+
+
+def _take_slot(trip_id, slot, seats, mask):
+    criteria = [
+        TripSeatCounter.trip_id == trip_id,
+        TripSeatCounter.slot == slot,
+        TripSeatCounter.available_seats >= seats,
+        ScheduledTrip.id == TripSeatCounter.trip_id,
+        ScheduledTrip.status == 'active'
+    ]
+    values = {'available_seats': TripSeatCounter.available_seats - seats}
+    if mask is not None:
+        criteria.append(TripSeatCounter.seat_map.op('&')(_bits(mask)) == _bits(seat_map.empty(len(mask))))
+        values['seat_map'] = TripSeatCounter.seat_map.op('|')(_bits(mask))
+    return db.session.execute(
+        update(TripSeatCounter)
+        .where(*criteria)
+        .values(**values)
+        .returning(*_RETURNING)
+        .execution_options(synchronize_session=False)
+    ).first()
+
+
+def _take(trip_id, parts, size):
+    """
+    Apply a {slot: (seats, numbers)} plan. Slots are updated in slot order; a
+    plan spanning several slots runs in a savepoint so it applies entirely or
+    not at all.
+    """
+    savepoint = db.session.begin_nested() if len(parts) > 1 else None
+    trip = None
+    for slot in sorted(parts):
+        seats, numbers = parts[slot]
+        trip = _take_slot(trip_id, slot, seats, None if numbers is None else seat_map.encode(numbers, size))
+        if trip is None:
+            break
+    if savepoint is not None:
+        if trip is None:
+            savepoint.rollback()
+        else:
+            savepoint.commit()
+    if trip is None:
+        return None
+
+    mask = None
+    if size is not None:
+        mask = seat_map.encode([number for _, numbers in parts.values() for number in numbers], size)
+    return ReservedTrip(*trip, mask)
+
+
+def reserve_seats(trip_id, seats, seat_numbers=None):
+    """
+    Take `seats` from an active trip with conditional UPDATEs on its seat
+    counters, so the check and the decrement can't interleave with another
+    booking:
+
+        UPDATE trip_seat_counters SET available_seats = available_seats - :n
+        WHERE trip_id = :id AND slot = :slot AND available_seats >= :n ...
+
+    Without picked seats the booking locks one random slot that has enough
+    seats, skipping slots other bookings hold. Bookings on a busy trip then
+    spread over the slots instead of waiting on one row. Only when no single
+    slot can serve it are all the slots locked, in slot order, and the seats
+    taken across them.
+
+    On trips with a seat map the same statements set the booking's bits, on
+    condition that none of them is taken. `seat_numbers` are the seats the
+    rider picked; any seats beyond them are assigned from the lowest free ones.
+
+    Returns a ReservedTrip, or None if the trip is missing, inactive, short of
+    seats or one of the picked seats is taken. Runs in the caller's
+    transaction; the counter row locks are held until it commits.
+    """
+    picked = sorted(seat_numbers or ())
+    count = seats - len(picked)
+
+    if not picked:
+        row = _lock_slot(trip_id, count, skip_locked=True) or _lock_slot(trip_id, count, skip_locked=False)
+        if row is not None:
+            size = None if row.seat_map is None else len(row.seat_map)
+            numbers = None if size is None else seat_map.free_seats(row.seat_map, count)
+            return _take(trip_id, {row.slot: (count, numbers)}, size)
+
+    # Picked seats go to the slots that hold them; they are claimed by the
+    # conditional updates, so the slots are only locked if seats must also
+    # be assigned
+    rows = _slots(trip_id, lock=count > 0)
+    if not rows:
+        return None
+
+    parts = _plan_picked(rows, picked) if picked else {}
+    if parts is None:
+        return None
+    if count:
+        extra = _plan_auto(rows, count, exclude=picked)
+        if extra is None:
+            return None
+        _merge(parts, extra)
+
+    size = None if rows[0].seat_map is None else len(rows[0].seat_map)
+    return _take(trip_id, parts, size)
+
+
+def release_seats(trip_id, seats, seat_mask=None):
+    """
+    Give `seats` back to a trip, into a random slot, clearing the booking's
+    `seat_mask` bits from that slot's map. Callers must first claim the seats
+    being released (e.g. by flipping the booking's status with a conditional
+    UPDATE) so they are never returned twice.
+    """
+    row = _lock_slot(trip_id, 0, skip_locked=True) or _lock_slot(trip_id, 0, skip_locked=False)
+    if row is None:
+        return None
+    values = {'available_seats': TripSeatCounter.available_seats + seats}
+    if seat_mask is not None:
+        values['seat_map'] = TripSeatCounter.seat_map.op('&')(_bits(seat_map.invert(seat_mask)))
+    return db.session.execute(
+        update(TripSeatCounter)
+        .where(
+            TripSeatCounter.trip_id == trip_id,
+            TripSeatCounter.slot == row.slot,
+            ScheduledTrip.id == TripSeatCounter.trip_id
+        )
+        .values(**values)
+        .returning(*_RETURNING)
+        .execution_options(synchronize_session=False)
+    ).first()
+
+
+def reservation_failure(trip_id, seats, seat_numbers=None):
+    """
+    Explain why reserve_seats() returned None as (message, status code). Only
+    runs on the failure path.
+    """
+    trip = db.session.get(ScheduledTrip, trip_id)
+    if not trip:
+        return 'Trip not found', 404
+    if trip.status != 'active':
+        return 'Trip is not available for booking', 400
+    if seat_numbers:
+        if trip.blocked_seat_map is None:
+            return 'This trip does not support seat selection', 400
+        invalid = [number for number in seat_numbers if number > trip.total_seats]
+        if invalid:
+            return f'Invalid seat numbers: {", ".join(map(str, invalid))}', 400
+        free = _owners(_slots(trip_id))
+        unavailable = [number for number in seat_numbers if number not in free]
+        if unavailable:
+            return f'Seats already taken: {", ".join(map(str, unavailable))}', 409
+    return 'Not enough seats available', 400
+
+
+def seat_layout(trip_id):
+    """
+    The trip's seats as [{'number', 'status'}], status being 'available',
+    'taken' or 'blocked'. Reads the trip and its counters in one query, never
+    the bookings. Returns None if the trip doesn't exist.
+    """
+    trip = db.session.execute(
+        select(
+            ScheduledTrip.id,
+            ScheduledTrip.status,
+            ScheduledTrip.total_seats,
+            ScheduledTrip.blocked_seat_map,
+            func.coalesce(func.sum(TripSeatCounter.available_seats), 0).label('available_seats'),
+            func.bit_and(TripSeatCounter.seat_map).label('seat_map')
+        )
+        .outerjoin(TripSeatCounter, TripSeatCounter.trip_id == ScheduledTrip.id)
+        .where(ScheduledTrip.id == trip_id)
+        .group_by(ScheduledTrip.id)
+    ).first()
+    if trip is None:
+        return None
+
+    seats = None
+    if trip.seat_map is not None:
+        blocked = trip.blocked_seat_map or seat_map.empty(len(trip.seat_map))
+        seats = [{
+            'number': index + 1,
+            'status': 'blocked' if blocked[index] == '1' else 'taken' if bit == '1' else 'available'
+        } for index, bit in enumerate(trip.seat_map)]
+
+    return {
+        'trip_id': trip.id,
+        'status': trip.status,
+        'total_seats': trip.total_seats,
+        'available_seats': trip.available_seats,
+        'seat_selection': seats is not None,
+        'seats': seats
+    }
+
+
+def _combined(rows):
+    # A seat is free if it is free in any slot
+    return ''.join('0' if '0' in bits else '1' for bits in zip(*(row.seat_map for row in rows)))
+
+
+def _unbalanced(counts):
+    # One slot having more than the average share over another makes
+    # bookings skip to other slots or spread across them
+    share = sum(counts) / len(counts)
+    return max(counts) - min(counts) > max(1, share)
+
+
+def rebalance(trip_id, slots=None):
+    """
+    Reconcile a trip's seat counters and spread its free seats evenly over
+    `slots` slots (by default the current number).
+
+    Bookings drain slots unevenly and releases land in random slots, so hot
+    trips end up with empty slots that push bookings onto the slow path. On
+    trips with a seat map the taken seats are also recomputed from the blocked
+    seats and the pending/confirmed bookings, correcting any drift. Runs in the
+    caller's transaction with the trip's counters locked. Returns
+    (rows, correction): the rewritten counter rows (None if they were fine
+    as they were) and the change in available seats, or None if the trip has
+    no counters.
+    """
+    rows = _slots(trip_id, lock=True)
+    if not rows:
+        return None
+    slots = slots or len(rows)
+    available = sum(row.available_seats for row in rows)
+
+    taken_map = None
+    if rows[0].seat_map is not None:
+        trip = db.session.get(ScheduledTrip, trip_id)
+        held = db.session.execute(
+            select(func.bit_or(Booking.seat_mask))
+            .where(Booking.trip_id == trip_id, Booking.status.in_(('pending', 'confirmed')))
+        ).scalar()
+        taken_map = trip.blocked_seat_map or seat_map.empty(trip.total_seats)
+        if held is not None:
+            taken_map = ''.join('1' if '1' in bits else '0' for bits in zip(taken_map, held))
+
+    drifted = taken_map is not None and _combined(rows) != taken_map
+    if slots == len(rows) and not drifted and not _unbalanced([row.available_seats for row in rows]):
+        return None, 0
+
+    new_rows = _slot_rows(trip_id, slots, available, taken_map)
+    correction = sum(row['available_seats'] for row in new_rows) - available
+
+    for row in new_rows:
+        if row['slot'] < len(rows):
+            db.session.execute(
+                update(_counters)
+                .where(_counters.c.trip_id == trip_id, _counters.c.slot == row['slot'])
+                .values(available_seats=row['available_seats'], seat_map=row['seat_map'])
+            )
+    if slots > len(rows):
+        db.session.execute(insert(_counters).values(new_rows[len(rows):]))
+    elif slots < len(rows):
+        db.session.execute(delete(_counters).where(_counters.c.trip_id == trip_id, _counters.c.slot >= slots))
+    return new_rows, correction
@@ -0,0 +1,127 @@
+import hashlib
+import os
+import threading
+import traceback
+from datetime import datetime
+from sqlalchemy.dialects.postgresql import insert
+from models.public import db, LineImport
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+def fingerprint(file_path):
+    """SHA-256 of the file's bytes (hex), or None if it doesn't exist."""
+    digest = hashlib.sha256()
+    try:
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(_CHUNK_SIZE), b''):
+                digest.update(chunk)
+    except FileNotFoundError:
+        return None
+    return digest.hexdigest()
+
+
+def _source(file_path):
+    # Keyed on the file name so the record survives a change of deploy directory
+    return os.path.basename(file_path)
+
+
+def last_import(file_path):
+    """The LineImport recorded for this workbook, or None."""
+    return db.session.get(LineImport, _source(file_path))
+
+
+def record_import(file_path, content_hash, now=None):
+    table = LineImport.__table__
+    stmt = insert(table).values(
+        source=_source(file_path), content_hash=content_hash, imported_at=now or datetime.utcnow()
+    )
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=['source'],
+        set_={'content_hash': stmt.excluded.content_hash, 'imported_at': stmt.excluded.imported_at}
+    ))
+
+
+def needs_import(file_path):
+    """
+    (changed, content_hash): whether the workbook differs from the last one
+    imported. A missing file never needs importing. Cheap: reads the file's
+    bytes and one row, without loading pandas.
+    """
+    content_hash = fingerprint(file_path)
+    if content_hash is None:
+        return False, None
+    previous = last_import(file_path)
+    return previous is None or previous.content_hash != content_hash, content_hash
+
+
+def import_if_changed(file_path, force=False):
+    """
+    Import the workbook unless its content hash matches the last import.
+    The hash is recorded only when every sheet was saved, so a partial import
+    is retried next time. Returns the import totals, or None if skipped.
+    """
+    changed, content_hash = needs_import(file_path)
+    if content_hash is None:
+        print(f"File {file_path} not found. Skipping import.")
+        return None
+    if not changed and not force:
+        print(f"{file_path} unchanged since the last import. Skipping import.")
+        return None
+
+    # pandas and openpyxl are only loaded when there is something to import
+    from services.import_lines import import_lines_from_excel
+
+    totals = import_lines_from_excel(file_path)
+    if totals is not None and not totals['failed']:
+        record_import(file_path, content_hash)
+        db.session.commit()
+    return totals
+
+
+def _import_in_background(app, file_path):
+    with app.app_context():
+        try:
+            import_if_changed(file_path)
+        except Exception:
+            db.session.rollback()
+            print(f"Background line import failed:\n{traceback.format_exc()}")
+        finally:
+            db.session.remove()
+
+
+def import_on_startup(app):
+    """
+    Run the startup line import according to LINES_STARTUP_IMPORT: checks the
+    fingerprint first, then imports inline or in a daemon thread so the
+    server starts accepting requests right away. Returns the thread, if any.
+    """
+    mode = app.config['LINES_STARTUP_IMPORT']
+    file_path = app.config['LINES_FILE']
+    if mode == 'off':
+        return None
+
+    with app.app_context():
+        try:
+            if mode == 'inline':
+                import_if_changed(file_path)
+                return None
+            changed, content_hash = needs_import(file_path)
+        except Exception as e:
+            db.session.rollback()
+            print(f"Startup import failed: {e}")
+            return None
+        finally:
+            db.session.remove()
+
+    if content_hash is None:
+        print(f"File {file_path} not found. Skipping import.")
+        return None
+    if not changed:
+        print(f"{file_path} unchanged since the last import. Skipping import.")
+        return None
+    thread = threading.Thread(
+        target=_import_in_background, args=(app, file_path), name='line-import', daemon=True
+    )
+    thread.start()
+    return thread
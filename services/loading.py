@@ -0,0 +1,56 @@
+from sqlalchemy.orm import configure_mappers, joinedload
+
+
+def _trip_plan():
+    from models.partners import ScheduledTrip
+    return (joinedload(ScheduledTrip.vehicle),)
+
+
+def _booking_plan():
+    from models.clients import Booking
+    from models.partners import ScheduledTrip
+    return (joinedload(Booking.scheduled_trip).joinedload(ScheduledTrip.vehicle),)
+
+
+def _booking_summary_plan():
+    from models.clients import Booking
+    from models.partners import ScheduledTrip
+    return (
+        joinedload(Booking.scheduled_trip).load_only(
+            ScheduledTrip.departure_city,
+            ScheduledTrip.arrival_city,
+            ScheduledTrip.departure_time
+        ),
+    )
+
+
+def _payment_plan():
+    # Payment.to_dict only reads its own columns
+    return ()
+
+
+def _vehicle_plan():
+    # Vehicle.to_dict only reads its own columns
+    return ()
+
+
+# What each to_dict() touches beyond its own row. Many-to-one relations are
+# joined so a list is served by one query and still works with yield_per.
+LOAD_PLANS = {
+    'trip': _trip_plan,
+    'booking': _booking_plan,
+    'booking_summary': _booking_summary_plan,
+    'payment': _payment_plan,
+    'vehicle': _vehicle_plan,
+}
+
+
+def load_plan(name):
+    """
+    Loader options for serializing `name` rows, e.g.
+    Booking.query.options(*load_plan('booking')).
+    """
+    # Backref attributes (Booking.scheduled_trip, ScheduledTrip.vehicle) only
+    # exist once the mappers are configured.
+    configure_mappers()
+    return LOAD_PLANS[name]()
@@ -1,42 +1,55 @@
-import requests
 from flask import current_app
 from config import Config
+from services import http
+from services.circuit_breaker import ProviderUnavailable
+from services.token_cache import provider_tokens
 import uuid
 import base64
 from datetime import datetime
 
+TOKEN_KEY = 'mtn_momo'
+
 class MTNMomoService:
     def __init__(self):
         self.api_key = Config.MTN_MOMO_API_KEY
         self.subscription_key = Config.MTN_MOMO_SUBSCRIPTION_KEY
         self.api_url = Config.MTN_MOMO_API_URL
+        self.session = http.get_session('mtn_momo')
+    
+    def _fetch_access_token(self):
+        """
+        Mint a new access token. Returns (token, expires_in seconds).
+        """
+        # Encode API key
+        encoded_key = base64.b64encode(f"{self.api_key}:".encode()).decode()
+        
+        headers = {
+            'Authorization': f'Basic {encoded_key}',
+            'Ocp-Apim-Subscription-Key': self.subscription_key,
+            'Content-Type': 'application/json'
+        }
+        
+        response = self.session.post(
+            f'{self.api_url}/collection/token/',
+            headers=headers,
+            timeout=self.session.timeout()
+        )
+        
+        if response.status_code == 200:
+            data = response.json()
+            return data.get('access_token'), data.get('expires_in')
+        else:
+            raise Exception(f"MTN API token error: {response.text}")
     
     def get_access_token(self):
         """
-        Get access token for MTN Mobile Money API
+        Get access token for MTN Mobile Money API, reusing the cached one until
+        shortly before it expires
         """
         try:
-            # Encode API key
-            encoded_key = base64.b64encode(f"{self.api_key}:".encode()).decode()
-            
-            headers = {
-                'Authorization': f'Basic {encoded_key}',
-                'Ocp-Apim-Subscription-Key': self.subscription_key,
-                'Content-Type': 'application/json'
-            }
-            
-            response = requests.post(
-                f'{self.api_url}/collection/token/',
-                headers=headers,
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                return data.get('access_token')
-            else:
-                raise Exception(f"MTN API token error: {response.text}")
-                
+            return provider_tokens.get(TOKEN_KEY, self._fetch_access_token)
+        except ProviderUnavailable:
+            raise
         except Exception as e:
             raise Exception(f"Failed to get MTN access token: {str(e)}")
     
@@ -59,7 +72,7 @@ class MTNMomoService:
                 'X-Target-Environment': 'sandbox',  # Change to 'production' in production
                 'Content-Type': 'application/json',
                 'X-Reference-Id': str(uuid.uuid4()),
-                'X-Callback-Url': f'{current_app.config.get("BASE_URL", "http://localhost:5000")}/api/payments/webhook'
+                'X-Callback-Url': f'{current_app.config.get("BASE_URL", "http://localhost:5000")}/api/payments/webhook?provider=mtn_momo'
             }
             
             payload = {
@@ -74,11 +87,11 @@ class MTNMomoService:
                 'payeeNote': f'Minibus booking payment'
             }
             
-            response = requests.post(
+            response = self.session.post(
                 f'{self.api_url}/collection/v1_0/requesttopay',
                 json=payload,
                 headers=headers,
-                timeout=30
+                timeout=self.session.timeout()
             )
             
             if response.status_code == 202:
@@ -89,8 +102,13 @@ class MTNMomoService:
                     'status': 'pending'
                 }
             else:
+                if response.status_code == 401:
+                    # Revoked or expired early; fetch a new one next time
+                    provider_tokens.invalidate(TOKEN_KEY, access_token)
                 raise Exception(f"MTN API error: {response.text}")
                 
+        except ProviderUnavailable:
+            raise
         except Exception as e:
             raise Exception(f"Failed to initiate MTN payment: {str(e)}")
     
@@ -107,10 +125,10 @@ class MTNMomoService:
                 'X-Target-Environment': 'sandbox'
             }
             
-            response = requests.get(
+            response = self.session.get(
                 f'{self.api_url}/collection/v1_0/requesttopay/{transaction_id}',
                 headers=headers,
-                timeout=30
+                timeout=self.session.timeout()
             )
             
             if response.status_code == 200:
@@ -120,8 +138,13 @@ class MTNMomoService:
                     'transaction_id': transaction_id
                 }
             else:
+                if response.status_code == 401:
+                    # Revoked or expired early; fetch a new one next time
+                    provider_tokens.invalidate(TOKEN_KEY, access_token)
                 raise Exception(f"MTN API error: {response.text}")
                 
+        except ProviderUnavailable:
+            raise
         except Exception as e:
             raise Exception(f"Failed to verify MTN payment: {str(e)}")
 
@@ -0,0 +1,16 @@
+import re
+import unicodedata
+
+_NON_ALNUM = re.compile(r'[^0-9a-z]+')
+
+
+def normalize_city(value):
+    """
+    Fold a city name to its search key: accents stripped, case folded,
+    punctuation collapsed to single spaces ('Bouaké ' -> 'bouake').
+    """
+    if value is None:
+        return None
+    decomposed = unicodedata.normalize('NFKD', str(value))
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return _NON_ALNUM.sub(' ', stripped.casefold()).strip()
@@ -1,6 +1,7 @@
-import requests
 from flask import current_app
 from config import Config
+from services import http
+from services.circuit_breaker import ProviderUnavailable
 import base64
 
 class OrangeMoneyService:
@@ -8,6 +9,7 @@ class OrangeMoneyService:
         self.api_key = Config.ORANGE_MONEY_API_KEY
         self.merchant_id = Config.ORANGE_MONEY_MERCHANT_ID
         self.api_url = Config.ORANGE_MONEY_API_URL
+        self.session = http.get_session('orange_money')
     
     def initiate_payment(self, amount, phone, transaction_id):
         """
@@ -30,18 +32,18 @@ class OrangeMoneyService:
                 'currency': 'XOF',
                 'order_id': transaction_id,
                 'amount': amount,
-                'return_url': f'{current_app.config.get("BASE_URL", "http://localhost:5000")}/api/payments/webhook',
+                'return_url': f'{current_app.config.get("BASE_URL", "http://localhost:5000")}/api/payments/webhook?provider=orange_money',
                 'cancel_url': f'{current_app.config.get("BASE_URL", "http://localhost:5000")}/api/payments/cancel',
-                'notif_url': f'{current_app.config.get("BASE_URL", "http://localhost:5000")}/api/payments/webhook',
+                'notif_url': f'{current_app.config.get("BASE_URL", "http://localhost:5000")}/api/payments/webhook?provider=orange_money',
                 'lang': 'fr',
                 'reference': transaction_id
             }
             
-            response = requests.post(
+            response = self.session.post(
                 f'{self.api_url}/ci/v1/webpayment',
                 json=payload,
                 headers=headers,
-                timeout=30
+                timeout=self.session.timeout()
             )
             
             if response.status_code == 201 or response.status_code == 200:
@@ -54,6 +56,8 @@ class OrangeMoneyService:
             else:
                 raise Exception(f"Orange Money API error: {response.text}")
                 
+        except ProviderUnavailable:
+            raise
         except Exception as e:
             raise Exception(f"Failed to initiate Orange Money payment: {str(e)}")
     
@@ -70,11 +74,11 @@ class OrangeMoneyService:
                 'Content-Type': 'application/json'
             }
             
-            response = requests.get(
+            response = self.session.get(
                 f'{self.api_url}/ci/v1/transactionstatus',
                 params={'order_id': transaction_id},
                 headers=headers,
-                timeout=30
+                timeout=self.session.timeout()
             )
             
             if response.status_code == 200:
@@ -86,6 +90,8 @@ class OrangeMoneyService:
             else:
                 raise Exception(f"Orange Money API error: {response.text}")
                 
+        except ProviderUnavailable:
+            raise
         except Exception as e:
             raise Exception(f"Failed to verify Orange Money payment: {str(e)}")
 
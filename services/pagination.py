@@ -0,0 +1,53 @@
+import base64
+import json
+from datetime import datetime
+
+
+def encode_cursor(*values):
+    """
+    Opaque keyset cursor for the last row of a page, e.g. (departure_time, id).
+    Values are datetimes or integers; datetimes are tagged so decode_cursor
+    can restore them.
+    """
+    payload = [
+        {'dt': v.isoformat()} if isinstance(v, datetime) else v
+        for v in values
+    ]
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token, size):
+    """
+    Inverse of encode_cursor. Raises ValueError if the token is malformed or
+    does not carry `size` datetime or integer values.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        payload = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise ValueError('Invalid cursor') from e
+
+    if not isinstance(payload, list) or len(payload) != size:
+        raise ValueError('Invalid cursor')
+
+    return [_decode_value(v) for v in payload]
+
+
+def _decode_value(value):
+    # Anything else would reach the SQL comparison as is
+    if isinstance(value, dict) and list(value) == ['dt'] and isinstance(value['dt'], str):
+        return datetime.fromisoformat(value['dt'])
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    raise ValueError('Invalid cursor')
+
+
+def parse_limit(value, default, maximum):
+    """
+    Page size from a query parameter, clamped to [1, maximum]. Raises ValueError
+    for non-integers.
+    """
+    if value in (None, ''):
+        return default
+    return max(1, min(int(value), maximum))
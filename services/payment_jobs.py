@@ -0,0 +1,249 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+from sqlalchemy import update
+from sqlalchemy.dialects.postgresql import insert
+from models.public import db
+from models.clients import Booking, Payment, PaymentJob
+from services import http
+from services.payment_providers import PROVIDERS, get_service
+
+# Take up to :limit due jobs of one provider. SKIP LOCKED lets any number of
+# workers poll the same queue without waiting on each other's claims; the
+# lease lets a crashed worker's jobs be picked up again (requeue_stale).
+_CLAIM_SQL = db.text("""
+    WITH next AS (
+        SELECT id
+        FROM clients.payment_jobs
+        WHERE provider = :provider AND status = 'queued' AND run_after <= :now
+        ORDER BY id
+        LIMIT :limit
+        FOR UPDATE SKIP LOCKED
+    )
+    UPDATE clients.payment_jobs j
+    SET status = 'running', attempts = j.attempts + 1, locked_until = :lease, updated_at = :now
+    FROM next
+    WHERE j.id = next.id
+    RETURNING j.id, j.payment_id, j.provider, j.phone, j.attempts
+""")
+
+
+def enqueue(payment, phone, now=None):
+    """
+    Queue the provider call of a flushed payment, or re-queue it if its last
+    job finished. A job already running is left alone. The caller commits.
+    """
+    now = now or datetime.utcnow()
+    job = {
+        'provider': payment.payment_method,
+        'phone': phone,
+        'status': 'queued',
+        'attempts': 0,
+        'run_after': now,
+        'locked_until': None,
+        'last_error': None,
+        'updated_at': now
+    }
+    stmt = insert(PaymentJob).values(payment_id=payment.id, created_at=now, **job)
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=[PaymentJob.payment_id],
+        set_=job,
+        where=PaymentJob.status != 'running'
+    ))
+
+
+def claim(provider, limit, lease_seconds, now=None):
+    now = now or datetime.utcnow()
+    jobs = db.session.execute(_CLAIM_SQL, {
+        'provider': provider,
+        'limit': limit,
+        'now': now,
+        'lease': now + timedelta(seconds=lease_seconds)
+    }).mappings().all()
+    db.session.commit()
+    return [dict(job) for job in jobs]
+
+
+def requeue_stale(max_attempts, now=None):
+    """
+    Put back the jobs of workers that died mid-call. A job that already used
+    its `max_attempts` fails instead, so one that kills its worker isn't
+    retried forever. Returns (requeued, failed).
+    """
+    now = now or datetime.utcnow()
+    stale = (PaymentJob.status == 'running', PaymentJob.locked_until < now)
+    failed = db.session.execute(
+        update(PaymentJob)
+        .where(*stale, PaymentJob.attempts >= max_attempts)
+        .values(status='failed', locked_until=None, last_error='Worker stopped during the provider call', updated_at=now)
+        .returning(PaymentJob.payment_id)
+    ).scalars().all()
+    if failed:
+        db.session.execute(
+            update(Payment)
+            .where(Payment.id.in_(failed), Payment.status == 'initiating')
+            .values(status='failed', updated_at=now)
+        )
+    requeued = db.session.execute(
+        update(PaymentJob)
+        .where(*stale, PaymentJob.attempts < max_attempts)
+        .values(status='queued', locked_until=None, updated_at=now)
+    ).rowcount
+    db.session.commit()
+    return requeued, len(failed)
+
+
+def cancel_queued(payment_id, now=None):
+    """
+    Cancel the queued job of a payment about to be initiated synchronously,
+    so no worker calls the provider a second time. The job row stays locked
+    until the caller commits. Returns False if a worker is calling the
+    provider for it right now.
+    """
+    now = now or datetime.utcnow()
+    job = db.session.execute(
+        db.select(PaymentJob.id, PaymentJob.status, PaymentJob.locked_until)
+        .where(PaymentJob.payment_id == payment_id)
+        .with_for_update()
+    ).first()
+    if job is None or job.status not in ('queued', 'running'):
+        return True
+    if job.status == 'running' and job.locked_until >= now:
+        return False
+    db.session.execute(
+        update(PaymentJob)
+        .where(PaymentJob.id == job.id)
+        .values(status='cancelled', locked_until=None, updated_at=now)
+    )
+    return True
+
+
+def _finish(job, payment_values, job_values):
+    """Record a job's outcome; the payment only moves if it is still initiating."""
+    now = datetime.utcnow()
+    if payment_values:
+        db.session.execute(
+            update(Payment)
+            .where(Payment.id == job['payment_id'], Payment.status == 'initiating')
+            .values(updated_at=now, **payment_values)
+        )
+    db.session.execute(
+        update(PaymentJob)
+        .where(PaymentJob.id == job['id'])
+        .values(locked_until=None, updated_at=now, **job_values)
+    )
+    db.session.commit()
+
+
+def run_job(job, max_attempts, retry_backoff):
+    """
+    Call the provider for one claimed job. Must run inside an app context. No
+    transaction is open during the provider call. Returns 'done', 'retry' or
+    'failed'.
+    """
+    row = db.session.execute(
+        db.select(Payment.amount, Payment.status, Booking.id, Booking.status)
+        .join(Booking, Booking.id == Payment.booking_id)
+        .where(Payment.id == job['payment_id'])
+    ).first()
+    db.session.commit()
+
+    if row is not None and row[1] != 'initiating':
+        # Initiated meanwhile (synchronous /initiate) or already settled by a
+        # webhook: calling the provider again would charge the customer twice
+        _finish(job, None, {'status': 'done', 'last_error': f'Payment already {row[1]}'})
+        return 'done'
+    if row is None or row[3] != 'pending':
+        _finish(job, {'status': 'failed'}, {'status': 'failed', 'last_error': 'Booking is not pending payment'})
+        return 'failed'
+    amount, _, booking_id, _ = row
+
+    try:
+        response = get_service(job['provider']).initiate_payment(
+            amount=amount,
+            phone=job['phone'],
+            transaction_id=f"MB{booking_id}{job['payment_id']}"
+        )
+    except Exception as e:
+        breaker = http.breaker(job['provider'])
+        if breaker.is_open():
+            # Not this payment's fault: wait out the open circuit without using up an attempt
+            run_after = datetime.utcnow() + timedelta(seconds=breaker.open_seconds)
+            _finish(job, None, {'status': 'queued', 'attempts': job['attempts'] - 1, 'run_after': run_after, 'last_error': str(e)})
+            return 'retry'
+        if job['attempts'] < max_attempts:
+            run_after = datetime.utcnow() + timedelta(seconds=retry_backoff * 2 ** (job['attempts'] - 1))
+            _finish(job, None, {'status': 'queued', 'run_after': run_after, 'last_error': str(e)})
+            return 'retry'
+        _finish(job, {'status': 'failed'}, {'status': 'failed', 'last_error': str(e)})
+        return 'failed'
+
+    _finish(job, {
+        'status': 'pending',
+        'transaction_id': response.get('transaction_id'),
+        'payment_url': response.get('payment_url'),
+        'payment_provider_response': str(response)
+    }, {'status': 'done', 'last_error': None})
+    return 'done'
+
+
+def work(app, providers=None, once=False):
+    """
+    Drain the payment job queue. Each provider gets its own pool of
+    PAYMENT_WORKER_CONCURRENCY threads and never has more jobs claimed than
+    free threads, so a slow provider only backs up its own queue. With
+    once=True, returns {'done', 'retry', 'failed'} totals once nothing is due
+    or in flight; otherwise runs until interrupted.
+    """
+    config = app.config
+    providers = providers or list(PROVIDERS)
+    concurrency = config['PAYMENT_WORKER_CONCURRENCY']
+    pools = {
+        provider: ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix=f'payments-{provider}')
+        for provider in providers
+    }
+    in_flight = {provider: set() for provider in providers}
+    totals = {'done': 0, 'retry': 0, 'failed': 0}
+    next_requeue = 0
+
+    def run(job):
+        with app.app_context():
+            try:
+                return run_job(job, config['PAYMENT_JOB_MAX_ATTEMPTS'], config['PAYMENT_JOB_RETRY_BACKOFF_SECONDS'])
+            except Exception as e:
+                db.session.rollback()
+                print(f"[payments] job {job['id']} crashed: {e}")
+                return 'retry'
+
+    try:
+        while True:
+            claimed = 0
+            with app.app_context():
+                if time.monotonic() >= next_requeue:
+                    requeued, failed = requeue_stale(config['PAYMENT_JOB_MAX_ATTEMPTS'])
+                    if requeued or failed:
+                        print(f"[payments] requeued {requeued} stale jobs, failed {failed} out of attempts")
+                    next_requeue = time.monotonic() + config['PAYMENT_JOB_LEASE_SECONDS']
+                for provider in providers:
+                    free = concurrency - len(in_flight[provider])
+                    # Leave the jobs queued while the provider's circuit is open
+                    if free <= 0 or http.breaker(provider).is_open():
+                        continue
+                    for job in claim(provider, free, config['PAYMENT_JOB_LEASE_SECONDS']):
+                        in_flight[provider].add(pools[provider].submit(run, job))
+                        claimed += 1
+
+            running = set().union(*in_flight.values())
+            if once and not claimed and not running:
+                return totals
+            if running:
+                finished, _ = wait(running, timeout=config['PAYMENT_WORKER_POLL_SECONDS'], return_when=FIRST_COMPLETED)
+                for future in finished:
+                    totals[future.result()] += 1
+                for provider in providers:
+                    in_flight[provider] -= finished
+            else:
+                time.sleep(config['PAYMENT_WORKER_POLL_SECONDS'])
+    finally:
+        for pool in pools.values():
+            pool.shutdown(wait=True)
@@ -0,0 +1,16 @@
+from services.wave_payment import WavePaymentService
+from services.orange_money import OrangeMoneyService
+from services.mtn_momo import MTNMomoService
+
+# payment_method -> client class
+PROVIDERS = {
+    'wave': WavePaymentService,
+    'orange_money': OrangeMoneyService,
+    'mtn_momo': MTNMomoService
+}
+
+
+def get_service(payment_method):
+    """Client for a payment method, or None if the method is unknown."""
+    service_class = PROVIDERS.get(payment_method)
+    return service_class() if service_class else None
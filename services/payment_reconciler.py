@@ -0,0 +1,121 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import func, select, update
+from models.public import db
+from models.clients import Payment, PaymentWebhookEvent
+from services import webhook_inbox
+from services.payment_providers import PROVIDERS, get_service
+
+
+def _verify(payment):
+    """(payment, normalized status or None, provider answer or error message)"""
+    try:
+        result = get_service(payment.payment_method).verify_payment(payment.transaction_id)
+    except Exception as e:
+        return payment, None, str(e)
+    return payment, webhook_inbox.normalize_status(result.get('status')), result
+
+
+def reconcile_pending_payments(stale_minutes=10, page_size=200, concurrency=8, max_age_hours=48, now=None):
+    """
+    Ask the providers about payments still 'pending' `stale_minutes` after
+    their last update, i.e. whose webhook never came.
+
+    Payments are read in keyset pages and no transaction is open while the
+    providers answer. Each page is checked concurrently with one pool of
+    `concurrency` threads per provider, over the pooled provider sessions.
+    Final answers are appended to the webhook inbox with one statement and
+    applied by its processor, so they get the same ordered transitions and
+    booking confirmation as a callback. Payments still pending (or whose check
+    failed) get updated_at bumped, which spaces out their next check. Returns
+    per-outcome totals, per-provider counts and the throughput.
+    """
+    now = now or datetime.utcnow()
+    started = time.perf_counter()
+    config = current_app.config
+    totals = {'payments': 0, 'completed': 0, 'failed': 0, 'pending': 0, 'errors': 0, 'applied': 0}
+    per_provider = {provider: 0 for provider in PROVIDERS}
+    pools = {
+        provider: ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix=f'reconcile-{provider}')
+        for provider in PROVIDERS
+    }
+    last_id = 0
+
+    try:
+        while True:
+            page = db.session.execute(
+                select(Payment.id, Payment.payment_method, Payment.transaction_id)
+                .where(
+                    Payment.status == 'pending',
+                    Payment.transaction_id.isnot(None),
+                    Payment.payment_method.in_(list(PROVIDERS)),
+                    Payment.updated_at < now - timedelta(minutes=stale_minutes),
+                    Payment.created_at >= now - timedelta(hours=max_age_hours),
+                    Payment.id > last_id
+                )
+                .order_by(Payment.id)
+                .limit(page_size)
+            ).all()
+            db.session.commit()
+            if not page:
+                break
+            last_id = page[-1].id
+
+            futures = [pools[payment.payment_method].submit(_verify, payment) for payment in page]
+            events = []
+            unchanged = []
+            for future in futures:
+                payment, status, answer = future.result()
+                per_provider[payment.payment_method] += 1
+                if status is None:
+                    totals['errors'] += 1
+                    print(f"[payments] payment {payment.id}: status check failed: {answer}")
+                    unchanged.append(payment.id)
+                    continue
+                totals[status] += 1
+                if status == 'pending':
+                    unchanged.append(payment.id)
+                else:
+                    events.append((payment.payment_method, payment.transaction_id, status, json.dumps(answer, default=str)))
+
+            # Recorded under the payment method, like the callbacks (?provider=), so
+            # an outcome already received by webhook is not stored twice
+            recorded = webhook_inbox.record_many(events)
+            if unchanged:
+                db.session.execute(
+                    update(Payment)
+                    .where(Payment.id.in_(unchanged), Payment.status == 'pending')
+                    .values(updated_at=datetime.utcnow())
+                    .execution_options(synchronize_session=False)
+                )
+            db.session.commit()
+            if recorded:
+                webhook_inbox.process_inbox(
+                    config['WEBHOOK_BATCH_SIZE'],
+                    config['WEBHOOK_UNMATCHED_GRACE_SECONDS'],
+                    config['WEBHOOK_RETRY_SECONDS']
+                )
+                # The processor also drains callbacks that were waiting: only
+                # count this run's events
+                totals['applied'] += db.session.execute(
+                    select(func.count())
+                    .select_from(PaymentWebhookEvent)
+                    .where(PaymentWebhookEvent.id.in_(recorded), PaymentWebhookEvent.result == 'applied')
+                ).scalar()
+                db.session.commit()
+
+            totals['payments'] += len(page)
+            if len(page) < page_size:
+                break
+    finally:
+        for pool in pools.values():
+            pool.shutdown(wait=True)
+
+    elapsed = time.perf_counter() - started
+    totals['providers'] = {provider: count for provider, count in per_provider.items() if count}
+    totals['seconds'] = round(elapsed, 2)
+    totals['per_second'] = round(totals['payments'] / elapsed, 1) if elapsed else 0.0
+    return totals
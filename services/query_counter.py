@@ -0,0 +1,89 @@
+import threading
+from contextlib import contextmanager
+from functools import wraps
+from flask import Response, current_app
+from sqlalchemy import event
+from models.public import db
+
+_local = threading.local()
+_listening = set()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    statements = getattr(_local, 'statements', None)
+    if statements is not None:
+        statements.append(statement)
+
+
+def _ensure_listener(engine):
+    if id(engine) not in _listening:
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        _listening.add(id(engine))
+
+
+@contextmanager
+def count_queries(engine=None):
+    """
+    Collect the SQL statements the current thread runs inside the block:
+
+        with count_queries() as statements:
+            client.get('/api/bookings')
+        assert len(statements) <= 1
+    """
+    _ensure_listener(engine or db.engine)
+    previous = getattr(_local, 'statements', None)
+    _local.statements = []
+    try:
+        yield _local.statements
+    finally:
+        collected = _local.statements
+        _local.statements = previous
+        if previous is not None:
+            previous.extend(collected)
+
+
+@contextmanager
+def assert_max_queries(maximum, engine=None):
+    """
+    Fail with the offending statements if the block runs more than `maximum` queries.
+    """
+    with count_queries(engine) as statements:
+        yield statements
+    _check_budget(maximum, statements)
+
+
+def _check_budget(maximum, statements):
+    if len(statements) > maximum:
+        listing = '\n'.join(f'  {i + 1}. {s}' for i, s in enumerate(statements))
+        raise AssertionError(f'Expected at most {maximum} queries, got {len(statements)}:\n{listing}')
+
+
+def _budgeted_body(body, maximum, spent):
+    # A streamed body runs its queries while the server iterates it, after the
+    # view returned: they count against the same budget
+    with count_queries() as statements:
+        yield from body
+    _check_budget(maximum, spent + statements)
+
+
+def query_budget(maximum):
+    """
+    Declare the maximum number of queries an endpoint may run, including those
+    of a streamed response body. Only enforced when QUERY_BUDGET_CHECKS is
+    enabled (`flask trips check-query-budgets`, local profiling), so it costs
+    nothing in production.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not current_app.config.get('QUERY_BUDGET_CHECKS'):
+                return view(*args, **kwargs)
+            with count_queries() as statements:
+                response = view(*args, **kwargs)
+            _check_budget(maximum, statements)
+            if isinstance(response, Response) and response.is_streamed:
+                response.response = _budgeted_body(response.response, maximum, list(statements))
+            return response
+        wrapper.query_budget = maximum
+        return wrapper
+    return decorator
@@ -0,0 +1,186 @@
+import heapq
+import uuid
+import numpy as np
+from config import Config
+from services.normalization import normalize_city
+from services.stop_index import LinesSnapshot, StopIndex, haversine_meters, load_stops
+
+
+class RouteGraph:
+    """
+    The line network as a graph of stops (one node per stop of a line).
+
+    Consecutive stops of a line are joined both ways by a ride edge weighted by
+    their haversine distance; stops of different lines at most
+    `transfer_radius` meters apart are joined by a walk edge (a transfer)
+    costing `walk_factor` x the distance plus `transfer_penalty` meters.
+    Edges are kept in CSR form (per-node slices of flat lists).
+    """
+
+    def __init__(self, index, transfer_radius=300, transfer_penalty=2000, walk_factor=2.0):
+        self.index = index
+        self.stops = index.stops
+        # Below 1 the A* heuristic (straight-line distance) would overestimate
+        walk_factor = max(1.0, walk_factor)
+        count = len(self.stops)
+
+        by_line = {}
+        for position, stop in enumerate(self.stops):
+            by_line.setdefault(stop[4], []).append((stop[3], position))
+        ride_from, ride_to = [], []
+        for stops in by_line.values():
+            positions = [position for _, position in sorted(stops)]
+            ride_from.extend(positions[:-1])
+            ride_to.extend(positions[1:])
+        ride_from, ride_to = np.array(ride_from, dtype=np.int64), np.array(ride_to, dtype=np.int64)
+        ride_lengths = haversine_meters(
+            index.latitudes[ride_from], index.longitudes[ride_from], index.latitudes[ride_to], index.longitudes[ride_to]
+        ) if len(ride_from) else np.empty(0)
+
+        walk_from, walk_to, walk_lengths = index.pairs_within(transfer_radius)
+        line_ids = np.array([stop[4] for stop in self.stops], dtype=object)
+        other_line = line_ids[walk_from] != line_ids[walk_to] if len(walk_from) else np.empty(0, dtype=bool)
+        walk_from, walk_to, walk_lengths = walk_from[other_line], walk_to[other_line], walk_lengths[other_line]
+
+        sources = np.concatenate([ride_from, ride_to, walk_from])
+        targets = np.concatenate([ride_to, ride_from, walk_to])
+        lengths = np.concatenate([ride_lengths, ride_lengths, walk_lengths])
+        walks = np.concatenate([np.zeros(2 * len(ride_from), dtype=np.int64), np.ones(len(walk_from), dtype=np.int64)])
+        costs = np.where(walks == 1, lengths * walk_factor + transfer_penalty, lengths)
+
+        ordering = np.argsort(sources, kind='stable')
+        self._offsets = np.concatenate([[0], np.cumsum(np.bincount(sources, minlength=count))]).tolist()
+        # Plain lists: the search loop indexes them one item at a time
+        self._targets = targets[ordering].tolist()
+        self._costs = costs[ordering].tolist()
+        self._lengths = lengths[ordering].tolist()
+        self._walks = walks[ordering].tolist()
+        self.rides = len(ride_from)
+        self.transfers = len(walk_from)
+
+        self._by_id = {str(stop[0]): position for position, stop in enumerate(self.stops)}
+        self._by_name = {}
+        for position, stop in enumerate(self.stops):
+            self._by_name.setdefault(normalize_city(stop[6]), []).append(position)
+
+    def __len__(self):
+        return len(self.stops)
+
+    def resolve(self, value):
+        """Positions of the stops a `from`/`to` value names: a stop id, or a station name (any line)."""
+        try:
+            position = self._by_id.get(str(uuid.UUID(value)))
+            return [position] if position is not None else []
+        except ValueError:
+            return self._by_name.get(normalize_city(value), [])
+
+    def plan(self, sources, targets, max_transfers=3, limit=3, heuristic=True):
+        """
+        Pareto-optimal itineraries from any source stop to any target stop:
+        the cheapest one, then cheaper-in-transfers alternatives, up to `limit`.
+
+        A* over (stop, transfers used) states, guided by the straight-line
+        distance to the nearest target. States reached with more transfers than
+        an earlier, cheaper visit of the same stop are dropped; once a target is
+        reached with k transfers, only states with fewer than k are expanded.
+        Returns [(cost, transfers, [edge, ...])].
+        """
+        target_set = set(targets)
+        if heuristic:
+            latitudes, longitudes = self.index.latitudes, self.index.longitudes
+            estimate = np.min([
+                haversine_meters(latitudes[t], longitudes[t], latitudes, longitudes) for t in target_set
+            ], axis=0).tolist()
+        else:
+            estimate = [0.0] * len(self.stops)
+
+        offsets, next_stops, costs, walks = self._offsets, self._targets, self._costs, self._walks
+        settled = [max_transfers + 1] * len(self.stops)
+        best = {(source, 0): 0.0 for source in sources}
+        parents = {}
+        heap = [(estimate[source], 0.0, 0, source) for source in set(sources)]
+        heapq.heapify(heap)
+        allowed = max_transfers
+        found = []
+
+        while heap:
+            _, cost, transfers, stop = heapq.heappop(heap)
+            # States pushed before a target was reached may use as many
+            # transfers as it did: they can't be a cheaper-in-transfers option
+            if transfers > allowed or transfers >= settled[stop]:
+                continue
+            settled[stop] = transfers
+            if stop in target_set:
+                found.append((cost, transfers, self._path(parents, stop, transfers)))
+                allowed = transfers - 1
+                if allowed < 0 or len(found) >= limit:
+                    break
+                continue
+            for edge in range(offsets[stop], offsets[stop + 1]):
+                next_transfers = transfers + walks[edge]
+                next_stop = next_stops[edge]
+                if next_transfers > allowed or next_transfers >= settled[next_stop]:
+                    continue
+                next_cost = cost + costs[edge]
+                key = (next_stop, next_transfers)
+                if next_cost < best.get(key, float('inf')):
+                    best[key] = next_cost
+                    parents[key] = (stop, transfers, edge)
+                    heapq.heappush(heap, (next_cost + estimate[next_stop], next_cost, next_transfers, next_stop))
+        return found
+
+    def _path(self, parents, stop, transfers):
+        edges = []
+        while (stop, transfers) in parents:
+            stop, transfers, edge = parents[(stop, transfers)]
+            edges.append((stop, edge))
+        return edges[::-1]
+
+    def _stop_dict(self, position):
+        stop = self.stops[position]
+        return {'id': stop[0], 'station': stop[6], 'latitude': stop[1], 'longitude': stop[2]}
+
+    def itinerary(self, cost, transfers, edges):
+        """JSON-ready itinerary: legs riding one line or walking to another."""
+        legs = []
+        for stop, edge in edges:
+            next_stop, length = self._targets[edge], self._lengths[edge]
+            if self._walks[edge]:
+                legs.append({'type': 'walk', 'from': stop, 'to': next_stop, 'stops': 1, 'distance': length})
+            elif legs and legs[-1]['type'] == 'ride':
+                legs[-1].update(to=next_stop, stops=legs[-1]['stops'] + 1, distance=legs[-1]['distance'] + length)
+            else:
+                legs.append({'type': 'ride', 'from': stop, 'to': next_stop, 'stops': 1, 'distance': length})
+
+        result = []
+        for leg in legs:
+            item = {
+                'type': leg['type'],
+                'from': self._stop_dict(leg['from']),
+                'to': self._stop_dict(leg['to']),
+                'distance_meters': round(leg['distance'], 1)
+            }
+            if leg['type'] == 'ride':
+                line = self.stops[leg['from']]
+                item['line'] = {'id': line[4], 'name': line[5]}
+                item['stops'] = leg['stops']
+            result.append(item)
+        return {
+            'transfers': transfers,
+            'distance_meters': round(sum(leg['distance'] for leg in legs), 1),
+            'walking_meters': round(sum(leg['distance'] for leg in legs if leg['type'] == 'walk'), 1),
+            'cost': round(cost, 1),
+            'legs': result
+        }
+
+
+def build_graph(stops):
+    return RouteGraph(
+        StopIndex(stops, Config.STOP_INDEX_CELL_DEGREES),
+        Config.PLAN_TRANSFER_RADIUS_METERS,
+        Config.PLAN_TRANSFER_PENALTY_METERS,
+        Config.PLAN_WALK_FACTOR
+    )
+
+
+route_graph = LinesSnapshot('Route graph', lambda version: build_graph(load_stops()), Config.STOP_INDEX_CHECK_SECONDS)
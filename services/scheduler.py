@@ -0,0 +1,138 @@
+import threading
+import time
+import traceback
+from models.public import db
+
+
+class Scheduler:
+    """
+    Minimal in-process periodic job runner: one daemon thread, each job runs in
+    its own app context every `interval` seconds. Jobs must be safe to run from
+    several processes at once (they use SKIP LOCKED / conditional updates).
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.jobs = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add_job(self, name, interval, func):
+        if interval > 0:
+            self.jobs.append({'name': name, 'interval': interval, 'func': func, 'next_run': 0.0})
+
+    def start(self):
+        if self.jobs and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='scheduler', daemon=True)
+            self._thread.start()
+
+    def run(self):
+        """Run the jobs in the calling thread until stop() (`flask scheduler run`)."""
+        self._run()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            now = time.monotonic()
+            for job in self.jobs:
+                if job['next_run'] <= now:
+                    self._run_job(job)
+                    job['next_run'] = time.monotonic() + job['interval']
+            self._stop.wait(1)
+
+    def _run_job(self, job):
+        with self.app.app_context():
+            try:
+                result = job['func']()
+                if result:
+                    print(f"[scheduler] {job['name']}: {result}")
+            except Exception:
+                db.session.rollback()
+                print(f"[scheduler] {job['name']} failed:\n{traceback.format_exc()}")
+            finally:
+                db.session.remove()
+
+
+def init_scheduler(app):
+    """
+    Register the background jobs on app.extensions['scheduler']. Applying
+    payment webhooks and promoting the waitlist are always registered (the
+    API depends on them); the maintenance jobs only with SCHEDULER_ENABLED.
+    A job whose interval is 0 is left out, e.g. when it runs from cron.
+    Nothing is started here: building the app also happens in one-shot CLI
+    commands and in the reloader's watcher, see start_scheduler().
+    """
+    from services.availability import fold_seat_deltas
+    from services.hold_sweeper import sweep_expired_holds
+    from services.idempotency import purge_expired
+    from services.payment_reconciler import reconcile_pending_payments
+    from services.seat_reconciler import reconcile_seat_counters
+    from services.waitlist import promote_waitlisted
+    from services.webhook_inbox import process_inbox
+
+    scheduler = Scheduler(app)
+    scheduler.add_job(
+        'process-payment-webhooks',
+        app.config['WEBHOOK_PROCESS_INTERVAL_SECONDS'],
+        lambda: _only_changes(process_inbox(
+            app.config['WEBHOOK_BATCH_SIZE'],
+            app.config['WEBHOOK_UNMATCHED_GRACE_SECONDS'],
+            app.config['WEBHOOK_RETRY_SECONDS']
+        ), 'events')
+    )
+    scheduler.add_job(
+        'promote-waitlist',
+        app.config['WAITLIST_PROMOTE_INTERVAL_SECONDS'],
+        lambda: _only_changes(promote_waitlisted(
+            app.config['WAITLIST_HOLD_TTL_MINUTES'], app.config['WAITLIST_PROMOTE_BATCH_SIZE']
+        ), 'bookings')
+    )
+
+    if app.config.get('SCHEDULER_ENABLED'):
+        scheduler.add_job(
+            'sweep-expired-holds',
+            app.config['HOLD_SWEEP_INTERVAL_SECONDS'],
+            lambda: _only_changes(sweep_expired_holds(app.config['HOLD_SWEEP_BATCH_SIZE']), 'bookings')
+        )
+        scheduler.add_job(
+            'purge-idempotency-keys',
+            app.config['IDEMPOTENCY_PURGE_INTERVAL_SECONDS'],
+            purge_expired
+        )
+        scheduler.add_job(
+            'fold-availability-deltas',
+            app.config['AVAILABILITY_FOLD_INTERVAL_SECONDS'],
+            lambda: fold_seat_deltas() or None
+        )
+        scheduler.add_job(
+            'reconcile-seat-counters',
+            app.config['SEAT_RECONCILE_INTERVAL_SECONDS'],
+            lambda: _only_changes(reconcile_seat_counters(), 'rebalanced')
+        )
+        scheduler.add_job(
+            'reconcile-pending-payments',
+            app.config['PAYMENT_RECONCILE_INTERVAL_SECONDS'],
+            lambda: _only_changes(reconcile_pending_payments(
+                app.config['PAYMENT_RECONCILE_STALE_MINUTES'],
+                app.config['PAYMENT_RECONCILE_PAGE_SIZE'],
+                app.config['PAYMENT_RECONCILE_CONCURRENCY'],
+                app.config['PAYMENT_RECONCILE_MAX_AGE_HOURS']
+            ), 'payments')
+        )
+
+    app.extensions['scheduler'] = scheduler
+    return scheduler
+
+
+def start_scheduler(app):
+    """Start the registered jobs in a daemon thread. Only call it from the serving process."""
+    scheduler = app.extensions['scheduler']
+    scheduler.start()
+    return scheduler
+
+
+def _only_changes(result, key):
+    # Keep the log quiet when a run had nothing to do
+    return result if result.get(key) else None
@@ -0,0 +1,74 @@
+"""
+Seat maps are stored as PostgreSQL bit strings (bit varying), one bit per
+seat: bit i is seat i + 1, '1' means the seat is taken. psycopg2 reads and
+writes them as plain '0'/'1' strings, so these helpers work on str.
+"""
+
+
+def empty(size):
+    return '0' * size
+
+
+def encode(seat_numbers, size):
+    """Bit string of length `size` with the given (1-based) seats set."""
+    bits = ['0'] * size
+    for number in seat_numbers:
+        bits[number - 1] = '1'
+    return ''.join(bits)
+
+
+def decode(bits):
+    """Sorted seat numbers set in a bit string, or None for a missing map."""
+    if bits is None:
+        return None
+    return [index + 1 for index, bit in enumerate(bits) if bit == '1']
+
+
+def invert(bits):
+    return bits.translate(str.maketrans('01', '10'))
+
+
+def free_seats(bits, count, exclude=()):
+    """
+    The `count` lowest free seat numbers, skipping `exclude`, or None if the
+    map doesn't have that many left.
+    """
+    excluded = set(exclude)
+    free = []
+    for index, bit in enumerate(bits):
+        if len(free) == count:
+            break
+        if bit == '0' and index + 1 not in excluded:
+            free.append(index + 1)
+    return free if len(free) == count else None
+
+
+def parse_seat_numbers(value):
+    """
+    Validate a seat_numbers request field: a non-empty list of distinct
+    positive integers. Returns the sorted list; raises ValueError.
+    """
+    if not isinstance(value, list) or not value:
+        raise ValueError('seat_numbers must be a non-empty list')
+    try:
+        numbers = [int(number) for number in value]
+    except (TypeError, ValueError):
+        raise ValueError('seat_numbers must be integers')
+    if any(number < 1 for number in numbers):
+        raise ValueError('seat_numbers must be positive')
+    if len(set(numbers)) != len(numbers):
+        raise ValueError('seat_numbers must not repeat')
+    return sorted(numbers)
+
+
+def split(bits, counts):
+    """
+    Deal the seats set in `bits` out to parties of `counts` seats, lowest
+    numbers first. Returns one bit string per party.
+    """
+    numbers = decode(bits)
+    masks = []
+    for count in counts:
+        masks.append(encode(numbers[:count], len(bits)))
+        numbers = numbers[count:]
+    return masks
@@ -0,0 +1,73 @@
+from datetime import datetime
+from sqlalchemy import func, or_, select
+from models.public import db
+from models.partners import ScheduledTrip, TripSeatCounter
+from services import availability, inventory
+from services.trip_cache import trip_search_cache
+
+
+def _resync(trip_id, slots=None):
+    """
+    Rebalance one trip's seat counters in its own transaction, carrying any
+    correction over to the availability rollup and the search cache.
+    Returns inventory.rebalance()'s result.
+    """
+    result = inventory.rebalance(trip_id, slots)
+    if result is not None and result[1]:
+        trip = db.session.get(ScheduledTrip, trip_id)
+        availability.apply_seat_delta(trip, result[1])
+        db.session.commit()
+        trip_search_cache.invalidate_trip(trip)
+        print(f"[seats] trip {trip_id}: corrected available seats by {result[1]:+d}")
+    else:
+        db.session.commit()
+    return result
+
+
+def reconcile_seat_counters(now=None):
+    """
+    Go over the upcoming active trips: rebalance striped counters whose slots
+    drifted apart and, on trips with a seat map, correct the counters against
+    the bookings. Each trip is handled in its own short transaction. Returns
+    {'trips', 'rebalanced', 'corrected', 'seats'} totals.
+    """
+    now = now or datetime.utcnow()
+    totals = {'trips': 0, 'rebalanced': 0, 'corrected': 0, 'seats': 0}
+
+    # A single counter without a seat map has nothing to rebalance or check
+    striped = (
+        select(TripSeatCounter.trip_id)
+        .group_by(TripSeatCounter.trip_id)
+        .having(func.count() > 1)
+    )
+    trip_ids = db.session.execute(
+        select(ScheduledTrip.id)
+        .where(
+            ScheduledTrip.status == 'active',
+            ScheduledTrip.departure_time >= now,
+            or_(ScheduledTrip.blocked_seat_map.isnot(None), ScheduledTrip.id.in_(striped))
+        )
+        .order_by(ScheduledTrip.id)
+    ).scalars().all()
+    db.session.commit()
+
+    for trip_id in trip_ids:
+        result = _resync(trip_id)
+        if result is None:
+            continue
+        rows, correction = result
+        totals['trips'] += 1
+        if rows is not None:
+            totals['rebalanced'] += 1
+        if correction:
+            totals['corrected'] += 1
+            totals['seats'] += correction
+    return totals
+
+
+def stripe_trip(trip_id, slots):
+    """
+    Split a trip's seat counters into `slots` slots (or merge them back with
+    slots=1). Returns inventory.rebalance()'s result.
+    """
+    return _resync(trip_id, slots)
@@ -0,0 +1,206 @@
+import threading
+import time
+import numpy as np
+from sqlalchemy import select
+from config import Config
+from models.public import db, Line, Station, Stop
+from services import catalog_versions
+
+EARTH_RADIUS_METERS = 6371008.8
+# Length of one degree of latitude
+METERS_PER_DEGREE = 111320.0
+
+
+def haversine_meters(lat, lon, latitudes, longitudes):
+    """Great-circle distance in meters from (lat, lon) to each point of the arrays (degrees)."""
+    lat, lon = np.radians(lat), np.radians(lon)
+    latitudes, longitudes = np.radians(latitudes), np.radians(longitudes)
+    a = (
+        np.sin((latitudes - lat) / 2) ** 2
+        + np.cos(lat) * np.cos(latitudes) * np.sin((longitudes - lon) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_METERS * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class StopIndex:
+    """
+    Uniform lat/lon grid over every stop. Stops are sorted by cell so each cell
+    is a contiguous slice of the arrays; a lookup gathers the cells that
+    overlap the search circle and ranks their stops by haversine distance.
+    """
+
+    def __init__(self, stops, cell_degrees, version=None):
+        """`stops`: sequence of (id, latitude, longitude, order, line_id, line_name, station_name)."""
+        self.cell_degrees = cell_degrees
+        self.version = version
+        latitudes = np.array([stop[1] for stop in stops], dtype=np.float64)
+        longitudes = np.array([stop[2] for stop in stops], dtype=np.float64)
+        rows = np.floor(latitudes / cell_degrees).astype(np.int64)
+        cols = np.floor(longitudes / cell_degrees).astype(np.int64)
+        ordering = np.lexsort((cols, rows))
+
+        self.latitudes = latitudes[ordering]
+        self.longitudes = longitudes[ordering]
+        self.stops = [stops[i] for i in ordering]
+        self.cells = {}
+        rows, cols = rows[ordering], cols[ordering]
+        if len(ordering):
+            starts = np.flatnonzero(np.r_[True, (rows[1:] != rows[:-1]) | (cols[1:] != cols[:-1])])
+            ends = np.r_[starts[1:], len(ordering)]
+            for start, end in zip(starts.tolist(), ends.tolist()):
+                self.cells[(int(rows[start]), int(cols[start]))] = (start, end)
+
+    def __len__(self):
+        return len(self.stops)
+
+    def _candidates(self, lat, lon, radius):
+        lat_span = radius / METERS_PER_DEGREE
+        # Clamp near the poles, where a degree of longitude shrinks to nothing
+        lon_span = min(180.0, radius / (METERS_PER_DEGREE * max(np.cos(np.radians(lat)), 1e-6)))
+        row_min, row_max = int(np.floor((lat - lat_span) / self.cell_degrees)), int(np.floor((lat + lat_span) / self.cell_degrees))
+        col_min, col_max = int(np.floor((lon - lon_span) / self.cell_degrees)), int(np.floor((lon + lon_span) / self.cell_degrees))
+
+        if (row_max - row_min + 1) * (col_max - col_min + 1) > len(self.cells):
+            # Search area wider than the network: check the occupied cells instead
+            slices = [
+                bounds for (row, col), bounds in self.cells.items()
+                if row_min <= row <= row_max and col_min <= col <= col_max
+            ]
+        else:
+            slices = [
+                self.cells[(row, col)]
+                for row in range(row_min, row_max + 1)
+                for col in range(col_min, col_max + 1)
+                if (row, col) in self.cells
+            ]
+        if not slices:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([np.arange(start, end) for start, end in slices])
+
+    def nearby(self, lat, lon, radius, limit):
+        """
+        Up to `limit` stops within `radius` meters of (lat, lon), nearest
+        first, as (stop tuple, distance in meters) pairs.
+        """
+        candidates = self._candidates(lat, lon, radius)
+        if not len(candidates):
+            return []
+        distances = haversine_meters(lat, lon, self.latitudes[candidates], self.longitudes[candidates])
+        within = np.flatnonzero(distances <= radius)
+        if len(within) > limit:
+            within = within[np.argpartition(distances[within], limit - 1)[:limit]]
+        within = within[np.argsort(distances[within], kind='stable')]
+        return [(self.stops[candidates[i]], float(distances[i])) for i in within]
+
+    def pairs_within(self, radius):
+        """
+        Every ordered pair of distinct stops at most `radius` meters apart, as
+        (first, second, distance) arrays of positions in self.stops. Each cell
+        is compared with its neighbours in one vectorized step.
+        """
+        if not self.cells:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0)
+        max_lat = float(np.abs(self.latitudes).max())
+        row_span = int(np.ceil(radius / METERS_PER_DEGREE / self.cell_degrees))
+        col_span = int(np.ceil(
+            radius / (METERS_PER_DEGREE * max(np.cos(np.radians(max_lat)), 1e-6)) / self.cell_degrees
+        ))
+        firsts, seconds, distances = [], [], []
+        for (row, col), (start, end) in self.cells.items():
+            others = np.concatenate([
+                np.arange(*self.cells[(r, c)])
+                for r in range(row - row_span, row + row_span + 1)
+                for c in range(col - col_span, col + col_span + 1)
+                if (r, c) in self.cells
+            ])
+            block = haversine_meters(
+                self.latitudes[start:end, None], self.longitudes[start:end, None],
+                self.latitudes[others][None, :], self.longitudes[others][None, :]
+            )
+            i, j = np.nonzero(block <= radius)
+            keep = others[j] != start + i
+            firsts.append(start + i[keep])
+            seconds.append(others[j[keep]])
+            distances.append(block[i[keep], j[keep]])
+        return np.concatenate(firsts), np.concatenate(seconds), np.concatenate(distances)
+
+
+def load_stops():
+    return [
+        tuple(row) for row in db.session.execute(
+            select(Stop.id, Stop.latitude, Stop.longitude, Stop.order, Stop.line_id, Line.name, Station.name)
+            .join(Line, Line.id == Stop.line_id)
+            .join(Station, Station.id == Stop.station_id)
+        ).all()
+    ]
+
+
+class LinesSnapshot:
+    """
+    A structure built from the line network (stop index, route graph) and
+    kept per process. Lines and stops only change through the import, which
+    bumps the 'lines' catalog version: the version is checked at most every
+    `check_interval` seconds (not per request) and `build(version)` runs again
+    when it moved. The import also calls reload() when it finishes in this
+    process. Requests keep using the previous snapshot during a rebuild.
+    """
+
+    def __init__(self, name, build, check_interval=30):
+        self.name = name
+        self.build = build
+        self.check_interval = check_interval
+        self._value = None
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.build_seconds = 0.0
+
+    @property
+    def loaded(self):
+        return self._value is not None
+
+    def get(self):
+        """The snapshot, building or refreshing it if due. Needs an app context."""
+        value = self._value
+        if value is not None and time.monotonic() < self._checked_at + self.check_interval:
+            return value
+        # Only one request refreshes; the others answer from the current snapshot
+        if not self._lock.acquire(blocking=value is None):
+            return value
+        try:
+            if self._value is None or time.monotonic() >= self._checked_at + self.check_interval:
+                version = _lines_version()
+                if self._value is None or self._version != version:
+                    self._build(version)
+                self._checked_at = time.monotonic()
+            return self._value
+        finally:
+            self._lock.release()
+
+    def _build(self, version):
+        started = time.perf_counter()
+        self._value = self.build(version)
+        self._version = version
+        self.build_seconds = time.perf_counter() - started
+        self.builds += 1
+        print(f"{self.name} built: {len(self._value)} stops in {self.build_seconds * 1000:.0f}ms")
+
+    def reload(self):
+        """Rebuild now if this process already serves a snapshot (no-op otherwise)."""
+        if self._value is None:
+            return
+        with self._lock:
+            self._build(_lines_version())
+            self._checked_at = time.monotonic()
+
+
+def _lines_version():
+    return catalog_versions.get_versions(catalog_versions.LINES)[catalog_versions.LINES][0]
+
+
+stop_index = LinesSnapshot(
+    'Stop index',
+    lambda version: StopIndex(load_stops(), Config.STOP_INDEX_CELL_DEGREES, version),
+    Config.STOP_INDEX_CHECK_SECONDS
+)
@@ -0,0 +1,96 @@
+import threading
+import time
+from config import Config
+
+
+class TokenCache:
+    """
+    Process-wide cache of provider access tokens (MTN MoMo, Orange Money
+    OAuth, ...), keyed by provider name.
+
+    get() takes a fetch() callable returning (token, expires_in) and only
+    calls it when the cached token is missing or about to expire. Fetches are
+    single-flight per key: while one thread mints a token the others wait for
+    it instead of each asking the provider. Inside the refresh margin the
+    current token is still valid, so one thread refreshes it and the rest keep
+    using the old one without waiting. The margin is capped at a fraction of
+    the token's lifetime, so a short-lived token is still reused for a while
+    instead of being refetched on every call.
+    """
+
+    # Share of a token's lifetime the refresh margin may take at most
+    MAX_MARGIN_FRACTION = 0.5
+
+    def __init__(self, refresh_margin=60, default_ttl=300):
+        self.refresh_margin = refresh_margin
+        self.default_ttl = default_ttl
+        self._tokens = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.fetches = 0
+
+    def _key_lock(self, key):
+        with self._lock:
+            lock = self._locks.get(key)
+            if lock is None:
+                lock = self._locks[key] = threading.Lock()
+            return lock
+
+    def _fresh(self, key, now):
+        """(token, stale) for a token that can still be used, else None."""
+        entry = self._tokens.get(key)
+        if entry is None or entry[1] <= now:
+            return None
+        return entry[0], entry[2] <= now
+
+    def _fetch(self, key, fetch):
+        token, expires_in = fetch()
+        ttl = float(expires_in if expires_in else self.default_ttl)
+        margin = min(self.refresh_margin, ttl * self.MAX_MARGIN_FRACTION)
+        now = time.monotonic()
+        # (token, expires at, refresh from)
+        self._tokens[key] = (token, now + ttl, now + ttl - margin)
+        self.fetches += 1
+        return token
+
+    def get(self, key, fetch):
+        cached = self._fresh(key, time.monotonic())
+        if cached is not None:
+            token, stale = cached
+            if not stale:
+                self.hits += 1
+                return token
+            lock = self._key_lock(key)
+            if not lock.acquire(blocking=False):
+                # Someone is already refreshing it
+                self.hits += 1
+                return token
+            try:
+                return self._fetch(key, fetch)
+            except Exception:
+                # Not expired yet; the next call tries again
+                return token
+            finally:
+                lock.release()
+
+        with self._key_lock(key):
+            # The thread we waited on may have fetched it already
+            cached = self._fresh(key, time.monotonic())
+            if cached is not None and not cached[1]:
+                self.hits += 1
+                return cached[0]
+            return self._fetch(key, fetch)
+
+    def invalidate(self, key, token=None):
+        """
+        Forget a token the provider rejected. Passing the rejected token only
+        drops it if no newer one replaced it in the meantime.
+        """
+        with self._lock:
+            entry = self._tokens.get(key)
+            if entry is not None and (token is None or entry[0] == token):
+                del self._tokens[key]
+
+
+provider_tokens = TokenCache(refresh_margin=Config.PROVIDER_TOKEN_REFRESH_MARGIN_SECONDS)
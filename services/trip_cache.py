@@ -0,0 +1,103 @@
+import threading
+import time
+from collections import OrderedDict
+from config import Config
+
+
+class TripSearchCache:
+    """
+    Bounded LRU of GET /api/trips responses with a short TTL.
+
+    Keys start with the normalized (departure_key, arrival_key, date) of the
+    search; writes that change seats or trips on a route/date call invalidate()
+    so the next search reads fresh counts. The TTL bounds staleness from writes
+    made by other worker processes.
+    """
+
+    def __init__(self, maxsize=512, ttl=30):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.maxsize > 0 and self.ttl > 0
+
+    def generation(self):
+        """
+        Token to pass back to set(): a read that overlapped an invalidation is
+        not cached, so a response built before a commit can't outlive it.
+        """
+        return self._generation
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, generation):
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, departure_key, arrival_key, travel_date):
+        """
+        Drop every cached search that could include a trip on this route/date.
+        Searches match cities by key prefix, so 'abid' -> * is dropped by a
+        change on Abidjan -> Bouaké.
+        """
+        with self._lock:
+            self._generation += 1
+            stale = [
+                key for key in self._entries
+                if departure_key.startswith(key[0])
+                and arrival_key.startswith(key[1])
+                and key[2] in (None, travel_date)
+            ]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += 1
+
+    def invalidate_trip(self, trip):
+        self.invalidate(trip.departure_city_key, trip.arrival_city_key, trip.departure_time.date())
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
+
+
+trip_search_cache = TripSearchCache(Config.TRIP_SEARCH_CACHE_SIZE, Config.TRIP_SEARCH_CACHE_TTL)
@@ -0,0 +1,96 @@
+import json
+from datetime import datetime, timedelta
+from sqlalchemy import tuple_
+from models.public import db
+from models.partners import ScheduledTrip
+from services.normalization import normalize_city
+
+SEARCH_INDEXES = (
+    'ix_scheduled_trips_search_departure',
+    'ix_scheduled_trips_search_arrival',
+)
+
+
+def parse_search_date(value):
+    """
+    Parse a YYYY-MM-DD query parameter. Raises ValueError on bad input.
+    """
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def day_range(date_obj):
+    """
+    Half-open [start, end) datetime range covering one calendar day, so the
+    filter stays sargable on departure_time instead of wrapping it in date().
+    """
+    start = datetime.combine(date_obj, datetime.min.time())
+    return start, start + timedelta(days=1)
+
+
+def build_search_query(departure_city=None, arrival_city=None, date_obj=None):
+    """
+    Active trips matching the search. Cities are matched as a prefix of the
+    normalized key ('abid' matches 'Abidjan', 'bouake' matches 'Bouaké').
+    """
+    query = ScheduledTrip.query.filter(ScheduledTrip.status == 'active')
+
+    departure_key = normalize_city(departure_city) if departure_city else None
+    arrival_key = normalize_city(arrival_city) if arrival_city else None
+
+    if departure_key:
+        query = query.filter(ScheduledTrip.departure_city_key.like(f'{departure_key}%'))
+    if arrival_key:
+        query = query.filter(ScheduledTrip.arrival_city_key.like(f'{arrival_key}%'))
+    if date_obj:
+        start, end = day_range(date_obj)
+        query = query.filter(
+            ScheduledTrip.departure_time >= start,
+            ScheduledTrip.departure_time < end
+        )
+
+    return query
+
+
+def order_for_keyset(query, after=None):
+    """
+    Order by the (departure_time, id) keyset and resume strictly after the
+    `after` pair taken from a decoded cursor.
+    """
+    if after:
+        departure_time, trip_id = after
+        query = query.filter(
+            tuple_(ScheduledTrip.departure_time, ScheduledTrip.id) > tuple_(departure_time, trip_id)
+        )
+    return query.order_by(ScheduledTrip.departure_time, ScheduledTrip.id)
+
+
+def explain_search(departure_city=None, arrival_city=None, date_obj=None, disable_seqscan=True):
+    """
+    Run EXPLAIN on the search query and return (plan, indexes used).
+
+    With disable_seqscan the planner only falls back to a sequential scan when no
+    index can serve the predicates, which makes the check meaningful on small
+    development tables where a seq scan would otherwise be cheaper.
+    """
+    query = build_search_query(departure_city, arrival_city, date_obj)
+    compiled = query.statement.compile(dialect=db.engine.dialect)
+
+    with db.engine.connect() as conn:
+        with conn.begin():
+            if disable_seqscan:
+                conn.exec_driver_sql('SET LOCAL enable_seqscan = off')
+            row = conn.exec_driver_sql(
+                f'EXPLAIN (FORMAT JSON) {compiled}', compiled.params
+            ).scalar()
+
+    plan = row if isinstance(row, list) else json.loads(row)
+    return plan, sorted(_plan_indexes(plan[0]['Plan']))
+
+
+def _plan_indexes(node):
+    indexes = set()
+    if node.get('Index Name'):
+        indexes.add(node['Index Name'])
+    for child in node.get('Plans', []):
+        indexes |= _plan_indexes(child)
+    return indexes
@@ -0,0 +1,157 @@
+from datetime import datetime, timedelta
+from sqlalchemy import column, exists, func, insert, select, update, values, Integer
+from sqlalchemy.orm import aliased
+from models.public import db
+from models.clients import Booking, WaitlistEntry
+from models.partners import ScheduledTrip
+from services import availability, inventory, seat_map
+from services.trip_cache import trip_search_cache
+
+# First key of the per-trip advisory lock taken while promoting its queue
+_LOCK_NAMESPACE = 5701
+
+
+def position_column():
+    """
+    Place of an entry in its trip's queue (1 = next to be promoted), as a
+    correlated subquery on the FIFO index. None for entries no longer waiting.
+    """
+    ahead = aliased(WaitlistEntry)
+    return db.case(
+        (
+            WaitlistEntry.status == 'waiting',
+            select(func.count())
+            .where(ahead.trip_id == WaitlistEntry.trip_id, ahead.status == 'waiting', ahead.id <= WaitlistEntry.id)
+            .scalar_subquery()
+        ),
+        else_=None
+    ).label('position')
+
+
+def expire_stale(now=None):
+    """
+    Close the entries of trips that departed or are no longer active. Returns
+    the number of entries expired.
+    """
+    now = now or datetime.utcnow()
+    stale_trips = select(ScheduledTrip.id).where(
+        (ScheduledTrip.status != 'active') | (ScheduledTrip.departure_time <= now)
+    )
+    return db.session.execute(
+        update(WaitlistEntry)
+        .where(WaitlistEntry.status == 'waiting', WaitlistEntry.trip_id.in_(stale_trips))
+        .values(status='expired')
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+
+def promote_waitlisted(hold_minutes, max_trips=100, now=None):
+    """
+    Turn waitlist entries into pending bookings wherever seats were freed.
+
+    Works trip by trip, each in its own short transaction. The number of
+    statements per trip doesn't depend on the queue length: the head of the
+    queue is read once (at most as many entries as free seats), its seats are
+    reserved with a single reserve_seats() call, then the bookings are inserted
+    and the entries updated with one statement each. Returns {'trips',
+    'bookings', 'seats', 'expired'} totals.
+    """
+    now = now or datetime.utcnow()
+    totals = {'trips': 0, 'bookings': 0, 'seats': 0, 'expired': expire_stale(now)}
+    db.session.commit()
+
+    trip_ids = db.session.execute(
+        select(ScheduledTrip.id)
+        .where(
+            ScheduledTrip.status == 'active',
+            ScheduledTrip.departure_time > now,
+            exists().where(WaitlistEntry.trip_id == ScheduledTrip.id, WaitlistEntry.status == 'waiting'),
+            ScheduledTrip.available_seats > 0
+        )
+        .order_by(ScheduledTrip.departure_time)
+        .limit(max_trips)
+    ).scalars().all()
+    db.session.commit()
+
+    hold_expires_at = now + timedelta(minutes=hold_minutes)
+    for trip_id in trip_ids:
+        promoted = _promote_trip(trip_id, hold_expires_at, now)
+        if promoted:
+            totals['trips'] += 1
+            totals['bookings'] += promoted[0]
+            totals['seats'] += promoted[1]
+    return totals
+
+
+def _promote_trip(trip_id, hold_expires_at, now):
+    # One worker per trip at a time, so the queue head is promoted in order;
+    # a trip another worker holds is left to it
+    if not db.session.execute(select(func.pg_try_advisory_xact_lock(_LOCK_NAMESPACE, trip_id))).scalar():
+        db.session.rollback()
+        return None
+
+    available = db.session.execute(
+        select(ScheduledTrip.available_seats).where(ScheduledTrip.id == trip_id)
+    ).scalar()
+    # Every entry needs at least one seat, so the head that can fit is at
+    # most `available` entries long. The rows stay locked until commit: a
+    # concurrent DELETE /api/waitlist/<id> waits, then finds them promoted,
+    # and an entry it cancelled first is skipped here
+    entries = db.session.execute(
+        select(WaitlistEntry)
+        .where(WaitlistEntry.trip_id == trip_id, WaitlistEntry.status == 'waiting')
+        .order_by(WaitlistEntry.id)
+        .limit(available)
+        .with_for_update()
+    ).scalars().all()
+
+    # Strict FIFO: a party that doesn't fit keeps its place and holds back
+    # the entries behind it
+    chosen, seats = [], 0
+    for entry in entries:
+        if seats + entry.number_of_seats > available:
+            break
+        chosen.append(entry)
+        seats += entry.number_of_seats
+    if not chosen:
+        db.session.rollback()
+        return None
+
+    trip = inventory.reserve_seats(trip_id, seats)
+    if trip is None:
+        # Direct bookings took the seats meanwhile; try again next run
+        db.session.rollback()
+        return None
+
+    counts = [entry.number_of_seats for entry in chosen]
+    masks = seat_map.split(trip.seat_mask, counts) if trip.seat_mask is not None else [None] * len(chosen)
+    booking_ids = db.session.execute(
+        insert(Booking.__table__).values([{
+            'user_id': entry.user_id,
+            'trip_id': trip_id,
+            'number_of_seats': entry.number_of_seats,
+            'seat_mask': mask,
+            'total_price': trip.price * entry.number_of_seats,
+            'status': 'pending',
+            'passenger_name': entry.passenger_name,
+            'passenger_phone': entry.passenger_phone,
+            'created_at': now,
+            'hold_expires_at': hold_expires_at
+        } for entry, mask in zip(chosen, masks)]).returning(Booking.__table__.c.id)
+    ).scalars().all()
+
+    # Ids come from one sequence in row order
+    promoted = values(
+        column('entry_id', Integer), column('booking_id', Integer), name='promoted'
+    ).data(list(zip([entry.id for entry in chosen], sorted(booking_ids))))
+    db.session.execute(
+        update(WaitlistEntry)
+        .where(WaitlistEntry.id == promoted.c.entry_id)
+        .values(status='promoted', booking_id=promoted.c.booking_id, promoted_at=now)
+        .execution_options(synchronize_session=False)
+    )
+
+    availability.apply_seat_delta(trip, -seats)
+    db.session.commit()
+    trip_search_cache.invalidate_trip(trip)
+    return len(chosen), seats
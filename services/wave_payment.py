@@ -1,12 +1,14 @@
-import requests
 from flask import current_app
 from config import Config
+from services import http
+from services.circuit_breaker import ProviderUnavailable
 
 class WavePaymentService:
     def __init__(self):
         self.api_key = Config.WAVE_API_KEY
         self.merchant_key = Config.WAVE_MERCHANT_KEY
         self.api_url = Config.WAVE_API_URL
+        self.session = http.get_session('wave')
     
     def initiate_payment(self, amount, phone, transaction_id):
         """
@@ -24,14 +26,14 @@ class WavePaymentService:
                 'currency': 'XOF',
                 'phone': phone,
                 'merchant_reference': transaction_id,
-                'callback_url': f'{current_app.config.get("BASE_URL", "http://localhost:5000")}/api/payments/webhook'
+                'callback_url': f'{current_app.config.get("BASE_URL", "http://localhost:5000")}/api/payments/webhook?provider=wave'
             }
             
-            response = requests.post(
+            response = self.session.post(
                 f'{self.api_url}/payments',
                 json=payload,
                 headers=headers,
-                timeout=30
+                timeout=self.session.timeout()
             )
             
             if response.status_code == 201:
@@ -44,6 +46,8 @@ class WavePaymentService:
             else:
                 raise Exception(f"Wave API error: {response.text}")
                 
+        except ProviderUnavailable:
+            raise
         except Exception as e:
             raise Exception(f"Failed to initiate Wave payment: {str(e)}")
     
@@ -57,10 +61,10 @@ class WavePaymentService:
                 'Content-Type': 'application/json'
             }
             
-            response = requests.get(
+            response = self.session.get(
                 f'{self.api_url}/payments/{transaction_id}',
                 headers=headers,
-                timeout=30
+                timeout=self.session.timeout()
             )
             
             if response.status_code == 200:
@@ -72,6 +76,8 @@ class WavePaymentService:
             else:
                 raise Exception(f"Wave API error: {response.text}")
                 
+        except ProviderUnavailable:
+            raise
         except Exception as e:
             raise Exception(f"Failed to verify Wave payment: {str(e)}")
 
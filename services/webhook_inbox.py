@@ -0,0 +1,220 @@
+from datetime import datetime, timedelta
+from sqlalchemy import column, select, update, values, Integer, String, Text
+from sqlalchemy.dialects.postgresql import insert
+from models.public import db
+from models.clients import Booking, Payment, PaymentWebhookEvent
+from services.booking_service import confirm_paid_booking
+from services.trip_cache import trip_search_cache
+
+# Webhook and status-check wording of the three providers
+COMPLETED_STATUSES = ('completed', 'success', 'paid', 'successful', 'succeeded')
+FAILED_STATUSES = ('failed', 'cancelled', 'error', 'rejected', 'expired')
+
+# Payments only move forward, so a late or resent callback can't undo a
+# later state (e.g. 'failed' arriving after 'completed')
+_RANK = {'initiating': 0, 'pending': 0, 'failed': 1, 'completed': 2}
+
+
+def normalize_status(status):
+    status = str(status or 'pending').lower()
+    if status in COMPLETED_STATUSES:
+        return 'completed'
+    if status in FAILED_STATUSES:
+        return 'failed'
+    return 'pending'
+
+
+def record(provider, transaction_id, status, payload, now=None):
+    """
+    Append a provider callback to the inbox. Returns False if the same
+    (provider, transaction_id, status) was already received. The caller commits.
+    """
+    now = now or datetime.utcnow()
+    return db.session.execute(
+        insert(PaymentWebhookEvent)
+        .values(
+            provider=provider,
+            transaction_id=transaction_id,
+            status=normalize_status(status),
+            payload=payload,
+            received_at=now,
+            available_at=now
+        )
+        .on_conflict_do_nothing(constraint='uq_payment_webhook_events_provider_txn_status')
+        .returning(PaymentWebhookEvent.id)
+    ).first() is not None
+
+
+def record_many(events, now=None):
+    """
+    Append several (provider, transaction_id, status, payload) events with one
+    statement, skipping those already received. Returns the ids of the new
+    events. The caller commits.
+    """
+    if not events:
+        return []
+    now = now or datetime.utcnow()
+    return db.session.execute(
+        insert(PaymentWebhookEvent)
+        .values([{
+            'provider': provider,
+            'transaction_id': transaction_id,
+            'status': normalize_status(status),
+            'payload': payload,
+            'received_at': now,
+            'available_at': now
+        } for provider, transaction_id, status, payload in events])
+        .on_conflict_do_nothing(constraint='uq_payment_webhook_events_provider_txn_status')
+        .returning(PaymentWebhookEvent.id)
+    ).scalars().all()
+
+
+def _process_batch(batch_size, grace_seconds, retry_seconds, now):
+    events = db.session.execute(
+        select(
+            PaymentWebhookEvent.id, PaymentWebhookEvent.transaction_id, PaymentWebhookEvent.status,
+            PaymentWebhookEvent.payload, PaymentWebhookEvent.received_at
+        )
+        .where(PaymentWebhookEvent.processed_at.is_(None), PaymentWebhookEvent.available_at <= now)
+        .order_by(PaymentWebhookEvent.available_at, PaymentWebhookEvent.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    ).all()
+    if not events:
+        db.session.commit()
+        return None
+
+    # Locked in id order so concurrent processors can't deadlock
+    payments = {
+        payment.transaction_id: payment
+        for payment in db.session.execute(
+            select(Payment.id, Payment.booking_id, Payment.status, Payment.transaction_id)
+            .where(Payment.transaction_id.in_({event.transaction_id for event in events}))
+            .order_by(Payment.id)
+            .with_for_update()
+        ).all()
+    }
+
+    # Only the furthest state reached in the batch is applied to each payment
+    latest = {}
+    results = {}
+    unmatched = []
+    for event in events:
+        if event.transaction_id not in payments:
+            # The initiation may not have stored its transaction_id yet
+            if event.received_at > now - timedelta(seconds=grace_seconds):
+                unmatched.append(event.id)
+            else:
+                results[event.id] = 'unknown_payment'
+            continue
+        best = latest.get(event.transaction_id)
+        if best is None or _RANK[event.status] >= _RANK[best.status]:
+            if best is not None:
+                results[best.id] = 'ignored'
+            latest[event.transaction_id] = event
+        else:
+            results[event.id] = 'ignored'
+
+    changes = []
+    completed = []
+    booked_trips = []
+    for transaction_id, event in latest.items():
+        payment = payments[transaction_id]
+        results[event.id] = 'ignored'
+        if event.status == 'pending':
+            # Progress report: keep the provider's latest word, state unchanged
+            if payment.status in ('initiating', 'pending'):
+                changes.append((payment.id, payment.status, event.payload))
+                results[event.id] = 'applied'
+            continue
+        if _RANK[event.status] <= _RANK.get(payment.status, 0):
+            continue
+        if event.status == 'completed':
+            completed.append((event, payment))
+            continue
+        changes.append((payment.id, event.status, event.payload))
+        results[event.id] = 'applied'
+
+    if completed:
+        # Bookings still holding their seats are confirmed with one statement
+        pending = values(column('booking_id', Integer), name='paid').data(
+            [(payment.booking_id,) for _, payment in completed]
+        )
+        confirmed = set(db.session.execute(
+            update(Booking)
+            .where(Booking.id == pending.c.booking_id, Booking.status == 'pending')
+            .values(status='confirmed')
+            .returning(Booking.id)
+            .execution_options(synchronize_session=False)
+        ).scalars())
+        for event, payment in completed:
+            if payment.booking_id not in confirmed:
+                # Hold expired (seats to take back) or booking no longer pending
+                try:
+                    with db.session.begin_nested():
+                        _, trip = confirm_paid_booking(payment.booking_id)
+                except Exception as e:
+                    print(f"[webhooks] payment {payment.id}: confirming booking {payment.booking_id} failed: {e}")
+                    results[event.id] = 'error'
+                    continue
+                if trip is not None:
+                    booked_trips.append(trip)
+            changes.append((payment.id, event.status, event.payload))
+            results[event.id] = 'applied'
+
+    if changes:
+        changed = values(
+            column('payment_id', Integer), column('status', String), column('payload', Text), name='changed'
+        ).data(changes)
+        db.session.execute(
+            update(Payment)
+            .where(Payment.id == changed.c.payment_id)
+            .values(status=changed.c.status, payment_provider_response=changed.c.payload, updated_at=now)
+            .execution_options(synchronize_session=False)
+        )
+    if results:
+        processed = values(
+            column('event_id', Integer), column('result', String), name='processed'
+        ).data(list(results.items()))
+        db.session.execute(
+            update(PaymentWebhookEvent)
+            .where(PaymentWebhookEvent.id == processed.c.event_id)
+            .values(processed_at=now, result=processed.c.result)
+            .execution_options(synchronize_session=False)
+        )
+    if unmatched:
+        db.session.execute(
+            update(PaymentWebhookEvent)
+            .where(PaymentWebhookEvent.id.in_(unmatched))
+            .values(available_at=now + timedelta(seconds=retry_seconds))
+            .execution_options(synchronize_session=False)
+        )
+    db.session.commit()
+    for trip in booked_trips:
+        trip_search_cache.invalidate_trip(trip)
+
+    applied = sum(1 for result in results.values() if result == 'applied')
+    return len(events), applied, len(unmatched)
+
+
+def process_inbox(batch_size=500, grace_seconds=600, retry_seconds=15, now=None):
+    """
+    Apply received provider callbacks to their payments and bookings, one
+    batch (one transaction) at a time, until nothing is due. Batches are
+    claimed with SKIP LOCKED, so several processors can run at once. Returns
+    {'events', 'applied', 'deferred'} totals; deferred events matched no
+    payment yet and are retried every `retry_seconds` until `grace_seconds`
+    after they arrived.
+    """
+    now = now or datetime.utcnow()
+    totals = {'events': 0, 'applied': 0, 'deferred': 0}
+    while True:
+        result = _process_batch(batch_size, grace_seconds, retry_seconds, now)
+        if result is None:
+            return totals
+        events, applied, deferred = result
+        totals['events'] += events
+        totals['applied'] += applied
+        totals['deferred'] += deferred
+        if events < batch_size:
+            return totals